@@ -1,13 +1,41 @@
 import os
+import sys
+import argparse
 import requests
 import time
 import qt
 import ctk 
+import vtk
 import slicer
 import json
+import sqlite3
 import uuid
 import random
+import shutil
+import hashlib
+import base64
 import tempfile
+import threading
+import queue
+import concurrent.futures
+import urllib.parse
+import email.utils
+import functools
+import collections
+import bisect
+import gzip
+import contextlib
+import struct
+import zlib
+import numpy as np
+from vtk.util import numpy_support
+try:
+    # İsteğe bağlı: "Remember this device" yalnızca bu paketle çalışır
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+except ImportError:
+    Fernet = InvalidToken = hashes = HKDF = None
 from slicer.ScriptedLoadableModule import *
 from slicer.util import VTKObservationMixin
 
@@ -32,15 +60,32 @@ class AIRadar(ScriptedLoadableModule):
 # ==============================================================================
 
 class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
+
+    PATIENT_ROW_BATCH = 200   # hasta listesinde bir seferde oluşturulan satır sayısı
+    SESSION_RESUME_MAX_AGE = 7 * 24 * 3600  # saniye; daha eski kayıtlı oturum yeniden eşleştirme ister
+    SETTINGS_REMEMBER = "AIRadar/RememberSession"
+    SETTINGS_SESSION_KEY = "AIRadar/SessionKey"
+
     def __init__(self, parent=None):
         ScriptedLoadableModuleWidget.__init__(self, parent)
         VTKObservationMixin.__init__(self)
         self.logic = None
         self.device_code = str(random.randint(1000, 9999))
         self.session_id = str(uuid.uuid4())[:8] 
-        self.timer = qt.QTimer()
+        self.pairing = None
         self.is_logged_in = False
         self.current_sis_id = None 
+        self.current_user = None
+        self.activeTasks = set()
+        self.patients = []
+        self.patientIndex = None
+        self.patientRows = []
+        self.patientRowsShown = 0
+        self.patientsGeneration = 0
+        self.localPatientKeys = set()
+        self.lastUploadManifest = None
+        self.started = False
+        self.sessionStore = None
 
     def setup(self):
         ScriptedLoadableModuleWidget.setup(self)
@@ -73,6 +118,17 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self.statusLabel.setStyleSheet("color: orange;")
         authLayout.addRow(self.statusLabel)
 
+        self.rememberSessionCheckBox = qt.QCheckBox("Remember this device on this computer")
+        if AIRadarSessionStore.available():
+            self.rememberSessionCheckBox.setToolTip("Keeps the paired session (encrypted with a key from your Slicer settings) so restarting "
+                                                    "Slicer does not require pairing again. Anyone with access to your user account can use it.")
+            self.rememberSessionCheckBox.checked = slicer.app.userSettings().value(self.SETTINGS_REMEMBER, "false") == "true"
+        else:
+            self.rememberSessionCheckBox.enabled = False
+            self.rememberSessionCheckBox.setToolTip("Needs the 'cryptography' Python package: run slicer.util.pip_install('cryptography') "
+                                                    "in the Python console and restart Slicer.")
+        authLayout.addRow(self.rememberSessionCheckBox)
+
         # --- 2. SERVER PATIENT LIST (Hasta Listesi) ---
         self.patientsPanel = slicer.qMRMLCollapsibleButton()
         self.patientsPanel.text = "2. SUNUCU HASTA LİSTESİ"
@@ -83,15 +139,30 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self.refreshPatientsBtn = qt.QPushButton("📂 Listeyi Getir/Yenile")
         patientsLayout.addWidget(self.refreshPatientsBtn)
 
+        self.patientSearchLine = qt.QLineEdit()
+        self.patientSearchLine.setPlaceholderText("🔍 Hasta adı veya anahtarı ile ara...")
+        patientsLayout.addWidget(self.patientSearchLine)
+
+        # Satırlar kaydırdıkça PATIENT_ROW_BATCH'lik parçalar halinde oluşturulur
         self.fileListWidget = qt.QListWidget()
+        self.fileListWidget.setUniformItemSizes(True)
         patientsLayout.addWidget(self.fileListWidget)
 
         self.loadToSlicerBtn = qt.QPushButton("🖥️ Sahnede Göster (Load)")
         self.loadToSlicerBtn.setStyleSheet("background-color: #3498db; color: white; font-weight: bold;")
         patientsLayout.addWidget(self.loadToSlicerBtn)
+
+        self.progressiveLoadCheckBox = qt.QCheckBox("Önce düşük çözünürlük göster (Progressive Load)")
+        self.progressiveLoadCheckBox.setToolTip("Tam çözünürlüklü veri inerken düşük çözünürlüklü önizleme gösterilir; veri gelince aynı düğüme yerleştirilir")
+        self.progressiveLoadCheckBox.checked = AIRadarLogic.PROGRESSIVE_LOAD
+        patientsLayout.addWidget(self.progressiveLoadCheckBox)
         
         self.fileListWidget.connect('itemDoubleClicked(QListWidgetItem*)', self.onLoadPatientClicked)
+        self.fileListWidget.connect('currentRowChanged(int)', self.onPatientSelectionChanged)
+        self.fileListWidget.verticalScrollBar().connect('valueChanged(int)', self.onPatientListScrolled)
+        self.patientSearchLine.connect('textChanged(QString)', self.onPatientSearchChanged)
         self.loadToSlicerBtn.connect('clicked(bool)', self.onLoadPatientClicked)
+        self.progressiveLoadCheckBox.connect('toggled(bool)', self.onProgressiveLoadToggled)
 
         # --- 3. HOLOLENS CONTROL (Gözlük Kontrolü) ---
         self.holoPanel = slicer.qMRMLCollapsibleButton()
@@ -104,6 +175,18 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self.ipInput.text = "192.168.1.50" 
         holoLayout.addRow("HoloLens IP:", self.ipInput)
 
+        self.renderProfileCombo = qt.QComboBox()
+        for name in AIRadarRenderProfile.PROFILES: self.renderProfileCombo.addItem(name.capitalize(), name)
+        self.renderProfileCombo.setCurrentIndex(list(AIRadarRenderProfile.PROFILES).index(AIRadarLogic.RENDER_PROFILE))
+        self.renderProfileCombo.setToolTip("3D render profili: yöntem (GPU/CPU), hedef FPS ve voksel bütçesi. Gözlüğe gönderimde HoloLens profili kullanılır.")
+        holoLayout.addRow("3D Render Profili:", self.renderProfileCombo)
+
+        self.meshLevelCombo = qt.QComboBox()
+        for level in AIRadarLogic.HOLO_MESH_LEVELS: self.meshLevelCombo.addItem(level.capitalize(), level)
+        self.meshLevelCombo.setCurrentIndex(list(AIRadarLogic.HOLO_MESH_LEVELS).index(AIRadarLogic.HOLO_MESH_LEVEL))
+        self.meshLevelCombo.setToolTip("Segmentasyon yüzeylerinin seyreltme/yumuşatma düzeyi; bağlıyken de değiştirilebilir")
+        holoLayout.addRow("Yüzey Ayrıntısı:", self.meshLevelCombo)
+
         self.viewOnHoloButton = qt.QPushButton("🥽 Seçileni Gözlükte Göster")
         self.viewOnHoloButton.setStyleSheet("background-color: #2ecc71; color: white; font-weight: bold; padding: 10px;")
         holoLayout.addRow(self.viewOnHoloButton)
@@ -117,11 +200,24 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
 
         self.userLabel = qt.QLabel("Active User: -")
         self.userLabel.setStyleSheet("font-weight: bold; color: #666;")
-        appLayout.addRow(self.userLabel)
+        self.logoutBtn = qt.QPushButton("Log Out")
+        self.logoutBtn.setToolTip("Forgets the saved session and pairs this device again.")
+        userLayout = qt.QHBoxLayout()
+        userLayout.addWidget(self.userLabel, 1)
+        userLayout.addWidget(self.logoutBtn)
+        appLayout.addRow(userLayout)
 
         self.serverImagesCombo = qt.QComboBox()
         self.serverImagesCombo.setToolTip("Available datasets on the MONAI server.")
-        appLayout.addRow("MONAI Datasets:", self.serverImagesCombo)
+        # Liste yerel metadata deposundan süzülür; kapsam değişince ağa çıkılmaz
+        self.datasetScopeCombo = qt.QComboBox()
+        self.datasetScopeCombo.addItem("My Datasets", "mine")
+        self.datasetScopeCombo.addItem("Public Datasets", "public")
+        self.datasetScopeCombo.addItem("All Datasets", "all")
+        datasetsLayout = qt.QHBoxLayout()
+        datasetsLayout.addWidget(self.serverImagesCombo, 1)
+        datasetsLayout.addWidget(self.datasetScopeCombo)
+        appLayout.addRow("MONAI Datasets:", datasetsLayout)
         
         self.refreshBtn = qt.QPushButton("Refresh MONAI List")
         appLayout.addRow(self.refreshBtn)
@@ -133,6 +229,17 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self.deleteBtn.setStyleSheet("color: #d9534f; font-weight: bold;")
         appLayout.addRow(self.deleteBtn)
 
+        # Toplu dışa aktarım: sahneye yüklemeden klasöre indirir
+        exportLayout = qt.QHBoxLayout()
+        self.exportScopeCombo = qt.QComboBox()
+        self.exportScopeCombo.addItem("My Datasets", "mine")
+        self.exportScopeCombo.addItem("Public Datasets", "public")
+        self.exportScopeCombo.addItem("All Datasets", "all")
+        self.exportBtn = qt.QPushButton("EXPORT TO FOLDER")
+        exportLayout.addWidget(self.exportScopeCombo)
+        exportLayout.addWidget(self.exportBtn)
+        appLayout.addRow("Bulk Export:", exportLayout)
+
         # --- 5. UPLOAD PANEL ---
         self.uploadPanel = slicer.qMRMLCollapsibleButton()
         self.uploadPanel.text = "5. UPLOAD NEW CASE (MONAI)"
@@ -170,61 +277,200 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self.isNewPatientCheckBox = qt.QCheckBox("New Case Label Image Upload")
         uploadLayout.addRow(self.isNewPatientCheckBox)
 
+        self.compactLabelCheckBox = qt.QCheckBox("Compact Label Upload (crop to segments)")
+        self.compactLabelCheckBox.setToolTip("Small segmentations are sent cropped to their bounding box, with its offset in the label params")
+        uploadLayout.addRow(self.compactLabelCheckBox)
+
         self.uploadBtn = qt.QPushButton("UPLOAD TO SERVER")
         self.uploadBtn.setStyleSheet("background-color: #28a745; color: white; font-weight: bold; height: 40px;")
         uploadLayout.addRow(self.uploadBtn)
 
+        # Toplu yükleme: klasördeki veya sahnedeki tüm vakalar, sonuçlar manifest dosyasına yazılır
+        batchLayout = qt.QHBoxLayout()
+        self.batchFolderBtn = qt.QPushButton("📁 Batch From Folder")
+        self.batchSceneBtn = qt.QPushButton("🧩 Batch From Scene")
+        self.retryFailedBtn = qt.QPushButton("↻ Retry Failed")
+        self.retryFailedBtn.enabled = False
+        batchLayout.addWidget(self.batchFolderBtn)
+        batchLayout.addWidget(self.batchSceneBtn)
+        batchLayout.addWidget(self.retryFailedBtn)
+        uploadLayout.addRow(batchLayout)
+
+        self.cancelTaskBtn = qt.QPushButton("⏹ Cancel Running Operation")
+        self.cancelTaskBtn.enabled = False
+        self.layout.addWidget(self.cancelTaskBtn)
+
+        # --- 6. DIAGNOSTICS ---
+        self.diagnosticsPanel = slicer.qMRMLCollapsibleButton()
+        self.diagnosticsPanel.text = "6. TANILAMA (Diagnostics)"
+        self.diagnosticsPanel.collapsed = True
+        self.layout.addWidget(self.diagnosticsPanel)
+        diagnosticsLayout = qt.QVBoxLayout(self.diagnosticsPanel)
+
+        self.metricsTable = qt.QTableWidget()
+        self.metricsTable.setColumnCount(6)
+        self.metricsTable.setHorizontalHeaderLabels(["Operation", "Count", "p50 ms", "p95 ms", "MB/s", "Failed"])
+        self.metricsTable.horizontalHeader().setStretchLastSection(True)
+        self.metricsTable.setEditTriggers(qt.QAbstractItemView.NoEditTriggers)
+        diagnosticsLayout.addWidget(self.metricsTable)
+
+        metricsButtons = qt.QHBoxLayout()
+        self.refreshMetricsBtn = qt.QPushButton("↻ Refresh")
+        self.exportMetricsBtn = qt.QPushButton("Export Metrics...")
+        metricsButtons.addWidget(self.refreshMetricsBtn)
+        metricsButtons.addWidget(self.exportMetricsBtn)
+        diagnosticsLayout.addLayout(metricsButtons)
+
         self.layout.addStretch(1)
 
-        # INITIALIZATION
-        self.registerDevice()
-        self.timer.timeout.connect(self.checkLoginStatus)
-        self.timer.start(2000)
+        # INITIALIZATION: ağ işlemleri panel ilk gösterildiğinde başlar (enter)
+        self.sessionStore = AIRadarSessionStore(os.path.join(os.path.dirname(self.logic.cache.cache_dir), "session.json"), self._sessionSecret())
 
         # SIGNAL CONNECTIONS
-        self.refreshBtn.connect('clicked(bool)', self.onRefreshList)
+        self.apiLine.editingFinished.connect(self.onApiEndpointChanged)
+        self.rememberSessionCheckBox.connect('toggled(bool)', self.onRememberSessionToggled)
+        self.logoutBtn.connect('clicked(bool)', self.onLogout)
+        self.refreshBtn.connect('clicked(bool)', self.onRefreshClicked)
         self.uploadBtn.connect('clicked(bool)', self.onUpload)
+        self.batchFolderBtn.connect('clicked(bool)', self.onBatchUploadFolder)
+        self.batchSceneBtn.connect('clicked(bool)', self.onBatchUploadScene)
+        self.retryFailedBtn.connect('clicked(bool)', self.onRetryFailedUploads)
         self.deleteBtn.connect('clicked(bool)', self.onDelete)
         self.downloadBtn.connect('clicked(bool)', self.onDownload)
+        self.exportBtn.connect('clicked(bool)', self.onExport)
         self.serverImagesCombo.currentTextChanged.connect(self.onImageSelected)
+        self.datasetScopeCombo.connect('currentIndexChanged(int)', self.onDatasetScopeChanged)
         self.publicModeCheckBox.connect('toggled(bool)', self.onPublicToggled)
+        self.compactLabelCheckBox.connect('toggled(bool)', self.onCompactLabelToggled)
         
         # YENİ SİNYALLER (Hasta Listesi ve HoloLens)
         self.refreshPatientsBtn.connect('clicked(bool)', self.onRefreshPatientsClicked)
         self.viewOnHoloButton.connect('clicked(bool)', self.onViewOnHoloClicked)
+        self.renderProfileCombo.connect('currentIndexChanged(int)', self.onRenderProfileChanged)
+        self.meshLevelCombo.connect('currentIndexChanged(int)', self.onMeshLevelChanged)
+        self.cancelTaskBtn.connect('clicked(bool)', self.onCancelTasks)
+        self.refreshMetricsBtn.connect('clicked(bool)', self.onRefreshMetrics)
+        self.exportMetricsBtn.connect('clicked(bool)', self.onExportMetrics)
+        self.diagnosticsPanel.connect('contentsCollapsed(bool)', lambda collapsed: None if collapsed else self.onRefreshMetrics())
 
     # --- UI OPERATIONS ---
 
-    def registerDevice(self):
-        try:
-            base_url = self.apiLine.text.rstrip('/')
-            url = f"{base_url}/api/start-session/{self.device_code}"
-            requests.get(url, timeout=5, verify=False)
-        except Exception as e: 
-            self.statusLabel.setText("Connection Error!")
-            print(f"Auth Error: {e}")
+    def enter(self):
+        if not self.started:
+            self.started = True
+            # Modül GUI'si çizildikten sonra: kayıtlı oturum ya da cihaz eşleştirme
+            qt.QTimer.singleShot(0, self.startSession)
 
-    def checkLoginStatus(self):
-        if self.is_logged_in: 
-            self.timer.stop()
+    def startSession(self):
+        """Kayıtlı oturumu arka planda açar (hatırlama açıksa), yoksa eşleştirmeyi başlatır"""
+        if self.is_logged_in: return
+        if not self.rememberSessionCheckBox.checked:
+            self.startPairing()
             return
-        try:
-            base_url = self.apiLine.text.rstrip('/')
-            url = f"{base_url}/api/check-session/{self.device_code}"
-            resp = requests.get(url, timeout=5, verify=False)
-            if resp.status_code == 200:
-                data = resp.json()
-                if data.get("success") and data.get("status") == "LOGGED_IN":
-                    self.unlockApp(data.get("user"), data.get("sis_id"))
-        except: pass
+        self._startTask(self.sessionStore.load, max_age=self.SESSION_RESUME_MAX_AGE, api_url=self.apiLine.text,
+                        group="session", on_done=self._onSessionLoaded)
+
+    def _onSessionLoaded(self, session):
+        if self.is_logged_in: return
+        if session and session.get("sis_id"):
+            if session.get("monai_url"): self.monaiLine.text = session["monai_url"]
+            if session.get("device_code"):
+                self.device_code = session["device_code"]
+                self.codeDisplay.setText(self.device_code)
+            self.unlockApp(session.get("user"), session["sis_id"], resumed=True)
+            # Kayıtlı oturum portalda iptal edilmiş ya da süresi dolmuş olabilir: arka planda bir kez doğrulanır
+            self._startTask(self.logic.check_session, self.apiLine.text, session.get("device_code"), session["sis_id"],
+                            group="session", on_done=lambda valid: self._onSessionChecked(valid, session["sis_id"]))
+        else:
+            self.startPairing()
+
+    def _onSessionChecked(self, valid, sis_id):
+        if not self.is_logged_in or self.current_sis_id != sis_id: return
+        if valid is None:
+            self.statusLabel.setText("✅ AUTHENTICATED (resumed, portal unreachable: not verified)")
+        elif not valid:
+            print("Saved session was rejected by the portal, pairing again.")
+            self.onLogout()
+            self.statusLabel.setText("Saved session expired. Waiting for connection... ⏳")
+
+    def _sessionSecret(self):
+        """Oturum dosyasından ayrı, Slicer kullanıcı ayarlarında tutulan kuruluma özel rastgele sır"""
+        settings = slicer.app.userSettings()
+        secret = settings.value(self.SETTINGS_SESSION_KEY)
+        if not secret:
+            secret = base64.b64encode(os.urandom(32)).decode("ascii")
+            settings.setValue(self.SETTINGS_SESSION_KEY, secret)
+        return secret
+
+    def onRememberSessionToggled(self, checked):
+        slicer.app.userSettings().setValue(self.SETTINGS_REMEMBER, "true" if checked else "false")
+        if not checked: self.sessionStore.clear()
+        elif self.is_logged_in: self._saveSession()
+
+    def _saveSession(self):
+        session = {"sis_id": self.current_sis_id, "user": self.current_user, "device_code": self.device_code,
+                   "api_url": self.apiLine.text.rstrip('/'), "monai_url": self.monaiLine.text.rstrip('/')}
+        self.logic.tasks.submit(self.sessionStore.save, session, name="session.save", on_done=self._onSessionSaved)
+
+    def _onSessionSaved(self, result, error):
+        if error is not None: print(f"Session could not be saved: {error}")
+
+    def onLogout(self):
+        self.sessionStore.clear()
+        self.logic.tasks.cancel_all()
+        self.is_logged_in = False
+        self.current_sis_id = None
+        self.current_user = None
+        self.session_id = str(uuid.uuid4())[:8]
+        self.device_code = str(random.randint(1000, 9999))
+        self.codeDisplay.setText(self.device_code)
+        self.codeDisplay.setStyleSheet("font-size: 40px; font-weight: bold; color: #2196F3; border: 3px dashed #2196F3; padding: 10px; margin: 10px;")
+        self.statusLabel.setText("Waiting for connection... ⏳")
+        self.statusLabel.setStyleSheet("color: orange;")
+        self.userLabel.setText("Active User: -")
+        self.userLabel.setStyleSheet("font-weight: bold; color: #666;")
+        self.serverImagesCombo.clear()
+        self.patientsGeneration += 1
+        self.patients = []
+        self.patientIndex = None
+        self._showPatientRows([])
+        self.authPanel.enabled = True
+        for panel in (self.appPanel, self.uploadPanel, self.patientsPanel, self.holoPanel):
+            panel.enabled = False
+        self.startPairing()
 
-    def unlockApp(self, name, sis_id):
+    def startPairing(self):
+        """device_code için portal girişini arka plandaki bir thread'de bekler"""
+        self.stopPairing()
+        base_url = self.apiLine.text.rstrip('/')
+        self.pairing = self.logic.start_pairing(base_url, self.device_code, self._onPairingEvent)
+
+    def stopPairing(self):
+        if self.pairing:
+            self.pairing.stop()
+            self.pairing = None
+
+    def onApiEndpointChanged(self):
+        if not self.is_logged_in and self.started: self.startPairing()
+
+    def _onPairingEvent(self, event, data):
+        if self.is_logged_in: return
+        if event == "logged_in":
+            self.unlockApp(data.get("user"), data.get("sis_id"))
+        elif event == "registered":
+            self.statusLabel.setText("Waiting for connection... ⏳")
+        elif event == "error":
+            self.statusLabel.setText("Connection Error!")
+
+    def unlockApp(self, name, sis_id, resumed=False):
         self.is_logged_in = True
         self.current_sis_id = sis_id
+        self.current_user = name
         self.session_id = sis_id 
-        self.timer.stop()
+        self.stopPairing()
+        if self.rememberSessionCheckBox.checked and not resumed: self._saveSession()
 
-        self.statusLabel.setText("✅ AUTHENTICATED")
+        self.statusLabel.setText("✅ AUTHENTICATED" + (" (resumed)" if resumed else ""))
         self.statusLabel.setStyleSheet("color: green; font-weight: bold;")
         self.codeDisplay.setStyleSheet("font-size: 40px; font-weight: bold; color: white; background: green; border: 3px solid green; padding: 10px;")
         
@@ -236,53 +482,180 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         
         self.userLabel.setText(f"Operator: {name} | ID: {sis_id}")
         self.userLabel.setStyleSheet("color: green; font-weight: bold;")
-        self.onRefreshList() # MONAI listesini de çekmeyi dener
+        self.showStoredPatients()
+        # MONAI listesi önce yerel snapshot'tan gösterilir, ardından arka planda koşullu istekle doğrulanır
+        self.onRefreshList(max_age=float("inf"), revalidate=True)
 
     def onPublicToggled(self, checked):
         if checked: self.publicModeCheckBox.setStyleSheet("color: #d9534f; font-weight: bold;")
         else: self.publicModeCheckBox.setStyleSheet("")
 
-    def onRefreshList(self):
+    def onCompactLabelToggled(self, checked):
+        self.logic.label_encoding = "auto" if checked else AIRadarLogic.LABEL_ENCODING
+
+    def onRenderProfileChanged(self, index):
+        self.logic.render_profile = self.renderProfileCombo.itemData(index)
+        # Sahnedeki volume yeni profile göre yeniden ayarlanır (hacim özellikleri korunur)
+        if slicer.mrmlScene.GetFirstNodeByClass("vtkMRMLScalarVolumeNode"): self.logic.setup_volume_rendering()
+        print(f"Render stats: {self.logic.render_stats.summary()}")
+
+    def onProgressiveLoadToggled(self, checked):
+        self.logic.progressive_load = checked
+
+    def onRefreshClicked(self):
+        # Kullanıcı açıkça yeniledi: yerel görüntü sunucuya karşı doğrulanır
+        self.onRefreshList(max_age=0)
+
+    def onRefreshList(self, max_age=None, revalidate=False):
+        """MONAI listesini yeniler; revalidate: liste gösterildikten sonra varsayılan max_age ile bir kez daha"""
         # Eski MONAI listesi (Altta kalan panel için)
         if not self.session_id: 
             self.statusLabel.setText("Please login first.")
             return
+        self._startTask(self.logic.fetch_all_images, self.monaiLine.text, current_user_session_id=self.session_id, max_age=max_age,
+                        scope=self.datasetScopeCombo.currentData, message="Syncing MONAI...", group="monai_list",
+                        on_done=functools.partial(self._onImagesFetched, revalidate=revalidate))
+
+    def onDatasetScopeChanged(self, index):
+        # Elde snapshot varsa yeni kapsam doğrudan yerel depodan listelenir
+        self.onRefreshList(max_age=float("inf"))
+
+    def _onImagesFetched(self, images, revalidate=False):
+        # Yenileme sürerken eski liste görünür kalır; seçim korunur
+        selected = self.serverImagesCombo.currentText
         self.serverImagesCombo.clear()
-        self.statusLabel.setText("Syncing MONAI...")
-        slicer.app.processEvents() 
-        images = self.logic.fetch_all_images(self.monaiLine.text, current_user_session_id=self.session_id)
         if images: 
             self.serverImagesCombo.addItems(images)
+            if selected in images: self.serverImagesCombo.setCurrentText(selected)
             self.statusLabel.setText(f"{len(images)} MONAI datasets found.")
         else:
             self.statusLabel.setText("No MONAI datasets found.")
+        if revalidate: self.onRefreshList()
+
+    def showStoredPatients(self):
+        """Yerel depodaki hasta listesini hemen gösterir, ardından arka planda yeniler"""
+        self.patientsGeneration += 1
+        generation = self.patientsGeneration
+        self._startTask(self.logic.stored_patient_index, self.apiLine.text, self.current_sis_id, group="patients",
+                        on_done=lambda index: self._onStoredPatients(index, generation))
 
-    def onRefreshPatientsClicked(self):
+    def _onStoredPatients(self, index, generation):
+        if generation != self.patientsGeneration: return
+        if not index.patients:
+            self.onRefreshPatientsClicked()
+            return
+        self._onPatientsFetched(index, generation)
+        self.onRefreshPatientsClicked(background=True)
+
+    def onRefreshPatientsClicked(self, checked=False, background=False):
+        """Hasta listesini yeniler; background: gösterilen liste, tam yeni liste gelene kadar kalır"""
         # YENİ: Backend Hasta Listesini Çek
-        self.fileListWidget.clear()
+        self.patientsGeneration += 1
+        if not background:
+            self.patients = []
+            self.patientIndex = None
+            self._showPatientRows([])
         
         # Eğer giriş yapılmamışsa uyarı ver
         if not self.current_sis_id:
             self.statusLabel.setText("Lütfen önce giriş yapınız!")
             return
 
-        self.statusLabel.setText("Hasta listesi çekiliyor...")
-        slicer.app.processEvents()
-
         # [cite_start]Logic üzerinden çek (user_tag parametresini ekledik) [cite: 367]
-        patients = self.logic.fetch_backend_patients(self.apiLine.text, self.current_sis_id)
-        
-        if patients:
-            for p in patients:
-                # Ekranda isim göster, arkada key (ID) sakla
-                item = qt.QListWidgetItem(p.get('name', 'Unknown'))
-                item.setData(qt.Qt.UserRole, p.get('key')) 
-                self.fileListWidget.addItem(item)
-            self.statusLabel.setText(f"{len(patients)} hasta listelendi.")
+        generation = self.patientsGeneration
+        if background:
+            self._startTask(self.logic.fetch_backend_patient_index, self.apiLine.text, self.current_sis_id,
+                            message="Hasta listesi arka planda yenileniyor...", group="patients",
+                            on_done=lambda index: self._onPatientsRefreshed(index, generation))
+            return
+        self._startTask(self.logic.fetch_backend_patient_index, self.apiLine.text, self.current_sis_id,
+                        on_page=lambda page: self._onPatientsPage(page, generation),
+                        message="Hasta listesi çekiliyor...", group="patients",
+                        on_done=lambda index: self._onPatientsFetched(index, generation))
+
+    def _onPatientsRefreshed(self, index, generation):
+        if generation != self.patientsGeneration: return
+        if not index.complete:
+            # Sunucuya ulaşılamadı ya da liste yarıda kesildi: kayıtlı (tam) liste ekranda kalır
+            self.statusLabel.setText(f"Hasta listesi yenilenemedi; kayıtlı liste gösteriliyor ({len(self.patients)}).")
+            return
+        current = self.fileListWidget.currentItem()
+        selectedKey = current.data(qt.Qt.UserRole) if current else None
+        self._onPatientsFetched(index, generation)
+        for row in range(self.fileListWidget.count if selectedKey else 0):
+            if self.fileListWidget.item(row).data(qt.Qt.UserRole) == selectedKey:
+                self.fileListWidget.setCurrentRow(row)
+                break
+
+    def _onPatientsPage(self, page, generation):
+        """Gelen her sayfa listeye eklenir; indeks hazır olana kadar arama yapılmaz"""
+        if generation != self.patientsGeneration: return
+        start = len(self.patients)
+        self.patients.extend(page)
+        if not self.patientSearchLine.text.strip():
+            self.patientRows.extend(range(start, len(self.patients)))
+            self._materializePatientRows()
+        self.statusLabel.setText(f"Hasta listesi çekiliyor... ({len(self.patients)})")
+
+    def _onPatientsFetched(self, index, generation):
+        if generation != self.patientsGeneration: return
+        self.localPatientKeys = self.logic.local_patient_keys(self.apiLine.text)
+        self.patients = index.patients
+        self.patientIndex = index
+        if self.patients:
+            self.onPatientSearchChanged(self.patientSearchLine.text)
+            if index.complete:
+                self.statusLabel.setText(f"{len(self.patients)} hasta listelendi.")
+            else:
+                self.statusLabel.setText(f"Liste eksik: sunucu yanıtı kesildi, yalnızca {len(self.patients)} hasta listelendi.")
         else:
+            self.fileListWidget.clear()
             self.fileListWidget.addItem("Dosya bulunamadı veya liste boş.")
             self.statusLabel.setText("Liste boş.")
 
+    def onPatientSearchChanged(self, text):
+        if self.patientIndex is None: return
+        self._showPatientRows(self.patientIndex.search(text))
+
+    def _showPatientRows(self, rows):
+        self.fileListWidget.clear()
+        self.patientRows = rows
+        self.patientRowsShown = 0
+        self._materializePatientRows()
+
+    def _materializePatientRows(self):
+        """Bir sonraki PATIENT_ROW_BATCH satırı oluşturur (yalnızca görünür alanı dolduracak kadar)"""
+        if self.patientRowsShown >= self.PATIENT_ROW_BATCH and self.fileListWidget.verticalScrollBar().maximum > 0:
+            scrollBar = self.fileListWidget.verticalScrollBar()
+            if scrollBar.value < scrollBar.maximum - scrollBar.pageStep: return
+        end = min(len(self.patientRows), self.patientRowsShown + self.PATIENT_ROW_BATCH)
+        for row in self.patientRows[self.patientRowsShown:end]:
+            p = self.patients[int(row)]
+            # Ekranda isim göster, arkada key (ID) sakla
+            item = qt.QListWidgetItem(p.get('name', 'Unknown'))
+            item.setData(qt.Qt.UserRole, p.get('key'))
+            if p.get('key') in self.localPatientKeys:
+                # Önbellekte olan vaka ağa gitmeden açılır
+                item.setForeground(qt.QBrush(qt.QColor("#2e7d32")))
+                item.setToolTip("Yerel önbellekte")
+            self.fileListWidget.addItem(item)
+        self.patientRowsShown = max(self.patientRowsShown, end)
+
+    def onPatientListScrolled(self, value):
+        scrollBar = self.fileListWidget.verticalScrollBar()
+        if value >= scrollBar.maximum - scrollBar.pageStep and self.patientRowsShown < len(self.patientRows):
+            self._materializePatientRows()
+
+    def onPatientSelectionChanged(self, row):
+        """Seçili hastayı ve listede sonraki PREFETCH_AHEAD hastayı arka planda önbelleğe indirir"""
+        if not self.logic or not self.current_sis_id: return
+        keys = []
+        if row >= 0:
+            for patientRow in self.patientRows[row:row + 1 + self.logic.PREFETCH_AHEAD]:
+                key = self.patients[int(patientRow)].get('key')
+                if key: keys.append(key)
+        self.logic.prefetch_patients(self.apiLine.text, keys, self.current_sis_id)
+
     def onViewOnHoloClicked(self):
         # YENİ: Seçileni İndir -> Yükle -> Gözlüğe Gönder
         selectedItems = self.fileListWidget.selectedItems()
@@ -298,23 +671,52 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         imageKey = selectedItems[0].data(qt.Qt.UserRole)
         imageName = selectedItems[0].text()
 
-        self.statusLabel.setText(f"İndiriliyor: {imageName}...")
-        slicer.app.processEvents()
+        # 1. Dosyayı (ve varsa kullanıcının segmentasyonunu) İndir ve Slicer'a Yükle (Sahneyi temizler)
+        if self.current_sis_id:
+            self._startTask(self.logic.download_patient_with_seg, self.apiLine.text, imageKey, self.current_sis_id,
+                            message=f"İndiriliyor: {imageName}...", group="scene",
+                            on_done=lambda result: self._onHoloCaseLoaded(result[0], ip, imageKey))
+        else:
+            self._startTask(self.logic.download_and_load_patient, self.apiLine.text, imageKey,
+                            message=f"İndiriliyor: {imageName}...", group="scene",
+                            on_done=lambda success: self._onHoloCaseLoaded(success, ip, imageKey))
 
-        # 1. Dosyayı İndir ve Slicer'a Yükle (Sahneyi temizler)
-        if self.logic.download_and_load_patient(self.apiLine.text, imageKey):
+    def _onHoloCaseLoaded(self, success, ip, imageKey=None):
+        if success:
             
             # 2. Volume Rendering Aktif Et
             self.statusLabel.setText("3D Görüntü (VR) hazırlanıyor...")
-            self.logic.setup_volume_rendering()
-            
-            # 3. HoloLens'e Bağlan
-            self.statusLabel.setText(f"HoloLens'e ({ip}) bağlanıyor...")
-            success, msg = self.logic.connect_to_hololens(ip)
-            self.statusLabel.setText(msg)
+            self.logic.setup_volume_rendering(profile="hololens")
+
+            # 3. Segmentasyon varsa seyreltilmiş yüzeyleri hazırla (önbellekten), ardından bağlan
+            if self.logic.has_hololens_label():
+                self._startTask(self.logic.prepare_hololens_scene, imageKey,
+                                message="HoloLens yüzeyleri hazırlanıyor...", group="mesh",
+                                on_done=lambda result: self._onHoloMeshesReady(result, ip))
+                return
+            self._connectHoloLens(ip)
         else:
             self.statusLabel.setText("İndirme başarısız!")
 
+    def _onHoloMeshesReady(self, result, ip):
+        success, msg = result
+        print(f"HoloLens meshes: {msg}")
+        self._connectHoloLens(ip)
+
+    def _connectHoloLens(self, ip):
+        # 4. HoloLens'e Bağlan
+        self.statusLabel.setText(f"HoloLens'e ({ip}) bağlanıyor...")
+        success, msg = self.logic.connect_to_hololens(ip)
+        self.statusLabel.setText(msg)
+
+    def onMeshLevelChanged(self, index):
+        """Bağlantı sürerken de ayrıntı düzeyi değiştirilebilir; sahne güncellenince gözlük de güncellenir"""
+        self.logic.hololens_mesh_level = self.meshLevelCombo.itemData(index)
+        if self.logic.has_hololens_label(prepared=True):
+            self._startTask(self.logic.prepare_hololens_scene, None, self.logic.hololens_mesh_level,
+                            message="Yüzey ayrıntı düzeyi değiştiriliyor...", group="mesh",
+                            on_done=lambda result: self.statusLabel.setText(result[1]))
+
     def onLoadPatientClicked(self):
         """Seçilen hastayı ve segmentasyonunu Slicer ekranlarına yükler"""
         selectedItems = self.fileListWidget.selectedItems()
@@ -330,18 +732,22 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
              self.statusLabel.setText("Oturum bilgisi eksik!")
              return
 
-        self.statusLabel.setText(f"Veriler indiriliyor: {imageName}...")
-        slicer.app.processEvents()
+        # İndirme arka planda çalışır, sahne adımları ana thread'e aktarılır
+        self._startTask(self.logic.download_patient_with_seg,
+                        self.apiLine.text, 
+                        imageKey, 
+                        self.current_sis_id, # Label'ı bulmak için kullanıcının ID'sini gönderiyoruz
+                        message=f"Veriler indiriliyor: {imageName}...", group="scene",
+                        on_done=lambda result: self._onPatientLoaded(result, imageName))
 
-        # --- GÜNCELLENEN KISIM: Yeni fonksiyonu çağırıyoruz ---
-        success, msg = self.logic.download_patient_with_seg(
-            self.apiLine.text, 
-            imageKey, 
-            self.current_sis_id # Label'ı bulmak için kullanıcının ID'sini gönderiyoruz
-        )
-        
+    def _onPatientLoaded(self, result, imageName):
+        success, msg = result
         if success:
             self.statusLabel.setText(f"✅ Yüklendi: {imageName}")
+            prefetch = self.logic.prefetch_stats()
+            if prefetch["hit_rate"] is not None:
+                self.statusLabel.setToolTip(f"Prefetch hit rate: {prefetch['hit_rate']:.0%} ({prefetch['hits']}/{prefetch['hits'] + prefetch['misses']})")
+                print(f"Prefetch: {prefetch}")
             
             # 3D Görüntüyü ayarla
             self.logic.setup_volume_rendering()
@@ -366,9 +772,7 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
             self.statusLabel.setText("Missing Inputs!")
             return
         is_public_checked = self.publicModeCheckBox.checked
-        self.statusLabel.setText("Uploading...")
-        slicer.app.processEvents()
-        success, msg = self.logic.process_upload(
+        self._startTask(self.logic.process_upload,
             server_url=self.monaiLine.text,
             raw_image_name=raw_name,
             is_public=is_public_checked,
@@ -376,24 +780,90 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
             label_node=self.labelSelector.currentNode(),
             is_new_patient=self.isNewPatientCheckBox.checked,
             user_session_id=self.session_id,
-            user_tag=self.current_sis_id
+            user_tag=self.current_sis_id,
+            message="Uploading...", group="upload", on_done=self._onUploadFinished
         )
+
+    def _onUploadFinished(self, result):
+        success, msg = result
         self.statusLabel.setText(msg)
-        if success: self.onRefreshList()
+        # Yerel datastore görüntüsü yükleme sonrası güncellendi; tam senkronizasyon gerekmez
+        if success: self.onRefreshList(max_age=float("inf"))
+
+    def onExport(self):
+        if not self.current_sis_id: return
+        selected_folder = qt.QFileDialog.getExistingDirectory(self.parent, "Select Export Destination")
+        if not selected_folder: return
+        scope = self.exportScopeCombo.currentData
+        self._startTask(self.logic.export_datasets,
+            server_url=self.monaiLine.text,
+            scope=scope,
+            user_session_id=self.session_id,
+            target_folder=selected_folder,
+            message=f"Exporting {scope} datasets...", group="export", on_done=self._onExportFinished
+        )
+
+    def _onExportFinished(self, result):
+        downloaded, skipped, failed, manifest_path = result
+        self.statusLabel.setText(f"Export: {downloaded} downloaded, {skipped} up to date, {failed} failed.")
+        self.statusLabel.setToolTip(f"Manifest: {manifest_path}")
+
+    def onBatchUploadFolder(self):
+        if not self.current_sis_id: return
+        folder = qt.QFileDialog.getExistingDirectory(self.parent, "Select Case Folder")
+        if not folder: return
+        cases = self.logic.collect_directory_upload_cases(folder)
+        self._startBatchUpload(cases, self.logic.new_upload_manifest_path(folder))
+
+    def onBatchUploadScene(self):
+        if not self.current_sis_id: return
+        self._startBatchUpload(self.logic.collect_scene_upload_cases(), self.logic.new_upload_manifest_path())
+
+    def _startBatchUpload(self, cases, manifest_path):
+        if not cases:
+            self.statusLabel.setText("No cases found for batch upload.")
+            return
+        self.lastUploadManifest = manifest_path
+        self.retryFailedBtn.enabled = True  # iptal edilirse kalan vakalar da tekrar denenebilir
+        self._startTask(self.logic.batch_upload,
+            server_url=self.monaiLine.text,
+            cases=cases,
+            is_public=self.publicModeCheckBox.checked,
+            is_new_patient=self.isNewPatientCheckBox.checked,
+            user_session_id=self.session_id,
+            user_tag=self.current_sis_id,
+            manifest_path=manifest_path,
+            message=f"Batch uploading {len(cases)} cases...", group="upload", on_done=self._onBatchUploadFinished
+        )
+
+    def onRetryFailedUploads(self):
+        if not self.lastUploadManifest: return
+        self._startTask(self.logic.retry_failed_uploads, self.lastUploadManifest,
+                        message="Retrying failed uploads...", group="upload", on_done=self._onBatchUploadFinished)
+
+    def _onBatchUploadFinished(self, result):
+        uploaded, failed, manifest_path = result
+        self.retryFailedBtn.enabled = failed > 0
+        self.statusLabel.setText(f"Batch upload: {uploaded} uploaded, {failed} failed.")
+        self.statusLabel.setToolTip(f"Manifest: {manifest_path}")
+        if uploaded: self.onRefreshList(max_age=float("inf"))
 
     def onDownload(self):
         image_id = self.serverImagesCombo.currentText
         if not image_id: return
         selected_folder = qt.QFileDialog.getExistingDirectory(self.parent, "Select Download Destination")
         if not selected_folder: return 
-        self.statusLabel.setText(f"Downloading...\n{image_id}")
-        slicer.app.processEvents()
-        success, msg = self.logic.download_image_and_label(
+        self._startTask(self.logic.download_image_and_label,
             server_url=self.monaiLine.text, 
             image_id=image_id, 
             user_tag=self.current_sis_id,
-            target_folder=selected_folder
+            target_folder=selected_folder,
+            message=f"Downloading...\n{image_id}", group="scene",
+            on_done=lambda result: self._onDownloadFinished(result, selected_folder)
         )
+
+    def _onDownloadFinished(self, result, selected_folder):
+        success, msg = result
         if success:
             self.statusLabel.setText("✅ Completed")
             self.statusLabel.setStyleSheet("color: green;")
@@ -422,27 +892,107 @@ class AIRadarWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         if delete_mode == "image":
             confirm = qt.QMessageBox.question(slicer.util.mainWindow(), "Confirm Delete", "Delete permanently?", qt.QMessageBox.Yes | qt.QMessageBox.No)
             if confirm == qt.QMessageBox.No: return
-        self.statusLabel.setText("Deleting...")
-        slicer.app.processEvents()
-        success, msg = self.logic.delete_resource(
+        self._startTask(self.logic.delete_resource,
             server_url=self.monaiLine.text,
             image_id=full_name,
             user_session_id=self.session_id, 
-            delete_mode=delete_mode
+            delete_mode=delete_mode,
+            message="Deleting...", group="delete", on_done=self._onDeleteFinished
         )
+
+    def _onDeleteFinished(self, result):
+        success, msg = result
         if success:
             self.statusLabel.setText("✅ Deleted")
             self.statusLabel.setStyleSheet("color: green;")
-            self.onRefreshList()
+            self.onRefreshList(max_age=float("inf"))
         else:
             self.statusLabel.setText("❌ Error")
             self.statusLabel.setStyleSheet("color: red;")
             qt.QMessageBox.critical(slicer.util.mainWindow(), "Error", msg)
 
+    # --- BACKGROUND TASKS ---
+
+    def _startTask(self, fn, *args, message=None, group=None, on_done=None, **kwargs):
+        """Logic işlemini işçi havuzunda çalıştırır; aynı gruptaki yeni görev öncekini iptal eder"""
+        if group:
+            for other in [t for t in self.activeTasks if t.group == group]:
+                other.cancel()
+        if message: self.statusLabel.setText(message)
+        task = self.logic.tasks.submit(
+            fn, *args, name=group,
+            on_done=lambda result, error: self._onTaskFinished(task, result, error, on_done),
+            on_progress=lambda done, total, phase: self._onTaskProgress(message, done, total, phase),
+            **kwargs)
+        task.group = group
+        self.activeTasks.add(task)
+        self.cancelTaskBtn.enabled = True
+        return task
+
+    def _onTaskProgress(self, message, done, total, phase):
+        text = f"{phase or message} {done / 1048576:.1f} MB"
+        if total: text += f" / {total / 1048576:.1f} MB ({100 * done // total}%)"
+        self.statusLabel.setText(text)
+
+    def _onTaskFinished(self, task, result, error, on_done):
+        self.activeTasks.discard(task)
+        self.cancelTaskBtn.enabled = bool(self.activeTasks)
+        if task.is_cancelled():
+            if not any(t.group == task.group for t in self.activeTasks):
+                self.statusLabel.setText("⏹ İşlem iptal edildi.")
+            return
+        if error is not None:
+            print(f"Task Error ({task.name}): {error}")
+            self.statusLabel.setText(f"❌ Hata: {error}")
+            return
+        if on_done: on_done(result)
+
+    def onRefreshMetrics(self):
+        summary = self.logic.metrics_summary()
+        self.metricsTable.setRowCount(len(summary))
+        for row, (name, stats) in enumerate(sorted(summary.items())):
+            throughput = f"{stats['mb_per_s']:.1f}" if stats["mb_per_s"] is not None else "-"
+            for column, value in enumerate([name, stats["count"], f"{stats['p50_ms']:.0f}", f"{stats['p95_ms']:.0f}", throughput, stats["failed"]]):
+                self.metricsTable.setItem(row, column, qt.QTableWidgetItem(str(value)))
+        self.metricsTable.resizeColumnsToContents()
+
+    def onExportMetrics(self):
+        selected_folder = qt.QFileDialog.getExistingDirectory(self.parent, "Select Metrics Destination")
+        if not selected_folder: return
+        spans_path = os.path.join(selected_folder, "airadar_spans.jsonl")
+        prom_path = os.path.join(selected_folder, "airadar_metrics.prom")
+        self.logic.metrics.write_jsonl(spans_path)
+        self.logic.metrics.write_prometheus(prom_path)
+        self.statusLabel.setText(f"Metrics exported: {spans_path}, {prom_path}")
+
+    def onCancelTasks(self):
+        for task in list(self.activeTasks):
+            task.cancel()
+
+    def cleanup(self):
+        self.stopPairing()
+        if self.logic:
+            self.logic.shutdown()
+
 # ==============================================================================
 # 3. LOGIC
 # ==============================================================================
 
+def _traced(operation, failed=None):
+    """Logic metodunu metrik span'i olarak kaydeder; False, (False, ...) ya da failed(sonuç) doğruysa başarısız sayılır"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.span(operation) as span:
+                result = fn(self, *args, **kwargs)
+                if failed is not None: is_failed = failed(result)
+                else: is_failed = result is False or (isinstance(result, tuple) and result and result[0] is False)
+                if is_failed: span.status = "failed"
+                return result
+        return wrapper
+    return decorate
+
+
 class AIRadarLogic(ScriptedLoadableModuleLogic):
     
     MASTER_PUBLIC_SESSION_ID = "PUBLIC_SHARED_ACCESS_KEY_2025_V1" 
@@ -450,110 +1000,561 @@ class AIRadarLogic(ScriptedLoadableModuleLogic):
     ENDPOINT_IMAGE = "/datastore/image"
     ENDPOINT_LABEL = "/datastore/label"
 
+    CACHE_MAX_BYTES = 4 * 1024 ** 3
+    MAX_WORKERS = 4
+    HTTP_POOL_MAXSIZE = 16
+    FETCH_WORKERS = 8
+    STREAM_DECODE = True     # NIfTI indirmelerini loadVolume yerine bellekte çöz
+    RANGE_MIN_BYTES = 32 * 1024 ** 2
+    RANGE_SEGMENT_BYTES = 16 * 1024 ** 2
+    RANGE_PARALLEL = 4
+    UPLOAD_GZIP_LEVEL = 3    # 0 = sıkıştırmasız .nii gönderir
+    DATASTORE_MAX_AGE = 300  # saniye; daha eski görüntü koşullu istekle yenilenir
+    UPLOAD_BLOCK_BYTES = 4 * 1024 ** 2
+    UPLOAD_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+    CACHE_DOWNLOADS = True   # akış halindeki indirmeleri önbelleğe de yaz
+    PATIENTS_PAGE_SIZE = 500
+    BATCH_UPLOAD_WORKERS = 4
+    IMAGE_READY_TIMEOUT = 15.0
+    UPLOAD_EXTENSIONS = (".nii.gz", ".nii", ".nrrd", ".mha", ".mhd")
+    EXPORT_WORKERS = 6
+    EXPORT_MANIFEST = "airadar_export_manifest.json"
+    PREFETCH_AHEAD = 3       # seçili hastadan sonra önceden indirilecek hasta sayısı
+    PREFETCH_WORKERS = 2
+    PREFETCH_MAX_BPS = 8 * 1024 * 1024
+    LABEL_ENCODING = "full"  # "full", "cropped" ya da "auto" (kırpılmış kutu yeterince küçükse kırp)
+    LABEL_CROP_RATIO = 0.25  # auto: kutu referans hacmin en fazla bu kadarıysa kırpılmış gönderilir
+    LABEL_SKIP_MAX_AGE = 30  # saniye; "değişmedi" kararı bundan eski görüntüyle verilmez, önce yenilenir
+    PROGRESSIVE_LOAD = True  # tam çözünürlük inerken düşük çözünürlüklü önizleme göster
+    PREVIEW_MAX_VOXELS = 128 ** 3
+    PREVIEW_INTERVAL = 1.0   # saniye; akış sırasında önizlemenin en sık yenilenme aralığı
+    RENDER_PROFILE = "balanced"  # AIRadarRenderProfile.PROFILES anahtarlarından biri
+    # HoloLens yüzey ayrıntı düzeyleri: kapalı yüzey dönüşümünün seyreltme ve yumuşatma oranları
+    HOLO_MESH_LEVELS = {
+        "low": {"decimation": 0.9, "smoothing": 0.6},
+        "medium": {"decimation": 0.7, "smoothing": 0.4},
+        "high": {"decimation": 0.3, "smoothing": 0.2},
+    }
+    HOLO_MESH_LEVEL = "medium"
+    HOLO_HIDE_VOLUME_RENDERING = True  # yüzeyler gösterilirken ağır volume rendering kapatılır
+    CASE_POOL_MAX_BYTES = 2 * 1024 ** 3  # sahnede gizli tutulan son vakaların bellek bütçesi
+    CASE_POOL_MAX_CASES = 6              # 0: havuz kapalı, her yüklemede sahne temizlenir
+    METRICS_WINDOW = 1024            # işlem başına histogramda tutulan son ölçüm sayısı
+    METRICS_JSONL_PATH = None        # verilirse her span bu JSON-lines dosyasına eklenir
+    METRICS_PROMETHEUS_PATH = None   # verilirse özet bu Prometheus textfile'a yazılır
+
+    def __init__(self):
+        ScriptedLoadableModuleLogic.__init__(self)
+        self.metrics = AIRadarMetrics(window=self.METRICS_WINDOW, jsonl_path=self.METRICS_JSONL_PATH,
+                                      prometheus_path=self.METRICS_PROMETHEUS_PATH)
+        self.cache = AIRadarVolumeCache(max_bytes=self.CACHE_MAX_BYTES)
+        self.metadata = AIRadarMetadataStore(os.path.join(os.path.dirname(self.cache.cache_dir), "metadata.sqlite"))
+        self.cache.observe(self.metadata.cache_changed)
+        self.http = AIRadarHttpClient(pool_maxsize=self.HTTP_POOL_MAXSIZE)
+        self.tasks = AIRadarTaskEngine(max_workers=self.MAX_WORKERS)
+        self._fetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.FETCH_WORKERS, thread_name_prefix="AIRadarFetch")
+        self.stream_decode = self.STREAM_DECODE
+        self.upload_compression_level = self.UPLOAD_GZIP_LEVEL
+        self.label_encoding = self.LABEL_ENCODING
+        self.progressive_load = self.PROGRESSIVE_LOAD
+        self.render_profile = self.RENDER_PROFILE
+        self.render_stats = AIRadarFrameStats(os.path.join(os.path.dirname(self.cache.cache_dir), "render_stats.json"))
+        self._render_observers = {}
+        self.hololens_mesh_level = self.HOLO_MESH_LEVEL
+        self.meshes = AIRadarMeshCache(os.path.join(os.path.dirname(self.cache.cache_dir), "meshes"))
+        self.case_pool = AIRadarCasePool(max_bytes=self.CASE_POOL_MAX_BYTES, max_cases=self.CASE_POOL_MAX_CASES)
+        self.datastore = AIRadarDatastoreIndex(os.path.join(os.path.dirname(self.cache.cache_dir), "datastore"),
+                                               on_change=self.metadata.datastore_changed)
+        self.downloader = AIRadarRangeDownloader(self.http, self.cache, min_bytes=self.RANGE_MIN_BYTES,
+                                                 segment_bytes=self.RANGE_SEGMENT_BYTES, parallel=self.RANGE_PARALLEL)
+        self.cache_downloads = self.CACHE_DOWNLOADS
+        self._image_info_supported = {}
+        self.prefetcher = AIRadarPrefetcher(self, workers=self.PREFETCH_WORKERS, max_bps=self.PREFETCH_MAX_BPS)
+
+    def shutdown(self):
+        """Logic'in tüm işçilerini ve gözlemcilerini durdurur, bağlantılarını kapatır"""
+        self.prefetcher.shutdown()
+        self.stop_render_observers()
+        self.case_pool.shutdown()
+        self.render_stats.save()
+        self.tasks.shutdown()
+        self._fetch_executor.shutdown(wait=False, cancel_futures=True)
+        self.http.close()
+        self.metadata.close()
+
+    def cache_stats(self):
+        """Yerel volume önbelleğinin isabet/ıska istatistikleri"""
+        return self.cache.stats()
+
+    def metrics_summary(self):
+        """İzlenen her işlem ve aşama için sayı, p50/p95/ortalama ms, bayt ve hız"""
+        return self.metrics.summary()
+
+    def connection_stats(self):
+        """HTTP istemcisinin sunucu başına istek, yeni bağlantı ve yeniden kullanım sayaçları"""
+        return self.http.stats()
+
+    def start_pairing(self, base_url, device_code, on_event):
+        """device_code'u portala kaydeder ve girişini arka planda bekler; AIRadarPairing döndürür"""
+        return AIRadarPairing(self.http, base_url, device_code, on_event, self.tasks.post_to_main_thread).start()
+
+    def check_session(self, base_url, device_code, sis_id, task=None):
+        """Sürdürülen oturumun portalda hâlâ geçerli olup olmadığı: True/False, portala ulaşılamazsa None"""
+        if not device_code: return False
+        try:
+            resp = self.http.get(f"{base_url.rstrip('/')}/api/check-session/{device_code}", call_type="poll", task=task)
+            with resp:
+                if resp.status_code == 200: data = resp.json()
+                elif resp.status_code in (401, 403, 404, 410): return False
+                else: return None
+        except AIRadarCancelled: raise
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Session check failed: {e}")
+            return None
+        return AIRadarPairing.is_logged_in(data) and str(data.get("sis_id")) == str(sis_id)
+
+    def _on_main(self, fn, *args, **kwargs):
+        """Sahneyi değiştiren adımı GUI thread'inde çalıştırır (zaten oradaysa doğrudan)"""
+        return self.tasks.call_in_main_thread(fn, *args, **kwargs)
+
+    def _fetch_concurrently(self, jobs, task=None, fetch=None):
+        """(ad, url, cache_key, params, phase) işlerini paralel indirir; (ad, future) bitiş sırasıyla döner"""
+        fetch = fetch or self._fetch_to_cache
+        futures = {}
+        for name, url, cache_key, params, phase in jobs:
+            future = self._fetch_executor.submit(self.metrics.bind(fetch), url, cache_key, params=params, task=task, phase=phase, channel=name)
+            futures[future] = name
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                yield futures[future], future
+        finally:
+            for future in futures: future.cancel()
+
+    def _open_download(self, url, cache_key, params=None, task=None, use_cache=True):
+        """İndirme isteği gönderir (önbellekte kopya varsa koşullu); (yanıt, önbellek yolu, durum kodu) döndürür"""
+        entry = self.cache.lookup(cache_key) if use_cache else None
+        headers = self.cache.validators(entry)
+        try:
+            with self.metrics.span("http.request", kind=cache_key[2], conditional=bool(headers)) as span:
+                resp = self.http.get(url, call_type="download", params=params, headers=headers, stream=True, task=task)
+                span.set(status_code=resp.status_code)
+        except AIRadarCancelled: raise
+        except Exception as e:
+            if entry:
+                print(f"   -> Revalidation failed, using cached copy: {e}")
+                self.cache.record_hit(cache_key, stale=True)
+                return None, entry["path"], 200
+            raise
+
+        if resp.status_code == 304 and entry:
+            resp.close()
+            self.cache.record_hit(cache_key)
+            return None, entry["path"], 200
+        if resp.status_code != 200:
+            resp.close()
+            if not entry: self.cache.record_miss(cache_key)
+            elif resp.status_code == 404: self.cache.invalidate(cache_key)
+            return None, None, resp.status_code
+
+        self.cache.record_miss(cache_key)
+        return resp, None, 200
+
+    def _iter_download(self, resp, task=None, phase=None, channel=None, throttle=None):
+        """Yanıt gövdesini parça parça verir; ilerleme bildirir, iptali ve throttle'ı uygular"""
+        total = int(resp.headers.get("Content-Length") or 0) or None
+        done = 0
+        waited = 0.0  # yalnızca ağdan parça beklenen süre; tüketicinin işi (çözme, yazma) sayılmaz
+        chunks = resp.iter_content(chunk_size=1024 * 1024)
+        try:
+            while True:
+                started = time.monotonic()
+                chunk = next(chunks, None)
+                waited += time.monotonic() - started
+                if chunk is None: break
+                if task: task.check_cancelled()
+                done += len(chunk)
+                yield chunk
+                if task: task.report_progress(done, total, phase, channel=channel)
+                if throttle: throttle(len(chunk))
+        finally:
+            self.metrics.record("http.body", waited, done, complete=total is None or done >= total)
+
+    def _fetch_to_cache(self, url, cache_key, params=None, task=None, phase=None, channel=None, throttle=None):
+        """url'yi volume önbelleğine indirir (var olan kopyayı doğrulayarak); (yol ya da None, durum kodu) döndürür"""
+        resp, cached_path, status = self._open_download(url, cache_key, params=params, task=task)
+        if resp is None:
+            return cached_path, status
+        return self._download_body(resp, cache_key, task, phase, channel, throttle), 200
+
+    def _download_body(self, resp, cache_key, task=None, phase=None, channel=None, throttle=None):
+        """Açık 200 yanıtını önbelleğe yazar (büyük dosyalar Range segmentleriyle); önbellek yolunu döndürür"""
+        if throttle is None and self.downloader.supports(resp):
+            try:
+                with self.metrics.span("http.range_download", kind=cache_key[2]) as span:
+                    path = self.downloader.download(resp, cache_key, task=task, phase=phase, channel=channel)
+                    span.add_bytes(os.path.getsize(path))
+                return path
+            except AIRadarRangeUnsupported as e:
+                print(f"   -> Range download unavailable ({e}), using a single stream.")
+                resp = self.http.get(resp.url, call_type="download", stream=True, task=task)
+                if resp.status_code != 200:
+                    resp.close()
+                    raise IOError(f"Download failed (Code: {resp.status_code})")
+
+        writer = self.cache.writer(cache_key, etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"))
+        timer = AIRadarPhaseTimer()
+        with writer as f:
+            for chunk in self._iter_download(resp, task, phase, channel, throttle):
+                with timer.measure(len(chunk)): f.write(chunk)
+        self.metrics.record("cache.write", timer.seconds, timer.bytes)
+        return writer.path
+
+    def _fetch_volume(self, url, cache_key, params=None, task=None, phase=None, channel=None, use_cache=None, preview=None):
+        """NIfTI volume'u indirirken bellekte çözer; (AIRadarVolumeData ya da None, durum kodu) döndürür"""
+        if not self.stream_decode:
+            path, status = self._fetch_to_cache(url, cache_key, params=params, task=task, phase=phase, channel=channel)
+            return (AIRadarVolumeData(path=path) if path else None), status
+
+        if use_cache is None: use_cache = self.cache_downloads
+        if preview is not None and use_cache: self._show_stored_preview(cache_key, preview)
+        resp, cached_path, status = self._open_download(url, cache_key, params=params, task=task, use_cache=use_cache)
+        if resp is None:
+            if not cached_path: return None, status
+            return self._with_preview(cache_key, self._decode_file(cached_path, task, preview), preview), status
+        if self.downloader.supports(resp):
+            # Büyük dosyalar: paralel segmentler diske, ardından bellekte çözülür
+            data = self._decode_file(self._download_body(resp, cache_key, task, phase, channel), task, preview)
+            if not self.cache_downloads and data.array is not None: self.cache.invalidate(cache_key)
+            return self._with_preview(cache_key, data, preview), 200
+
+        decoder = AIRadarNiftiDecoder()
+        writer = None
+        f = None
+        pending = []  # sıkıştırılmış ilk parçalar, başlık doğrulanana kadar (diske geri dönüş için)
+        decode_timer, write_timer = AIRadarPhaseTimer(), AIRadarPhaseTimer()
+        with contextlib.ExitStack() as stack:
+            for chunk in self._iter_download(resp, task, phase, channel):
+                if decoder is not None:
+                    try:
+                        with decode_timer.measure(len(chunk)): decoder.feed(chunk)
+                        if preview is not None: preview.update(decoder)
+                    except AIRadarNiftiUnsupported as e:
+                        print(f"   -> In-memory decode unavailable ({e}), falling back to file load.")
+                        decoder = None
+                if f is None and (self.cache_downloads or decoder is None):
+                    writer = self.cache.writer(cache_key, etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"))
+                    f = stack.enter_context(writer)
+                    for part in pending: f.write(part)
+                    pending = []
+                if f is not None:
+                    with write_timer.measure(len(chunk)): f.write(chunk)
+                elif decoder.header is None:
+                    pending.append(chunk)
+                else:
+                    pending = []
+
+        if write_timer.bytes: self.metrics.record("cache.write", write_timer.seconds, write_timer.bytes)
+        if decoder is None:
+            return AIRadarVolumeData(path=writer.path), 200
+        with decode_timer.measure(): data = decoder.finish()
+        self.metrics.record("nifti.decode", decode_timer.seconds, decode_timer.bytes, streamed=True)
+        return self._with_preview(cache_key, data, preview), 200
+
+    def _decode_file(self, path, task=None, preview=None):
+        """Önbellekteki NIfTI dosyasını bellekte çözer, desteklenmiyorsa yol olarak döndürür"""
+        if not self.stream_decode:
+            return AIRadarVolumeData(path=path)
+        decoder = AIRadarNiftiDecoder()
+        try:
+            with self.metrics.span("nifti.decode", streamed=False) as span, open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    if task: task.check_cancelled()
+                    decoder.feed(chunk)
+                    span.add_bytes(len(chunk))
+                    if preview is not None: preview.update(decoder)
+                return decoder.finish()
+        except AIRadarNiftiUnsupported as e:
+            print(f"   -> In-memory decode unavailable ({e}), falling back to file load.")
+            return AIRadarVolumeData(path=path)
+
+    @staticmethod
+    def _preview_key(cache_key):
+        return tuple(cache_key[:2]) + (f"{cache_key[2]}-preview",) + tuple(cache_key[3:])
+
+    def _show_stored_preview(self, cache_key, preview):
+        """Önbellekteki volume'un yanında saklanan düşük çözünürlüklü önizlemeyi gösterir"""
+        entry = self.cache.lookup(self._preview_key(cache_key))
+        if not entry or self.cache.lookup(cache_key) is None: return
+        try:
+            data = self._decode_file(entry["path"])
+            if data.array is not None: preview.show(data)
+        except Exception as e:
+            print(f"   -> Stored preview unavailable: {e}")
+
+    def _with_preview(self, cache_key, data, preview):
+        """Çözülmüş, önbellekteki volume'un düşük çözünürlüklü kopyasını sonraki yükleme için saklar"""
+        if preview is None or data is None or data.array is None: return data
+        try:
+            entry = self.cache.lookup(cache_key)
+            stored = self.cache.lookup(self._preview_key(cache_key))
+            factor = AIRadarVolumeData.preview_factor(data.array.shape, self.PREVIEW_MAX_VOXELS)
+            if entry and factor > 1 and not (stored and stored["created"] >= entry["created"]):
+                encoder = AIRadarNiftiEncoder(data.downsampled(factor))
+                with self.cache.writer(self._preview_key(cache_key)) as f:
+                    for chunk in AIRadarParallelGzip(1, 1).compress(encoder.blocks(self.UPLOAD_BLOCK_BYTES)):
+                        f.write(chunk)
+        except Exception as e:
+            print(f"   -> Preview not stored: {e}")
+        return data
+
+    def _progressive_view(self, name, prepare=None):
+        """name adıyla yüklenen volume için AIRadarProgressiveView; progressive kapalıysa None"""
+        if not self.progressive_load or not self.stream_decode: return None
+        return AIRadarProgressiveView(self.tasks.post_to_main_thread, functools.partial(self._show_progressive, name, prepare),
+                                      self.PREVIEW_MAX_VOXELS, self.PREVIEW_INTERVAL)
+
+    def _show_progressive(self, name, prepare, data, node, final):
+        """Progressive yüklemenin önizlemesini ya da son halini gösterir (yalnızca GUI thread)"""
+        if node is not None:
+            return self._load_volume_data(data, name, node=node)
+        if prepare: prepare()
+        node = self._load_volume_data(data, name)
+        # İlk önizleme: 3D görünüm de hemen düşük çözünürlükle başlar
+        if not final: self.setup_volume_rendering(node)
+        return node
+
+    def _load_volume_data(self, data, name, labelmap=False, node=None):
+        """İndirilen veri için volume düğümü oluşturur ya da veriyi node'a yerleştirir (yalnızca GUI thread)"""
+        with self.metrics.span("scene.load_volume", labelmap=labelmap, swap=node is not None, from_file=bool(data.path)) as span:
+            span.add_bytes(data.nbytes)
+            return self._create_volume_node(data, name, labelmap, node)
+
+    def _create_volume_node(self, data, name, labelmap, node):
+        if data.path and node is not None:
+            loaded = slicer.util.loadVolume(data.path, {"show": False})
+            try:
+                ijkToRAS = vtk.vtkMatrix4x4()
+                loaded.GetIJKToRASMatrix(ijkToRAS)
+                node.SetIJKToRASMatrix(ijkToRAS)
+                node.SetAndObserveImageData(loaded.GetImageData())
+            finally:
+                slicer.mrmlScene.RemoveNode(loaded)
+            return node
+        if data.path:
+            if labelmap: return slicer.util.loadLabelVolume(data.path, {"name": name})
+            return slicer.util.loadVolume(data.path, {"name": name})
+
+        array = data.array
+        if labelmap and array.dtype.kind == "f": array = array.astype(np.int16)
+        array = np.ascontiguousarray(array)
+        nz, ny, nx = array.shape
+        imageData = vtk.vtkImageData()
+        imageData.SetDimensions(nx, ny, nz)
+        # deep=False: vtkImageData numpy tamponunu doğrudan kullanır (kopya yok)
+        scalars = numpy_support.numpy_to_vtk(array.reshape(-1), deep=False)
+        imageData.GetPointData().SetScalars(scalars)
+
+        if node is not None:
+            node.SetIJKToRASMatrix(slicer.util.vtkMatrixFromArray(data.ijk_to_ras))
+            node.SetAndObserveImageData(imageData)
+            return node
+        node = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLLabelMapVolumeNode" if labelmap else "vtkMRMLScalarVolumeNode", name)
+        node.SetIJKToRASMatrix(slicer.util.vtkMatrixFromArray(data.ijk_to_ras))
+        node.SetAndObserveImageData(imageData)
+        node.CreateDefaultDisplayNodes()
+        if labelmap: slicer.util.setSliceViewerLayers(label=node)
+        else: slicer.util.setSliceViewerLayers(background=node, fit=True)
+        return node
+
+    def _fetch_backend_volume(self, url, cache_key, params=None, task=None, phase=None, channel=None, preview=None):
+        """Backend vaka dosyaları için _fetch_volume; önce eşleşen ön indirmeyi devralır"""
+        prefetched = self.prefetcher.claim(cache_key, task)
+        return self._fetch_volume(url, cache_key, params=params, task=task, phase=phase, channel=channel,
+                                  use_cache=True if prefetched else None, preview=preview)
+
+    @staticmethod
+    def backend_image_url(base_url, image_key):
+        return f"{base_url}/monailabel-datastore-image-download?image={image_key}&inline=1"
+
+    @staticmethod
+    def backend_label_url(base_url, image_key, user_tag):
+        return f"{base_url}/monailabel-datastore-label-download?label={image_key}&tag={user_tag}&inline=1"
+
+    def prefetch_patients(self, api_base_url, image_keys, user_tag=None):
+        """Verilen backend vakalarını arka planda önbelleğe indirir; listeden çıkanlar iptal edilir"""
+        self.prefetcher.schedule(api_base_url.rstrip('/'), image_keys, user_tag)
+
+    def prefetch_stats(self):
+        return self.prefetcher.stats()
+
     # --- NEW: BACKEND & HOLOLENS LOGIC ---
     
-    def fetch_backend_patients(self, api_base_url, user_tag=None):
-        """Backend sunucusundan hasta listesini çeker"""
+    @_traced("patients.fetch", failed=lambda result: not result[1])
+    def fetch_backend_patients(self, api_base_url, user_tag=None, task=None, on_page=None):
+        """Backend sunucusundan hasta listesini sayfa sayfa çeker; (hastalar, tam) döndürür"""
+        base_url = api_base_url.rstrip('/')
+        url = f"{base_url}/slicer/patients"
+        patients = []
+        seen = set()
+        complete = False
+        offset = 0
+        params = {'limit': self.PATIENTS_PAGE_SIZE, 'offset': offset}
+        # Parametreleri hazırla: user_tag'i query string olarak ekliyoruz
+        if user_tag:
+            params['user_tag'] = user_tag
         try:
-            base_url = api_base_url.rstrip('/')
-            url = f"{base_url}/slicer/patients"
-            
-            # Parametreleri hazırla: user_tag'i query string olarak ekliyoruz
-            params = {}
-            if user_tag:
-                params['user_tag'] = user_tag
-
-            # [cite_start]Verify=False SSL hatalarını önlemek için [cite: 358]
-            response = requests.get(url, params=params, timeout=5, verify=False)
-            
-            if response.status_code == 200:
+            while True:
+                # [cite_start]Verify=False SSL hatalarını önlemek için [cite: 358] (http istemcisinde ayarlı)
+                response = self.http.get(url, call_type="list", params=params, task=task)
+                if response.status_code != 200:
+                    print(f"Backend Fetch Error: HTTP {response.status_code}")
+                    break
                 data = response.json()
-                return data.get("patients", [])
-            return []
+                raw_page = data.get("patients", [])
+                # Sayfalamayı desteklemeyen sunucu aynı sayfayı tekrar döndürebilir
+                page = [p for p in raw_page if p.get('key') not in seen]
+                seen.update(p.get('key') for p in page)
+                patients.extend(page)
+                # Offset sunucunun döndürdüğü kayıt sayısıyla ilerler (tekrar eden anahtarlar kayıt atlatmaz)
+                offset += len(raw_page)
+                if page and on_page: self.tasks.post_to_main_thread(on_page, page)
+
+                if data.get("next_cursor"):
+                    params['cursor'] = data["next_cursor"]
+                    params.pop('offset', None)
+                elif data.get("has_more") is False or not page or len(raw_page) != self.PATIENTS_PAGE_SIZE:
+                    complete = True
+                    break
+                elif data.get("total") is not None and offset >= int(data["total"]):
+                    complete = True
+                    break
+                else:
+                    params['offset'] = offset
+        except AIRadarCancelled: raise
         except Exception as e:
             print(f"Backend Fetch Error: {e}")
-            return []
+        if complete: self.metadata.store_patients(base_url, str(user_tag or ""), patients)
+        elif patients: print(f"Backend Fetch Error: patient list incomplete after {len(patients)} records")
+        return patients, complete
+
+    def fetch_backend_patient_index(self, api_base_url, user_tag=None, task=None, on_page=None):
+        """fetch_backend_patients ve sonucun arama indeksi (işçide kurulur)"""
+        patients, complete = self.fetch_backend_patients(api_base_url, user_tag, task=task, on_page=on_page)
+        return AIRadarPatientIndex(patients, complete=complete)
+
+    def stored_patient_index(self, api_base_url, user_tag=None, task=None):
+        """api_base_url'den en son çekilen hasta listesinin arama indeksi (ağa çıkmaz)"""
+        return AIRadarPatientIndex(self.metadata.patients(api_base_url.rstrip('/'), str(user_tag or "")))
+
+    def local_patient_keys(self, api_base_url):
+        """Resmi yerel volume önbelleğinde olan backend vakalarının anahtarları"""
+        return self.metadata.local_image_ids("backend", api_base_url.rstrip('/'))
 
-    def download_and_load_patient(self, api_base_url, image_key):
-        """Backend'den resmi indirir, kaydeder ve Slicer'a yükler (Sahneyi Temizler)"""
+    @_traced("case.load_image")
+    def download_and_load_patient(self, api_base_url, image_key, task=None):
+        """Backend'den resmi indirir (önbellek üzerinden), bellekte çözer ve Slicer'a yükler"""
+        view = None
         try:
             base_url = api_base_url.rstrip('/')
-            downloadUrl = f"{base_url}/monailabel-datastore-image-download?image={image_key}&inline=1"
+            downloadUrl = self.backend_image_url(base_url, image_key)
+            case_key = ("image", base_url, image_key)
+            if self._on_main(self.case_pool.activate, case_key):
+                print(f"Loaded from case pool: {image_key}")
+                return True
+            # SAHNEYİ HAZIRLAMA (Önemli!): önceki vaka havuza alınır
+            view = self._progressive_view(str(image_key), prepare=functools.partial(self.case_pool.begin, case_key))
             
             print(f"Downloading from: {downloadUrl}")
-            response = requests.get(downloadUrl, stream=True, verify=False)
+            volume, status = self._fetch_backend_volume(downloadUrl, ("backend", base_url, "image", image_key, None), task=task, phase="Downloading image", preview=view)
             
-            if response.status_code != 200:
-                print(f"Download Error Code: {response.status_code}")
+            if not volume:
+                print(f"Download Error Code: {status}")
+                if view: self._on_main(view.discard)
                 return False
-
-            tempDir = tempfile.gettempdir()
-            localPath = os.path.join(tempDir, f"{image_key}.nii.gz")
-            
-            with open(localPath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            # SAHNEYİ TEMİZLEME (Önemli!)
-            slicer.mrmlScene.Clear(0) 
+            if task: task.check_cancelled()
             
-            loaded_node = slicer.util.loadVolume(localPath)
+            if view:
+                loaded_node = self._on_main(view.finish, volume)
+            else:
+                self._on_main(self.case_pool.begin, case_key)
+                loaded_node = self._on_main(self._load_volume_data, volume, str(image_key))
             if loaded_node:
-                print(f"Loaded: {localPath}")
+                print(f"Loaded: {image_key}")
                 return True
             return False
         except Exception as e:
             print(f"Download/Load Error: {e}")
+            if view: self._on_main(view.discard)
             return False
 
-    def download_patient_with_seg(self, api_base_url, image_key, user_tag):
-        """Hem görüntüyü hem de segmentasyonu indirir ve üst üste bindirir."""
+    @_traced("case.load_with_label")
+    def download_patient_with_seg(self, api_base_url, image_key, user_tag, task=None):
+        """Hem görüntüyü hem de segmentasyonu paralel indirir ve üst üste bindirir"""
         try:
             base_url = api_base_url.rstrip('/')
+            case_key = ("seg", base_url, image_key, user_tag)
+            if self._on_main(self.case_pool.activate, case_key):
+                return True, "Havuzdan yüklendi"
             
-            # 1. ANA GÖRÜNTÜYÜ İNDİR
-            imgUrl = f"{base_url}/monailabel-datastore-image-download?image={image_key}&inline=1"
-            print(f"Downloading Image: {imgUrl}")
-            
-            # Sahneyi Temizle
-            slicer.mrmlScene.Clear(0)
-            
-            # Resmi indir ve kaydet
-            resp_img = requests.get(imgUrl, stream=True, verify=False)
-            if resp_img.status_code == 200:
-                tempDir = tempfile.gettempdir()
-                imgPath = os.path.join(tempDir, f"{image_key}_source.nii.gz")
-                with open(imgPath, 'wb') as f:
-                    for chunk in resp_img.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                
-                # Resmi Slicer'a Yükle
-                imgNode = slicer.util.loadVolume(imgPath)
-                imgNode.SetName(f"{image_key}_Image")
-            else:
-                return False, "Resim indirilemedi."
-
-            # 2. SEGMENTASYONU (LABEL) İNDİR (Opsiyonel)
+            # 1. ANA GÖRÜNTÜ ve 2. SEGMENTASYON (LABEL, Opsiyonel) aynı anda indirilir
             # Not: Label indirmek için user_tag (giriş yapan kullanıcı ID) gereklidir.
-            lblUrl = f"{base_url}/monailabel-datastore-label-download?label={image_key}&tag={user_tag}&inline=1"
+            imgUrl = self.backend_image_url(base_url, image_key)
+            lblUrl = self.backend_label_url(base_url, image_key, user_tag)
+            print(f"Downloading Image: {imgUrl}")
             print(f"Downloading Label: {lblUrl}")
 
-            resp_lbl = requests.get(lblUrl, stream=True, verify=False)
-            
-            if resp_lbl.status_code == 200:
-                lblPath = os.path.join(tempDir, f"{image_key}_label.nii.gz")
-                with open(lblPath, 'wb') as f:
-                    for chunk in resp_lbl.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                
-                # Label'ı "LabelMap" olarak yükle
-                lblNode = slicer.util.loadLabelVolume(lblPath)
-                lblNode.SetName(f"{image_key}_Seg")
-                
-                # Renklendirme ve Görünürlük Ayarı
-                # Label'ın otomatik olarak resmin üzerine oturması gerekir.
-            else:
-                print("Segmentasyon dosyası bulunamadı veya sunucu hatası (Bu normal olabilir).")
+            jobs = [
+                ("image", imgUrl, ("backend", base_url, "image", image_key, None), None, "Downloading image"),
+                ("label", lblUrl, ("backend", base_url, "label", image_key, user_tag), None, "Downloading label"),
+            ]
+            scene_cleared = []
+
+            def clear_scene():
+                if not scene_cleared:
+                    self.case_pool.begin(case_key)
+                    scene_cleared.append(True)
+
+            # Resim önizlemesi (varsa) inerken gösterilir; label tam çözünürlüklü resimden sonra gelir
+            view = self._progressive_view(f"{image_key}_Image", prepare=clear_scene)
+
+            def fetch(url, cache_key, **kwargs):
+                return self._fetch_backend_volume(url, cache_key, preview=view if kwargs.get("channel") == "image" else None, **kwargs)
+
+            imgData = lblData = None
+            for kind, future in self._fetch_concurrently(jobs, task=task, fetch=fetch):
+                if kind == "image":
+                    try:
+                        imgData, status = future.result()
+                    except Exception:
+                        if view: self._on_main(view.discard)
+                        raise
+                    if not imgData:
+                        if view: self._on_main(view.discard)
+                        return False, "Resim indirilemedi."
+                else:
+                    try:
+                        lblData, status = future.result()
+                    except AIRadarCancelled: raise
+                    except Exception as e:
+                        print(f"Label Download Error: {e}")
+                        lblData = None
+                    if not lblData:
+                        print("Segmentasyon dosyası bulunamadı veya sunucu hatası (Bu normal olabilir).")
+                        continue
+                    if imgData is None: continue  # resim gelince yüklenecek
+
+                if task: task.check_cancelled()
+                # Sahneyi ilk dosya hazır olduğunda bir kez temizle
+                self._on_main(clear_scene)
+
+                if kind == "image":
+                    # Resmi Slicer'a Yükle (önizleme gösterildiyse aynı düğüme)
+                    if view: self._on_main(view.finish, imgData)
+                    else: self._on_main(self._load_volume_data, imgData, f"{image_key}_Image")
+                if imgData and lblData:
+                    # Label'ı "LabelMap" olarak yükle; resmin üzerine otomatik oturur
+                    self._on_main(self._load_volume_data, self.restore_label(lblData, imgData), f"{image_key}_Seg", labelmap=True)
+                    lblData = None
 
             return True, "Yüklendi"
 
@@ -561,23 +1562,110 @@ class AIRadarLogic(ScriptedLoadableModuleLogic):
             print(f"Yükleme Hatası: {e}")
             return False, str(e)
 
-    def setup_volume_rendering(self):
-        """Yüklenen volume için 3D rendering ayarlarını yapar"""
+    @_traced("render.setup")
+    def setup_volume_rendering(self, volume_node=None, profile=None):
+        """Yüklenen volume için 3D rendering ayarlarını yapar; rendering display node'unu döndürür"""
         try:
+            profile = AIRadarRenderProfile.get(profile or self.render_profile)
+            volumeNode = volume_node or self._render_target()
+            if not volumeNode or volumeNode.GetImageData() is None: return None
             volRenLogic = slicer.modules.volumerendering.logic()
-            volumeNode = slicer.mrmlScene.GetFirstNodeByClass("vtkMRMLScalarVolumeNode")
-            if volumeNode:
-                displayNode = volRenLogic.CreateDefaultVolumeRenderingNodes(volumeNode)
-                if displayNode:
-                    displayNode.SetVisibility(True)
-                    presets = volRenLogic.GetPresets()
-                    preset = presets.GetItemByName("MR-Default")
+            oldProxy = slicer.mrmlScene.GetNodeByID(volumeNode.GetAttribute("AIRadar.RenderVolumeID") or "")
+            renderNode = self._render_volume(volumeNode, profile)
+            displayNode = volRenLogic.GetFirstVolumeRenderingDisplayNode(renderNode)
+            previous = None
+            if displayNode is not None and not displayNode.IsA(profile.method_class):
+                # Profil yöntemi değişti (GPU <-> CPU): düğüm yeniden kurulur
+                previous, displayNode = displayNode, None
+            created = displayNode is None
+            if created:
+                for node in (volumeNode, oldProxy):
+                    if node and node is not renderNode and previous is None:
+                        previous = volRenLogic.GetFirstVolumeRenderingDisplayNode(node)
+                # Önceki render düğümünün (önizleme, eski kopya ya da yöntem) hacim özellikleri korunur
+                propertyId = previous.GetVolumePropertyNodeID() if previous else None
+                if previous: slicer.mrmlScene.RemoveNode(previous)
+                volRenLogic.SetDefaultRenderingMethod(profile.method_class)
+                displayNode = volRenLogic.CreateDefaultVolumeRenderingNodes(renderNode)
+                if propertyId:
+                    displayNode.SetAndObserveVolumePropertyNodeID(propertyId)
+                else:
+                    preset = volRenLogic.GetPresets().GetItemByName(profile.preset_for(self.volume_modality(volumeNode)))
                     if preset:
                         displayNode.GetVolumePropertyNode().Copy(preset)
-                    slicer.util.resetThreeDViews()
+                displayNode.SetVisibility(True)
+            self._apply_render_profile(profile)
+            if oldProxy and renderNode is volumeNode:
+                slicer.mrmlScene.RemoveNode(oldProxy)
+                volumeNode.RemoveAttribute("AIRadar.RenderVolumeID")
+            self._observe_render_times()
+            if created and not previous: slicer.util.resetThreeDViews()
+            return displayNode
         except Exception as e:
             print(f"Volume Rendering Error: {e}")
+            return None
+
+    def _render_target(self):
+        """Aktif arka plan volume'u, yoksa rendering kopyası olmayan ilk skaler volume"""
+        selection = slicer.app.applicationLogic().GetSelectionNode()
+        node = slicer.mrmlScene.GetNodeByID(selection.GetActiveVolumeID()) if selection and selection.GetActiveVolumeID() else None
+        if node and not node.GetAttribute("AIRadar.RenderVolumeFor"): return node
+        for node in slicer.util.getNodesByClass("vtkMRMLScalarVolumeNode"):
+            if not node.GetAttribute("AIRadar.RenderVolumeFor"): return node
+        return None
+
+    @staticmethod
+    def volume_modality(volume_node):
+        """Biliniyorsa DICOM modalitesi, yoksa değer aralığına göre CT ya da MR"""
+        modality = volume_node.GetAttribute("DICOM.Modality")
+        if modality: return modality.upper()
+        low, high = volume_node.GetImageData().GetScalarRange()
+        return "CT" if low <= -500 and high >= 300 else "MR"
 
+    def _render_volume(self, volume_node, profile):
+        """profile.max_voxels'e sığıyorsa volume_node, sığmıyorsa seyreltilmiş gizli bir kopyası"""
+        shape = volume_node.GetImageData().GetDimensions()[::-1]
+        factor = AIRadarVolumeData.preview_factor(shape, profile.max_voxels)
+        proxy = slicer.mrmlScene.GetNodeByID(volume_node.GetAttribute("AIRadar.RenderVolumeID") or "")
+        if factor == 1: return volume_node
+        source_mtime = str(volume_node.GetImageData().GetMTime())
+        if proxy and proxy.GetAttribute("AIRadar.RenderFactor") == str(factor) and proxy.GetAttribute("AIRadar.SourceMTime") == source_mtime:
+            return proxy
+        if proxy is None:
+            proxy = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScalarVolumeNode", f"{volume_node.GetName()}_VR")
+            proxy.SetHideFromEditors(True)
+            proxy.SetAttribute("AIRadar.RenderVolumeFor", volume_node.GetID())
+            volume_node.SetAttribute("AIRadar.RenderVolumeID", proxy.GetID())
+        data = self._volume_payload(volume_node).downsampled(factor)
+        self._load_volume_data(data, proxy.GetName(), node=proxy)
+        proxy.SetAttribute("AIRadar.RenderFactor", str(factor))
+        proxy.SetAttribute("AIRadar.SourceMTime", source_mtime)
+        print(f"   -> Rendering {volume_node.GetName()} at 1/{factor} resolution ({data.array.size} voxels, profile {profile.name})")
+        return proxy
+
+    def _apply_render_profile(self, profile):
+        for viewNode in slicer.util.getNodesByClass("vtkMRMLViewNode"):
+            viewNode.SetVolumeRenderingQuality(slicer.vtkMRMLViewNode.Adaptive if profile.adaptive else slicer.vtkMRMLViewNode.Normal)
+            viewNode.SetExpectedFPS(profile.target_fps)
+        self.render_stats.start(profile.name)
+
+    def _observe_render_times(self):
+        """3D görünümlerin her karesinin render süresini render_stats'a kaydeder"""
+        layoutManager = slicer.app.layoutManager()
+        if not layoutManager: return
+        for i in range(layoutManager.threeDViewCount):
+            renderWindow = layoutManager.threeDWidget(i).threeDView().renderWindow()
+            if renderWindow in self._render_observers: continue
+            renderer = renderWindow.GetRenderers().GetFirstRenderer()
+            tag = renderWindow.AddObserver(vtk.vtkCommand.EndEvent, lambda caller, event, renderer=renderer: self.render_stats.record(renderer.GetLastRenderTimeInSeconds()))
+            self._render_observers[renderWindow] = tag
+
+    def stop_render_observers(self):
+        for renderWindow, tag in self._render_observers.items():
+            renderWindow.RemoveObserver(tag)
+        self._render_observers = {}
+
+    @_traced("hololens.connect")
     def connect_to_hololens(self, ip_address):
         """Slicer VR modülünü kullanarak HoloLens'e bağlanır"""
         try:
@@ -599,203 +1687,832 @@ class AIRadarLogic(ScriptedLoadableModuleLogic):
             print(f"VR Connection Error: {e}")
             return False, f"VR Error: {e}"
 
+    def has_hololens_label(self, prepared=False):
+        """Sahnede HoloLens yüzeyleri için segmentasyon ya da labelmap var mı (prepared=True: hazırlanmış olan)"""
+        if prepared:
+            return any(node.GetAttribute("AIRadar.MeshLevel") for node in slicer.util.getNodesByClass("vtkMRMLSegmentationNode"))
+        return bool(slicer.mrmlScene.GetFirstNodeByClass("vtkMRMLSegmentationNode") or slicer.mrmlScene.GetFirstNodeByClass("vtkMRMLLabelMapVolumeNode"))
+
+    @_traced("hololens.prepare_meshes")
+    def prepare_hololens_scene(self, case_key=None, level=None, task=None):
+        """Segmentasyonu HoloLens için sadeleştirilmiş yüzeyler olarak gösterir; (başarı, mesaj) döndürür"""
+        level = level or self.hololens_mesh_level
+        settings = self.HOLO_MESH_LEVELS[level]
+        prepared = self._on_main(self._holo_segmentation, case_key, level)
+        if prepared is None: return False, "Segmentasyon bulunamadı."
+        node_id, key, segmentation = prepared
+
+        started = time.monotonic()
+        meshes = self.meshes.load(key)
+        cached = meshes is not None
+        if not cached:
+            if task: task.report_progress(0, None, f"Yüzeyler oluşturuluyor ({level})")
+            meshes = self._build_meshes(segmentation, settings)
+            if task: task.check_cancelled()
+            self.meshes.store(key, meshes)
+        triangles = self._on_main(self._apply_meshes, node_id, meshes, level, settings)
+        source = "önbellekten" if cached else f"{time.monotonic() - started:.1f} sn'de oluşturuldu"
+        return True, f"✅ Yüzeyler hazır: {level}, {triangles} üçgen ({source})"
+
+    def _holo_segmentation(self, case_key, level):
+        """Sahnedeki vakanın (segmentasyon node id, mesh önbellek anahtarı, vtkSegmentation kopyası) (GUI thread)"""
+        segmentationNode = slicer.mrmlScene.GetFirstNodeByClass("vtkMRMLSegmentationNode")
+        if segmentationNode is None:
+            labelNode = slicer.mrmlScene.GetFirstNodeByClass("vtkMRMLLabelMapVolumeNode")
+            if labelNode is None: return None
+            segmentationNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLSegmentationNode", f"{labelNode.GetName()}_Segments")
+            segmentationNode.CreateDefaultDisplayNodes()
+            slicer.modules.segmentations.logic().ImportLabelmapToSegmentationNode(labelNode, segmentationNode)
+            # Dilimlerde aynı etiket iki kez görünmesin
+            slicer.util.setSliceViewerLayers(label=None)
+        digest = hashlib.sha256(json.dumps(self._label_digest(segmentationNode, None), sort_keys=True).encode("utf-8")).hexdigest()
+        segmentation = slicer.vtkSegmentation()
+        segmentation.DeepCopy(segmentationNode.GetSegmentation())
+        return segmentationNode.GetID(), (case_key or segmentationNode.GetName(), level, digest), segmentation
+
+    @staticmethod
+    def _build_meshes(segmentation, settings):
+        """Bağımsız bir vtkSegmentation'ı kapalı yüzeylere çevirir; {segment id: vtkPolyData}"""
+        closedSurface = slicer.vtkSegmentationConverter.GetSegmentationClosedSurfaceRepresentationName()
+        segmentation.SetConversionParameter("Decimation factor", str(settings["decimation"]))
+        segmentation.SetConversionParameter("Smoothing factor", str(settings["smoothing"]))
+        segmentation.CreateRepresentation(closedSurface, True)
+        meshes = {}
+        for i in range(segmentation.GetNumberOfSegments()):
+            segmentId = segmentation.GetNthSegmentID(i)
+            polyData = segmentation.GetSegment(segmentId).GetRepresentation(closedSurface)
+            if polyData is None: continue
+            mesh = vtk.vtkPolyData()
+            mesh.DeepCopy(polyData)
+            meshes[segmentId] = mesh
+        return meshes
+
+    def _apply_meshes(self, node_id, meshes, level, settings):
+        """Yüzeyleri kapalı yüzey temsili olarak yerleştirip 3D'de gösterir; üçgen sayısını döndürür (GUI thread)"""
+        segmentationNode = slicer.mrmlScene.GetNodeByID(node_id)
+        if segmentationNode is None: return 0
+        segmentation = segmentationNode.GetSegmentation()
+        closedSurface = slicer.vtkSegmentationConverter.GetSegmentationClosedSurfaceRepresentationName()
+        # Slicer kendisi yeniden dönüştürürse de aynı düzeyi kullansın
+        segmentation.SetConversionParameter("Decimation factor", str(settings["decimation"]))
+        segmentation.SetConversionParameter("Smoothing factor", str(settings["smoothing"]))
+        triangles = 0
+        for segmentId, mesh in meshes.items():
+            segment = segmentation.GetSegment(segmentId)
+            if segment is None: continue
+            segment.AddRepresentation(closedSurface, mesh)
+            triangles += mesh.GetNumberOfPolys()
+        segmentationNode.CreateDefaultDisplayNodes()
+        displayNode = segmentationNode.GetDisplayNode()
+        displayNode.SetPreferredDisplayRepresentationName3D(closedSurface)
+        displayNode.SetVisibility3D(True)
+        segmentationNode.SetAttribute("AIRadar.MeshLevel", level)
+        if self.HOLO_HIDE_VOLUME_RENDERING and meshes:
+            for renderingNode in slicer.util.getNodesByClass("vtkMRMLVolumeRenderingDisplayNode"):
+                renderingNode.SetVisibility(False)
+        return triangles
+
     # --- EXISTING: MONAI LOGIC ---
 
-    def fetch_all_images(self, url, current_user_session_id=None):
+    @_traced("datastore.sync")
+    def fetch_all_images(self, url, current_user_session_id=None, task=None, max_age=None, scope="mine"):
+        """Kapsamdaki veri setlerini listeler; max_age'den eski datastore snapshot'ı önce koşullu istekle yenilenir"""
         print(f"\n--- SYNCING MONAI DATASETS (User: {current_user_session_id}) ---")
         try:
             base_url = url.rstrip('/')
             target_url = f"{base_url}{self.ENDPOINT_DATASTORE}"
             all_files = set() 
+            max_age = self.DATASTORE_MAX_AGE if max_age is None else max_age
 
-            try:
-                params = {
-                    'output': 'all',
-                    'token': current_user_session_id,
-                    'client_id': current_user_session_id
-                }
-                resp = requests.get(target_url, params=params, timeout=10, verify=False)
-                
-                if resp.status_code == 200:
-                    full_data = resp.json()
-                    if current_user_session_id:
-                        self._filter_and_add(full_data, all_files, mode="private", user_id=current_user_session_id)
-                else:
-                    print(f"   -> Server Sync Error: Status {resp.status_code}")
-            except Exception as e:
-                print(f"   -> Connection Error: {e}")
+            snapshot = self.datastore.get(base_url, current_user_session_id)
+            if snapshot and snapshot.age() <= max_age:
+                print(f"   -> Using local datastore snapshot ({len(snapshot.objects)} objects, {snapshot.age():.0f}s old)")
+            else:
+                try:
+                    params = {
+                        'output': 'all',
+                        'token': current_user_session_id,
+                        'client_id': current_user_session_id
+                    }
+                    headers = snapshot.validators() if snapshot else {}
+                    resp = self.http.get(target_url, call_type="list", params=params, headers=headers, task=task)
+                    
+                    if resp.status_code == 304 and snapshot:
+                        snapshot = self.datastore.touch(base_url, current_user_session_id)
+                        print("   -> Datastore unchanged (304).")
+                    elif resp.status_code == 200:
+                        snapshot, changes = self.datastore.replace(base_url, current_user_session_id, resp.json(),
+                                                                   etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"))
+                        print(f"   -> Datastore synced: +{changes['added']} -{changes['removed']} ~{changes['changed']}")
+                    else:
+                        print(f"   -> Server Sync Error: Status {resp.status_code}")
+                except AIRadarCancelled: raise
+                except Exception as e:
+                    print(f"   -> Connection Error: {e}")
+                    if snapshot: print("   -> Showing last known datastore snapshot.")
+
+            if snapshot and current_user_session_id:
+                all_files.update(self.datastore_ids(base_url, current_user_session_id, scope, snapshot))
 
             final_list = list(all_files)
             final_list.sort()
             print(f"--- SYNC COMPLETE: {len(final_list)} datasets visible. ---")
             return final_list
+        except AIRadarCancelled: raise
         except Exception as e:
             print(f"Critical Logic Error: {e}")
             return []
 
-    def _filter_and_add(self, data, file_set, mode="public", user_id=None):
+    def datastore_ids(self, base_url, user, scope="mine", snapshot=None):
+        """Kapsamdaki ("mine", "public", "all") veri setlerinin id'leri, yerel metadata deposundan"""
         try:
-            objects_map = {} 
-            if isinstance(data, dict):
-                raw = data.get("objects", data)
-                if isinstance(raw, dict): objects_map = raw
-                elif isinstance(raw, list):
-                    for item in raw:
-                        if isinstance(item, dict):
-                            name = item.get('id') or item.get('image') or item.get('name')
-                            if name: objects_map[name] = item
-            elif isinstance(data, list):
-                for item in data:
-                    if isinstance(item, dict):
-                        name = item.get('id') or item.get('image') or item.get('name')
-                        if name: objects_map[name] = item
-            
-            for filename, details in objects_map.items():
-                if not isinstance(filename, str) or "{" in filename: continue
-                
-                meta_client_id = details.get('client_id') 
-                meta_uploaded_by = None
-                
-                raw_params = details.get('params') or details.get('info')
-                if raw_params:
-                    try:
-                        p_dict = raw_params if isinstance(raw_params, dict) else json.loads(raw_params)
-                        meta_uploaded_by = p_dict.get('uploaded_by') or p_dict.get('session_id')
-                    except: pass
-
-                if mode == "private" and user_id:
-                    is_owner = False
-                    if str(meta_client_id) == str(user_id): is_owner = True
-                    elif str(meta_uploaded_by) == str(user_id): is_owner = True
-                    
-                    if not is_owner:
-                        image_labels = details.get('labels')
-                        if image_labels and isinstance(image_labels, dict) and str(user_id) in image_labels:
-                            is_owner = True
-                        elif str(details.get('tag')) == str(user_id):
-                            is_owner = True
-                    
-                    if is_owner: file_set.add(filename)
+            if snapshot is not None and not self.metadata.ensure_datastore(base_url, user, snapshot):
+                raise sqlite3.OperationalError("datastore listing could not be indexed")
+            if scope == "all": return self.metadata.dataset_ids(base_url, user)
+            if scope == "public": return self.metadata.dataset_ids(base_url, user, public=True)
+            return self.metadata.dataset_ids(base_url, user, owner=user)
+        except sqlite3.Error as e:
+            print(f"   -> Metadata store query failed ({e}), using the datastore snapshot.")
+            if snapshot is None: snapshot = self.datastore.get(base_url, user)
+            if snapshot is None: return []
+            index = snapshot.owner_index()
+            return sorted(index.names() if scope == "all" else index.public() if scope == "public" else index.owned_by(user))
 
+    def _filter_and_add(self, data, file_set, mode="public", user_id=None):
+        try:
+            if mode == "private" and user_id:
+                objects_map = AIRadarDatastoreIndex.objects_map(data)
+                file_set.update(AIRadarOwnerIndex(objects_map).owned_by(user_id))
         except Exception as e:
             print(f"   -> Filter Error: {e}")
 
-    def process_upload(self, server_url, raw_image_name, is_public, image_node, label_node, is_new_patient, user_session_id, user_tag):
+    @_traced("upload.case")
+    def process_upload(self, server_url, raw_image_name, is_public, image_node, label_node, is_new_patient, user_session_id, user_tag, task=None):
         print(f"\n--- UPLOAD STARTED ---")
         active_session_id = user_session_id
         final_image_id = raw_image_name 
 
         if is_new_patient:
             print("   -> Step 1: Uploading Source Image...")
-            success_img, msg_img = self.upload_image(server_url, final_image_id, image_node, active_session_id, is_public=is_public)
+            success_img, msg_img = self.upload_image(server_url, final_image_id, image_node, active_session_id, is_public=is_public, task=task)
             if not success_img: return False, f"Image Upload Failed: {msg_img}"
-            time.sleep(1.0) 
+            if task: task.check_cancelled()
+            if not self.wait_for_image(server_url, final_image_id, task=task):
+                print("   -> Image not visible in the datastore yet, uploading label anyway.")
 
         print("   -> Step 2: Uploading Segmentation...")
-        success_lbl, msg_lbl = self.upload_label(server_url, final_image_id, user_tag, label_node, image_node, active_session_id, is_public)
+        label_meta = {}
+        transport = {}
+        success_lbl, msg_lbl = self.upload_label(server_url, final_image_id, user_tag, label_node, image_node, active_session_id, is_public, task=task, meta_out=label_meta, report=transport, force=is_new_patient)
         
         if not success_lbl: return False, f"Label Upload Failed: {msg_lbl}"
-        return True, f"Successfully Uploaded: {final_image_id}"
 
-    def upload_image(self, server_url, image_id, image_node, session_id, is_public=False):
-        temp_path = None
+        # Yerel datastore görüntüsünü tam senkronizasyon yapmadan güncelle
+        self.datastore.record_upload(server_url.rstrip('/'), active_session_id, final_image_id,
+                                     image_info={"uploaded_by": active_session_id, "ispublic": is_public} if is_new_patient else None,
+                                     label_tag=user_tag, label_info=label_meta)
+        return True, f"Successfully Uploaded: {final_image_id} (label {self.format_transport(transport)})"
+
+    def wait_for_image(self, server_url, image_id, task=None, timeout=None):
+        """Datastore image_id'yi sunana kadar bekler; timeout içinde gelmezse False"""
+        base_url = server_url.rstrip('/')
+        deadline = time.monotonic() + (self.IMAGE_READY_TIMEOUT if timeout is None else timeout)
+        delay = 0.05
+        while True:
+            if task: task.check_cancelled()
+            try:
+                if self._image_info_supported.get(base_url, True):
+                    resp = self.http.get(f"{base_url}{self.ENDPOINT_IMAGE}/info", call_type="poll", retry=False, params={'image': image_id})
+                    with resp:
+                        if resp.status_code == 200 and resp.json(): return True
+                        if resp.status_code in (404, 405) and self._is_missing_route(resp):
+                            self._image_info_supported[base_url] = False
+                            continue
+                else:
+                    resp = self.http.get(f"{base_url}{self.ENDPOINT_IMAGE}", call_type="poll", retry=False, params={'image': image_id}, stream=True)
+                    with resp:
+                        if resp.status_code == 200: return True
+            except AIRadarCancelled: raise
+            except Exception as e:
+                print(f"   -> Readiness check failed: {e}")
+            if time.monotonic() + delay > deadline: return False
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    @staticmethod
+    def _is_missing_route(resp):
+        """FastAPI'nin bilinmeyen route yanıtı ({"detail": "Not Found"}) ise True"""
+        try: return resp.json().get("detail") in ("Not Found", "Method Not Allowed")
+        except Exception: return False
+
+    # --- BATCH UPLOAD ---
+
+    def collect_directory_upload_cases(self, directory, include_unpaired_labels=False):
+        """Klasördeki (alt klasörler dahil) görüntü dosyalarını etiket dosyalarıyla eşleştirir"""
+        images, labels = {}, {}
+        for root, _, files in os.walk(directory):
+            label_dir = os.path.basename(root).lower().startswith(("label", "segmentation"))
+            for fname in sorted(files):
+                lower = fname.lower()
+                ext = next((e for e in self.UPLOAD_EXTENSIONS if lower.endswith(e)), None)
+                if not ext: continue
+                stem = fname[:-len(ext)]
+                case_id, is_label = stem, label_dir
+                if stem.lower().startswith("label_"):
+                    case_id, is_label = stem[6:], True
+                for suffix in ("_seg", "_label", "-label", "_mask", ".seg"):
+                    if stem.lower().endswith(suffix):
+                        case_id, is_label = stem[:-len(suffix)], True
+                        break
+                (labels if is_label else images).setdefault(case_id, os.path.join(root, fname))
+        cases = [{"image_id": case_id, "image": path, "label": labels.get(case_id)} for case_id, path in sorted(images.items())]
+        if include_unpaired_labels:
+            cases += [{"image_id": case_id, "image": None, "label": path} for case_id, path in sorted(labels.items()) if case_id not in images]
+        return cases
+
+    def collect_scene_upload_cases(self):
+        """Sahnedeki her skaler volume için, ona bağlı etiketle bir vaka (yalnızca GUI thread)"""
+        labelmaps = {node.GetName(): node for node in slicer.util.getNodesByClass("vtkMRMLLabelMapVolumeNode")}
+        segmentations = {}
+        for seg in slicer.util.getNodesByClass("vtkMRMLSegmentationNode"):
+            ref = seg.GetNodeReference(seg.GetReferenceImageGeometryReferenceRole())
+            if ref is not None: segmentations.setdefault(ref.GetID(), seg)
+        cases = []
+        for node in slicer.util.getNodesByClass("vtkMRMLScalarVolumeNode"):
+            if node.IsA("vtkMRMLLabelMapVolumeNode"): continue
+            name = node.GetName()
+            label = segmentations.get(node.GetID()) or labelmaps.get(f"{name}_Seg") or labelmaps.get(f"{name}-label")
+            cases.append({"image_id": name, "image": node.GetID(), "label": label.GetID() if label else None})
+        return cases
+
+    def _case_source(self, source):
+        """Manifest kaydının yükleme kaynağı: dosya yolları olduğu gibi, node id'ler sahneden çözülür"""
+        if source is None or os.path.isfile(source): return source
+        node = self._on_main(slicer.mrmlScene.GetNodeByID, source)
+        if node is None: raise IOError(f"{source} is neither a file nor a node in the scene")
+        return node
+
+    @_traced("upload.batch")
+    def batch_upload(self, server_url, cases, is_public, is_new_patient, user_session_id, user_tag, manifest_path, task=None, on_result=None):
+        """Vakaları paralel yükler ve manifest'e yazar; (yüklenen, başarısız, manifest yolu) döndürür"""
+        server_url = server_url.rstrip('/')
+        manifest = self._read_manifest(manifest_path) or {}
+        manifest.update({"server": server_url, "is_public": is_public, "is_new_patient": is_new_patient,
+                         "session_id": user_session_id, "user_tag": user_tag})
+        entries = {entry["image_id"]: entry for entry in manifest.get("cases", [])}
+        for case in cases:
+            entry = entries.setdefault(case["image_id"], {"image_id": case["image_id"], "status": "pending", "attempts": 0})
+            entry.update(image=case.get("image"), label=case.get("label"))
+        manifest["cases"] = list(entries.values())
+        pending = [entry for entry in manifest["cases"] if entry["status"] != "ok"]
+        lock = threading.Lock()
+        self._write_manifest(manifest_path, manifest, lock)
+        print(f"\n--- BATCH UPLOAD: {len(pending)} case(s) -> {server_url} ---")
+
+        def upload_case(entry):
+            started = time.monotonic()
+            result = {"status": "failed", "error": None, "image_status": None, "label_status": None}
+            try:
+                if task: task.check_cancelled()
+                image = self._case_source(entry.get("image"))
+                label = self._case_source(entry.get("label"))
+                if not is_new_patient and label is None:
+                    result.update(status="skipped", error="no label")
+                    return entry, result
+                # Önceki denemede resmi yüklenmiş vakada yalnızca etiket tekrar gönderilir
+                if is_new_patient and entry.get("image_status") == "OK":
+                    result["image_status"] = "OK"
+                elif is_new_patient:
+                    ok, msg = self.upload_image(server_url, entry["image_id"], image, user_session_id, is_public=is_public, task=task, channel=(entry["image_id"], "image"))
+                    result["image_status"] = msg
+                    if not ok: raise IOError(f"Image Upload Failed: {msg}")
+                    if label is not None and not self.wait_for_image(server_url, entry["image_id"], task=task):
+                        print(f"   -> {entry['image_id']}: image not visible in the datastore yet, uploading label anyway.")
+                label_meta = {}
+                if label is not None:
+                    ref = image if not isinstance(image, str) else None
+                    transport = {}
+                    ok, msg = self.upload_label(server_url, entry["image_id"], user_tag, label, ref, user_session_id, is_public,
+                                                task=task, meta_out=label_meta, channel=(entry["image_id"], "label"), report=transport,
+                                                force=is_new_patient)
+                    result["label_status"] = msg
+                    if transport: result["label_transport"] = transport
+                    if not ok: raise IOError(f"Label Upload Failed: {msg}")
+                self.datastore.record_upload(server_url, user_session_id, entry["image_id"],
+                                             image_info={"uploaded_by": user_session_id, "ispublic": is_public} if is_new_patient else None,
+                                             label_tag=user_tag if label is not None else None, label_info=label_meta)
+                result["status"] = "ok"
+            except AIRadarCancelled:
+                result.update(status="cancelled")
+            except Exception as e:
+                result["error"] = str(e)
+            finally:
+                result["seconds"] = round(time.monotonic() - started, 2)
+            return entry, result
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.BATCH_UPLOAD_WORKERS, thread_name_prefix="AIRadarBatchUpload") as executor:
+            futures = [executor.submit(self.metrics.bind(upload_case), entry) for entry in pending]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    entry, result = future.result()
+                    with lock:
+                        entry.update(result)
+                        entry["attempts"] = entry.get("attempts", 0) + 1
+                    self._write_manifest(manifest_path, manifest, lock)
+                    print(f"   -> {entry['image_id']}: {entry['status']}" + (f" ({entry['error']})" if entry.get("error") else ""))
+                    if on_result: self.tasks.post_to_main_thread(on_result, dict(entry))
+            finally:
+                for future in futures: future.cancel()
+
+        if task: task.check_cancelled()
+        uploaded = sum(1 for entry in manifest["cases"] if entry["status"] == "ok")
+        failed = sum(1 for entry in manifest["cases"] if entry["status"] not in ("ok", "skipped"))
+        return uploaded, failed, manifest_path
+
+    def retry_failed_uploads(self, manifest_path, task=None, on_result=None):
+        """Manifest'teki başarısız vakalar için batch_upload'ı yeniden çalıştırır"""
+        manifest = self._read_manifest(manifest_path)
+        if not manifest: raise IOError(f"Manifest not found: {manifest_path}")
+        cases = [entry for entry in manifest["cases"] if entry["status"] != "ok"]
+        return self.batch_upload(manifest["server"], cases, manifest["is_public"], manifest["is_new_patient"],
+                                 manifest["session_id"], manifest["user_tag"], manifest_path, task=task, on_result=on_result)
+
+    def new_upload_manifest_path(self, directory=None):
+        """Yüklenen dosyaların yanında, sahne yüklemeleri için modül veri klasöründe manifest yolu"""
+        folder = directory or os.path.join(os.path.dirname(self.cache.cache_dir), "uploads")
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, f"airadar_upload_manifest_{time.strftime('%Y%m%d-%H%M%S')}.json")
+
+    @staticmethod
+    def _read_manifest(path):
+        try:
+            with open(path) as f: return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_manifest(path, manifest, lock):
+        with lock:
+            data = json.dumps(manifest, indent=2)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f: f.write(data)
+        os.replace(tmp, path)
+
+    @_traced("upload.image")
+    def upload_image(self, server_url, image_id, image_node, session_id, is_public=False, task=None, channel=None):
+        """Görüntüyü datastore'a yükler; image_node bir dosya yolu da olabilir"""
         try:
             server_url = server_url.rstrip('/')
             api_url = f"{server_url}{self.ENDPOINT_IMAGE}"
-            temp_filename = f"{image_id}.nii.gz"
-            temp_path = os.path.join(slicer.app.temporaryPath, temp_filename)
-            slicer.util.saveNode(image_node, temp_path)
+            with self.metrics.span("image.snapshot"):
+                volume = image_node if isinstance(image_node, str) else self._on_main(self._volume_payload, image_node)
             
             meta_info = {"uploaded_by": session_id, "ispublic": is_public}
             params = {'image': image_id, 'client_id': session_id, 'token': session_id, 'tag': session_id, 'params': json.dumps(meta_info)}
             
-            with open(temp_path, 'rb') as f:
-                resp = requests.put(api_url, params=params, files={'file': (temp_filename, f)}, timeout=120, verify=False)
+            resp = self._put_volume(api_url, params, {}, 'file', image_id, volume, task=task, phase="Uploading image", channel=channel)
             
             return resp.status_code in [200, 201], "OK" if resp.status_code in [200, 201] else f"Server Error: {resp.status_code}"
         except Exception as e: return False, str(e)
-        finally:
-            if temp_path and os.path.exists(temp_path): os.remove(temp_path)
 
-    def upload_label(self, server_url, image_id, tag, label_node, ref_node, session_id, is_public_bool=False):
-        temp_path = None
-        temp_labelmap_node = None
+    @_traced("upload.label")
+    def upload_label(self, server_url, image_id, tag, label_node, ref_node, session_id, is_public_bool=False, task=None, meta_out=None, channel=None, report=None, force=False):
+        """Etiketi datastore'a yükler; sunucudaki etiket aynıysa hiçbir şey göndermez (force=True hariç)"""
         try:
             server_url = server_url.rstrip('/')
             api_url = f"{server_url}{self.ENDPOINT_LABEL}"
-            temp_filename = f"label_{image_id}_{tag}.nii.gz"
-            temp_path = os.path.join(slicer.app.temporaryPath, temp_filename)
             
-            node_to_save = label_node
             extracted_label_info = []
-            if label_node.IsA("vtkMRMLSegmentationNode"):
-                segmentation = label_node.GetSegmentation()
-                for i in range(segmentation.GetNumberOfSegments()):
-                    seg_name = segmentation.GetSegment(segmentation.GetNthSegmentID(i)).GetName()
-                    if "background" in seg_name.lower(): continue
-                    extracted_label_info.append({"name": seg_name, "idx": i + 1})
-                
-                temp_labelmap_node = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLLabelMapVolumeNode")
-                if ref_node:
-                    label_node.SetReferenceImageGeometryParameterFromVolumeNode(ref_node)
-                    slicer.modules.segmentations.logic().ExportAllSegmentsToLabelmapNode(label_node, temp_labelmap_node, slicer.vtkSegmentation.EXTENT_REFERENCE_GEOMETRY)
-                else:
-                    slicer.modules.segmentations.logic().ExportAllSegmentsToLabelmapNode(label_node, temp_labelmap_node, slicer.vtkSegmentation.EXTENT_UNION_OF_SEGMENTS)
-                node_to_save = temp_labelmap_node
-            elif label_node.IsA("vtkMRMLLabelMapVolumeNode"):
-                 extracted_label_info.append({"name": "LabelMap", "idx": 1})
+            previous = None if force else self._uploaded_label_info(server_url, session_id, image_id, tag, task=task)
+            digest = {}
 
-            slicer.util.saveNode(node_to_save, temp_path)
+            # Segment dışa aktarımı sahneye dokunduğu için ana thread'de çalışır
+            def export_label():
+                if isinstance(label_node, str):
+                    extracted_label_info.append({"name": "LabelMap", "idx": 1})
+                    digest.update(self._label_digest(label_node, ref_node, task=task))
+                    if self._label_unchanged(previous, digest, extracted_label_info, is_public_bool): return None
+                    return label_node
+                digest.update(self._label_digest(label_node, ref_node))
+                if label_node.IsA("vtkMRMLSegmentationNode"):
+                    segmentation = label_node.GetSegmentation()
+                    for i in range(segmentation.GetNumberOfSegments()):
+                        seg_name = segmentation.GetSegment(segmentation.GetNthSegmentID(i)).GetName()
+                        if "background" in seg_name.lower(): continue
+                        extracted_label_info.append({"name": seg_name, "idx": i + 1})
+                    if self._label_unchanged(previous, digest, extracted_label_info, is_public_bool): return None
+                    
+                    # Tam boyutlu geçici labelmap yerine yalnızca segmentlerin kapladığı kutu dışa aktarılır
+                    export_node = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLLabelMapVolumeNode")
+                    try:
+                        if ref_node:
+                            label_node.SetReferenceImageGeometryParameterFromVolumeNode(ref_node)
+                            slicer.modules.segmentations.logic().ExportAllSegmentsToLabelmapNode(label_node, export_node, slicer.vtkSegmentation.EXTENT_UNION_OF_EFFECTIVE_SEGMENTS)
+                            return self._label_crop(export_node, ref_node)
+                        slicer.modules.segmentations.logic().ExportAllSegmentsToLabelmapNode(label_node, export_node, slicer.vtkSegmentation.EXTENT_UNION_OF_SEGMENTS)
+                        return self._volume_payload(export_node)
+                    finally:
+                        slicer.mrmlScene.RemoveNode(export_node)
+                elif label_node.IsA("vtkMRMLLabelMapVolumeNode"):
+                     extracted_label_info.append({"name": "LabelMap", "idx": 1})
+                if self._label_unchanged(previous, digest, extracted_label_info, is_public_bool): return None
+                return self._volume_payload(label_node)
+
+            with self.metrics.span("label.export", segmentation=not isinstance(label_node, str) and label_node.IsA("vtkMRMLSegmentationNode")):
+                volume = export_label() if isinstance(label_node, str) else self._on_main(export_label)
+            if task: task.check_cancelled()
+            changed = self.label_delta(previous, digest)
+            if volume is None:
+                # Son yüklemeden beri hiçbir segment değişmedi; sunucudaki etiket ve label_info zaten güncel
+                if meta_out is not None: meta_out.update(previous)
+                if report is not None: report.update(encoding="unchanged", raw_bytes=0, encoded_bytes=0, changed_segments=[])
+                print(f"   -> Label {image_id}: unchanged since last upload, nothing sent")
+                return True, "Unchanged"
+            volume, encoding = self._label_transport(volume)
             
-            meta_data = {"session_id": session_id, "uploaded_by": session_id, "label_info": extracted_label_info, "is_public": is_public_bool}
+            meta_data = {"session_id": session_id, "uploaded_by": session_id, "label_info": extracted_label_info, "is_public": is_public_bool,
+                         "label_digest": digest}
+            if encoding == "cropped": meta_data["label_encoding"] = volume.metadata()
+            if meta_out is not None: meta_out.update(meta_data)
             params = {'image': image_id, 'label': image_id, 'tag': tag, 'client_id': session_id, 'token': session_id}
             data_payload = {'params': json.dumps(meta_data)}
             
-            with open(temp_path, 'rb') as f:
-                resp = requests.put(api_url, params=params, data=data_payload, files={'label': (temp_filename, f)}, timeout=60, verify=False)
+            stats = {}
+            payload = volume.cropped() if encoding == "cropped" else volume
+            resp = self._put_volume(api_url, params, data_payload, 'label', f"label_{image_id}_{tag}", payload, task=task, phase="Uploading label", channel=channel, stats=stats)
             
+            transport = {"encoding": encoding, "raw_bytes": volume.full_nbytes if isinstance(volume, AIRadarCroppedLabel) else stats["raw_bytes"],
+                         "encoded_bytes": stats["sent_bytes"], "changed_segments": changed}
+            if report is not None: report.update(transport)
+            print(f"   -> Label {image_id}: {self.format_transport(transport)}" + (f", changed: {', '.join(changed)}" if previous else ""))
             return resp.status_code in [200, 201], "OK" if resp.status_code in [200, 201] else f"Server Error: {resp.status_code}"
         except Exception as e: return False, str(e)
-        finally:
-            if temp_labelmap_node: slicer.mrmlScene.RemoveNode(temp_labelmap_node)
-            if temp_path and os.path.exists(temp_path): os.remove(temp_path)
 
-    def download_image_and_label(self, server_url, image_id, user_tag, target_folder):
-        import shutil
-        try:
-            print(f"\n--- DOWNLOAD STARTED -> {target_folder} ---")
-            base_url = server_url.rstrip('/')
-            active_token = user_tag
+    def _uploaded_label_info(self, server_url, session_id, image_id, tag, task=None):
+        """(image_id, tag) için en son yüklenen etiketin snapshot'taki bilgisi, doğrulanamazsa None"""
+        snapshot = self.datastore.get(server_url, session_id)
+        if snapshot is None: return None
+        if snapshot.age() > self.LABEL_SKIP_MAX_AGE:
+            self.fetch_all_images(server_url, session_id, task=task, max_age=0)
+            snapshot = self.datastore.get(server_url, session_id)
+            if snapshot is None or snapshot.age() > self.LABEL_SKIP_MAX_AGE: return None
+        labels = (snapshot.objects.get(image_id) or {}).get("labels")
+        label = labels.get(str(tag)) if isinstance(labels, dict) else None
+        raw = label.get("info") if isinstance(label, dict) else None
+        info = raw if isinstance(raw, dict) else _parse_object_params(raw) if isinstance(raw, str) else None
+        return dict(info) if info else None
+
+    def _label_digest(self, label_node, ref_node, task=None):
+        """Etiketin içerik özetleri: referans ızgara ve segment başına hash (node'lar için GUI thread)"""
+        reference = None
+        if ref_node is not None and not isinstance(ref_node, str) and ref_node.GetImageData() is not None:
+            ijkToRAS = vtk.vtkMatrix4x4()
+            ref_node.GetIJKToRASMatrix(ijkToRAS)
+            h = hashlib.blake2b(digest_size=16)
+            h.update(np.asarray(ref_node.GetImageData().GetDimensions(), dtype=np.int64).tobytes())
+            h.update(np.round(slicer.util.arrayFromVTKMatrix(ijkToRAS), 6).tobytes())
+            reference = h.hexdigest()
+        if isinstance(label_node, str):
+            return {"reference": reference, "segments": {"LabelMap": self._file_sha256(label_node, task=task)[:32]}}
+        if not label_node.IsA("vtkMRMLSegmentationNode"):
+            h = hashlib.blake2b(slicer.util.arrayFromVolume(label_node).tobytes(), digest_size=16)
+            return {"reference": reference, "segments": {"LabelMap": h.hexdigest()}}
+        segmentation = label_node.GetSegmentation()
+        representation = slicer.vtkSegmentationConverter.GetSegmentationBinaryLabelmapRepresentationName()
+        # Dışa aktarım ikili labelmap'i zaten oluşturur; burada yalnızca erkene alınır
+        if not segmentation.ContainsRepresentation(representation): label_node.CreateBinaryLabelmapRepresentation()
+        segments = {}
+        for i in range(segmentation.GetNumberOfSegments()):
+            segment_id = segmentation.GetNthSegmentID(i)
+            segment = segmentation.GetSegment(segment_id)
+            h = hashlib.blake2b(digest_size=16)
+            h.update(f"{i}\x1f{segment.GetName()}\x1f{segment.GetLabelValue()}".encode("utf-8"))
+            image = segment.GetRepresentation(representation)
+            scalars = image.GetPointData().GetScalars() if image is not None else None
+            if scalars is not None:
+                imageToWorld = vtk.vtkMatrix4x4()
+                image.GetImageToWorldMatrix(imageToWorld)
+                h.update(np.asarray(image.GetExtent(), dtype=np.int64).tobytes())
+                h.update(np.round(slicer.util.arrayFromVTKMatrix(imageToWorld), 6).tobytes())
+                # Paylaşılan katmanlarda yalnızca bu segmentin değerini taşıyan vokseller sayılır
+                h.update(np.packbits(numpy_support.vtk_to_numpy(scalars) == segment.GetLabelValue()).tobytes())
+            segments[segment_id] = h.hexdigest()
+        return {"reference": reference, "segments": segments}
+
+    @staticmethod
+    def label_delta(previous_info, digest):
+        """Özeti önceki yüklemeden farklı (ya da orada olmayan) segmentlerin id'leri"""
+        old = (previous_info or {}).get("label_digest") or {}
+        if old.get("reference") != digest.get("reference"): old = {}
+        old_segments = old.get("segments") or {}
+        return [segment for segment, h in digest.get("segments", {}).items() if old_segments.get(segment) != h]
+
+    @staticmethod
+    def _label_unchanged(previous_info, digest, label_info, is_public):
+        """Önceki yükleme tam olarak bu etiketi ve label_info'yu taşıyorsa True"""
+        if not previous_info or previous_info.get("label_digest") != digest: return False
+        return previous_info.get("label_info") == label_info and previous_info.get("is_public") == is_public
+
+    def _label_crop(self, node, ref_node):
+        """Dışa aktarılmış (kırpılmış) labelmap node'u, ref_node ızgarasında AIRadarCroppedLabel (GUI thread)"""
+        ijkToRAS = vtk.vtkMatrix4x4()
+        ref_node.GetIJKToRASMatrix(ijkToRAS)
+        ref_ijk_to_ras = slicer.util.arrayFromVTKMatrix(ijkToRAS)
+        ref_shape = ref_node.GetImageData().GetDimensions()[::-1]
+        image = node.GetImageData()
+        if image is None or 0 in image.GetDimensions():
+            # Boş segmentasyon: tek sıfır voksel
+            return AIRadarCroppedLabel(np.zeros((1, 1, 1), dtype=np.uint8), ref_shape, ref_ijk_to_ras)
+        volume = self._volume_payload(node)
+        return AIRadarCroppedLabel.place(volume, ref_shape, ref_ijk_to_ras) or volume
+
+    def _label_transport(self, volume):
+        """Etiketin nasıl gönderileceği: (volume, encoding)"""
+        if isinstance(volume, str): return volume, "as-is"
+        mode = self.label_encoding
+        if not isinstance(volume, AIRadarCroppedLabel):
+            if mode == "full": return volume, "as-is"
+            volume = AIRadarCroppedLabel.place(volume, volume.array.shape, volume.ijk_to_ras)
+        volume = volume.shrink()
+        if mode == "auto":
+            mode = "cropped" if volume.voxels <= self.LABEL_CROP_RATIO * volume.ref_voxels else "full"
+        return volume, mode
+
+    @staticmethod
+    def format_transport(transport):
+        if not transport: return "-"
+        if transport["encoding"] == "unchanged": return "unchanged, nothing sent"
+        raw, sent = transport["raw_bytes"], transport["encoded_bytes"]
+        return f"{transport['encoding']}, {raw / 1048576:.2f} MB raw -> {sent / 1048576:.2f} MB sent ({raw / max(1, sent):.0f}x)"
+
+    def _volume_payload(self, node):
+        """Volume node'un voksellerinin ve IJK-to-RAS geometrisinin kopyası (yalnızca GUI thread)"""
+        ijkToRAS = vtk.vtkMatrix4x4()
+        node.GetIJKToRASMatrix(ijkToRAS)
+        return AIRadarVolumeData(array=slicer.util.arrayFromVolume(node).copy(), ijk_to_ras=slicer.util.arrayFromVTKMatrix(ijkToRAS))
+
+    def _put_volume(self, api_url, params, fields, file_field, base_name, volume, task=None, phase=None, channel=None, stats=None):
+        """Volume'u chunked, paralel gzip'li NIfTI multipart yüklemesi olarak PUT eder"""
+        if isinstance(volume, str):
+            if volume.lower().endswith((".nii", ".nii.gz")):
+                return self._put_file(api_url, params, fields, file_field, base_name, volume, task, phase, channel, stats)
+            volume = self._on_main(self._file_payload, volume)
+        level = self.upload_compression_level
+        encoder = volume.encoder() if isinstance(volume, AIRadarCroppedLabel) else AIRadarNiftiEncoder(volume)
+        total = encoder.nbytes
+        sent = [0]
+        if stats is not None: stats.update(raw_bytes=total, sent_bytes=0)
+
+        def on_block(raw_bytes):
+            if task: task.check_cancelled()
+            sent[0] += raw_bytes
+            if task: task.report_progress(sent[0], total, phase, channel=channel)
+
+        with self.metrics.span("http.upload", kind=file_field, raw_bytes=total, gzip_level=level) as span:
+            def counted(chunks):
+                for chunk in chunks:
+                    if stats is not None: stats["sent_bytes"] += len(chunk)
+                    span.add_bytes(len(chunk))
+                    yield chunk
+
+            chunks = AIRadarParallelGzip(level, self.UPLOAD_WORKERS).compress(encoder.blocks(self.UPLOAD_BLOCK_BYTES), on_block=on_block)
+            body = AIRadarMultipartBody(fields, file_field, base_name + (".nii.gz" if level else ".nii"), counted(chunks))
+            resp = self.http.put(api_url, call_type="upload", params=params, data=body, headers={"Content-Type": body.content_type})
+            span.set(status_code=resp.status_code)
+            return resp
+
+    def _put_file(self, api_url, params, fields, file_field, base_name, path, task=None, phase=None, channel=None, stats=None):
+        """Var olan NIfTI dosyasını değiştirmeden multipart yükleme olarak gönderir"""
+        total = os.path.getsize(path)
+        ext = ".nii.gz" if path.lower().endswith(".gz") else ".nii"
+        if stats is not None: stats.update(raw_bytes=total, sent_bytes=total)
+
+        def chunks():
+            sent = 0
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.UPLOAD_BLOCK_BYTES), b""):
+                    if task: task.check_cancelled()
+                    sent += len(chunk)
+                    yield chunk
+                    if task: task.report_progress(sent, total, phase, channel=channel)
+
+        body = AIRadarMultipartBody(fields, file_field, base_name + ext, chunks())
+        with self.metrics.span("http.upload", kind=file_field, raw_bytes=total, gzip_level=None) as span:
+            resp = self.http.put(api_url, call_type="upload", params=params, data=body, headers={"Content-Type": body.content_type})
+            span.add_bytes(total)
+            span.set(status_code=resp.status_code)
+            return resp
+
+    def _file_payload(self, path):
+        """NIfTI olmayan volume dosyasını sahnede node bırakmadan Slicer ile okur (yalnızca GUI thread)"""
+        node = slicer.util.loadVolume(path, {"show": False})
+        try:
+            return self._volume_payload(node)
+        finally:
+            slicer.mrmlScene.RemoveNode(node)
+
+    @_traced("monai.download_case")
+    def download_image_and_label(self, server_url, image_id, user_tag, target_folder, task=None):
+        try:
+            print(f"\n--- DOWNLOAD STARTED -> {target_folder} ---")
+            base_url = server_url.rstrip('/')
+            active_token = user_tag
 
             image_url = f"{base_url}{self.ENDPOINT_IMAGE}"
             params = {'image': image_id, 'token': active_token, 'client_id': active_token}
             file_name = f"{image_id}.nii.gz"
             save_path = os.path.join(target_folder, file_name)
-            
-            resp = requests.get(image_url, params=params, stream=True, timeout=15, verify=False)
-            if resp.status_code == 200:
-                with open(save_path, 'wb') as f:
-                    resp.raw.decode_content = True
-                    shutil.copyfileobj(resp.raw, f)
-                slicer.util.loadVolume(save_path)
-            else: return False, f"Image Download Failed (Code: {resp.status_code})"
 
             label_url = f"{base_url}{self.ENDPOINT_LABEL}"
             label_params = {'label': image_id, 'tag': user_tag, 'token': user_tag, 'client_id': user_tag}
             label_name = f"label_{image_id}.nii.gz"
             label_save_path = os.path.join(target_folder, label_name)
-            
-            resp_lbl = requests.get(label_url, params=label_params, stream=True, timeout=10, verify=False)
-            if resp_lbl.status_code == 200:
-                with open(label_save_path, 'wb') as f:
-                    resp_lbl.raw.decode_content = True
-                    shutil.copyfileobj(resp_lbl.raw, f)
-                slicer.util.loadLabelVolume(label_save_path)
+
+            jobs = [
+                ("image", image_url, ("monai", base_url, "image", image_id, None), params, "Downloading image"),
+                ("label", label_url, ("monai", base_url, "label", image_id, user_tag), label_params, "Downloading label"),
+            ]
+            cached_label = None
+            for kind, future in self._fetch_concurrently(jobs, task=task):
+                if kind == "image":
+                    cached_path, status = future.result()
+                    if not cached_path:
+                        return False, f"Image Download Failed (Code: {status})"
+                    shutil.copyfile(cached_path, save_path)
+                    self._on_main(slicer.util.loadVolume, save_path)
+                else:
+                    try: cached_label, status = future.result()
+                    except AIRadarCancelled: raise
+                    except Exception as e:
+                        print(f"   -> Label Download Error: {e}")
+                        cached_label = None
+            if cached_label:
+                # Kırpılmış yüklenen label resmin ızgarasında kaydedilir
+                self._restore_label_file(cached_label, save_path, label_save_path, task=task)
+                self._on_main(slicer.util.loadLabelVolume, label_save_path)
             
             return True, "Download Success"
         except Exception as e: return False, f"Error: {e}"
 
-    def delete_resource(self, server_url, image_id, user_session_id, delete_mode="label"):
+    def restore_label(self, label, image):
+        """Kırpılmış gönderilen etiketi görüntünün voksel ızgarasına geri yerleştirir"""
+        if label.array is None or image.array is None or label.array.shape == image.array.shape: return label
+        placed = AIRadarCroppedLabel.place(label, image.array.shape, image.ijk_to_ras)
+        return placed.restored() if placed else label
+
+    def _restore_label_file(self, label_path, image_path, out_path, task=None):
+        """label_path'teki etiketi image_path'teki görüntünün ızgarasında out_path'e yazar"""
+        geometry = self._nifti_geometry(image_path)
+        label = self._decode_file(label_path, task=task) if geometry else None
+        placed = None
+        if label is not None and label.array is not None and label.array.shape != geometry[0]:
+            placed = AIRadarCroppedLabel.place(label, *geometry)
+        if placed is None:
+            shutil.copyfile(label_path, out_path)
+            return
+        tmp = out_path + ".part"
+        with open(tmp, "wb") as f:
+            for chunk in AIRadarParallelGzip(self.upload_compression_level or 1, self.UPLOAD_WORKERS).compress(placed.encoder().blocks(self.UPLOAD_BLOCK_BYTES)):
+                if task: task.check_cancelled()
+                f.write(chunk)
+        os.replace(tmp, out_path)
+
+    @staticmethod
+    def _nifti_geometry(path):
+        """NIfTI başlığından ([k, j, i] boyut, IJK-to-RAS), okunamazsa None"""
+        decoder = AIRadarNiftiDecoder()
+        try:
+            with open(path, "rb") as f:
+                while decoder.header is None:
+                    chunk = f.read(64 * 1024)
+                    if not chunk: return None
+                    decoder.feed(chunk)
+        except (AIRadarNiftiUnsupported, zlib.error):
+            return None
+        return decoder.header["shape"][::-1], decoder.ijk_to_ras()
+
+    # --- BULK EXPORT ---
+
+    @_traced("monai.export")
+    def export_datasets(self, server_url, scope, user_session_id, target_folder, task=None, max_age=None, on_result=None):
+        """Kapsamdaki veri setlerini sahneye yüklemeden klasöre indirir; (inen, atlanan, başarısız, manifest) döndürür"""
+        base_url = server_url.rstrip('/')
+        self.fetch_all_images(base_url, user_session_id, task=task, max_age=max_age)
+        snapshot = self.datastore.get(base_url, user_session_id)
+        if snapshot is None: raise IOError("MONAI datastore listing unavailable")
+        ids = self.datastore_ids(base_url, user_session_id, scope, snapshot)
+
+        manifest_path = os.path.join(target_folder, self.EXPORT_MANIFEST)
+        previous = {(f["image_id"], f["kind"], f.get("tag")): f for f in (self._read_manifest(manifest_path) or {}).get("files", [])}
+        jobs = []
+        for image_id in sorted(ids):
+            details = snapshot.objects.get(image_id) or {}
+            image = details.get("image") or {}
+            jobs.append({"image_id": image_id, "kind": "image", "tag": None, "ext": image.get("ext") or ".nii.gz", "info": image.get("info") or {}})
+            for tag, label in sorted((details.get("labels") or {}).items()):
+                label = label if isinstance(label, dict) else {}
+                jobs.append({"image_id": image_id, "kind": "label", "tag": tag, "ext": label.get("ext") or ".nii.gz", "info": label.get("info") or {}})
+
+        print(f"\n--- EXPORT ({scope}): {len(ids)} datasets, {len(jobs)} files -> {target_folder} ---")
+        manifest = {"server": base_url, "scope": scope, "user": user_session_id,
+                    "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "files": []}
+        lock = threading.Lock()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.EXPORT_WORKERS, thread_name_prefix="AIRadarExport") as executor:
+            futures = {executor.submit(self.metrics.bind(self._export_file), base_url, job, target_folder, previous.get((job["image_id"], job["kind"], job["tag"])),
+                                       user_session_id, task): job for job in jobs}
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    job = futures[future]
+                    try:
+                        entry = future.result()
+                    except AIRadarCancelled: raise
+                    except Exception as e:
+                        entry = {"image_id": job["image_id"], "kind": job["kind"], "tag": job["tag"], "status": "failed", "error": str(e)}
+                        print(f"   -> Export Error ({job['image_id']} {job['kind']}): {e}")
+                    with lock: manifest["files"].append(entry)
+                    if on_result: self.tasks.post_to_main_thread(on_result, dict(entry))
+            finally:
+                for future in futures: future.cancel()
+                with lock: manifest["files"].sort(key=lambda f: (f["image_id"], f["kind"], f.get("tag") or ""))
+                self._write_manifest(manifest_path, manifest, lock)
+
+        counts = collections.Counter(f["status"] for f in manifest["files"])
+        print(f"--- EXPORT COMPLETE: {counts['downloaded']} downloaded, {counts['skipped']} skipped, {counts['failed']} failed ---")
+        return counts["downloaded"], counts["skipped"], counts["failed"], manifest_path
+
+    @staticmethod
+    def _export_name(value):
+        return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(value))
+
+    def _export_file(self, base_url, job, target_folder, previous, user_session_id, task=None):
+        """Diskte aynı kopya yoksa tek bir dışa aktarım dosyasını indirir; manifest kaydını döndürür"""
+        if task: task.check_cancelled()
+        name = self._export_name(job["image_id"]) + job["ext"]
+        rel_path = name if job["kind"] == "image" else os.path.join("labels", self._export_name(job["tag"]), name)
+        path = os.path.join(target_folder, rel_path)
+        info = job["info"]
+        checksum = str(info.get("checksum") or "")
+        checksum = checksum.split(":", 1)[1].lower() if checksum.upper().startswith("SHA256:") else None
+        entry = {"image_id": job["image_id"], "kind": job["kind"], "tag": job["tag"], "path": rel_path,
+                 "remote_ts": info.get("ts"), "remote_checksum": checksum}
+
+        def local_entry(status):
+            st = os.stat(path)
+            known = previous and previous.get("size") == st.st_size and previous.get("mtime") == int(st.st_mtime)
+            sha = previous["sha256"] if known and previous.get("sha256") else self._file_sha256(path, task)
+            return dict(entry, status=status, size=st.st_size, mtime=int(st.st_mtime), sha256=sha)
+
+        local = os.path.isfile(path)
+        if local:
+            st = os.stat(path)
+            unchanged = bool(previous) and previous.get("size") == st.st_size and previous.get("mtime") == int(st.st_mtime)
+            if checksum:
+                current = local_entry("skipped")
+                if current["sha256"] == checksum: return current
+            elif unchanged and info.get("ts") is not None and previous.get("remote_ts") == info.get("ts"):
+                return local_entry("skipped")
+
+        if job["kind"] == "image":
+            url, params = f"{base_url}{self.ENDPOINT_IMAGE}", {'image': job["image_id"], 'token': user_session_id, 'client_id': user_session_id}
+        else:
+            url, params = f"{base_url}{self.ENDPOINT_LABEL}", {'label': job["image_id"], 'tag': job["tag"], 'token': user_session_id, 'client_id': user_session_id}
+        resp = self.http.get(url, call_type="download", params=params, stream=True, task=task)
+        with resp:
+            if resp.status_code == 404: return dict(entry, status="missing")
+            if resp.status_code != 200: raise IOError(f"HTTP {resp.status_code}")
+            length = int(resp.headers.get("Content-Length") or -1)
+            changed = bool(previous) and previous.get("remote_ts") != info.get("ts")
+            if local and not checksum and not changed and length == os.path.getsize(path):
+                # Aynı boyutta yerel kopya: gövde indirilmeden bırakılır
+                return local_entry("skipped")
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.part"
+            digest = hashlib.sha256()
+            try:
+                with open(tmp_path, "wb") as f:
+                    for chunk in self._iter_download(resp, task, "Exporting", channel=(job["image_id"], job["kind"], job["tag"])):
+                        f.write(chunk)
+                        digest.update(chunk)
+                if checksum and digest.hexdigest() != checksum:
+                    raise IOError("checksum mismatch")
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path): os.remove(tmp_path)
+        st = os.stat(path)
+        return dict(entry, status="downloaded", size=st.st_size, mtime=int(st.st_mtime), sha256=digest.hexdigest())
+
+    @staticmethod
+    def _file_sha256(path, task=None):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                if task: task.check_cancelled()
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @_traced("monai.delete")
+    def delete_resource(self, server_url, image_id, user_session_id, delete_mode="label", task=None):
         try:
             server_url = server_url.rstrip('/')
             active_token = user_session_id 
@@ -804,10 +2521,2738 @@ class AIRadarLogic(ScriptedLoadableModuleLogic):
             params = {'id': image_id, 'token': active_token, 'client_id': active_token}
             if delete_mode == "label": params['tag'] = user_session_id 
 
-            resp = requests.delete(api_url, params=params, timeout=10, verify=False)
+            resp = self.http.delete(api_url, call_type="delete", params=params)
             
-            if resp.status_code in [200, 204]: return True, f"{delete_mode.upper()} Deleted Successfully."
+            if resp.status_code in [200, 204]:
+                self.datastore.record_delete(server_url, user_session_id, image_id, delete_mode, tag=user_session_id)
+                self.cache.invalidate(("monai", server_url, "label", image_id, user_session_id))
+                if delete_mode == "image": self.cache.invalidate(("monai", server_url, "image", image_id, None))
+                return True, f"{delete_mode.upper()} Deleted Successfully."
             elif resp.status_code in [401, 403]: return False, "Access Denied."
             else: return False, f"Server Error: {resp.status_code}"
         except Exception as e: return False, f"Exception: {e}"
 
+# ==============================================================================
+# 4. LOCAL VOLUME CACHE
+# ==============================================================================
+
+class AIRadarVolumeCache:
+    """İndirilen volume'lar için diskte kalıcı, boyutu sınırlı LRU önbellek"""
+
+    INDEX_FILE = "index.json"
+    PARTIAL_MAX_AGE = 24 * 3600
+
+    def __init__(self, cache_dir=None, max_bytes=4 * 1024 ** 3):
+        if not cache_dir:
+            try: base_dir = slicer.app.cachePath
+            except Exception: base_dir = tempfile.gettempdir()
+            cache_dir = os.path.join(base_dir, "AIRadar", "volumes")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        self._entries = {}
+        self._stats = {"hits": 0, "misses": 0, "stale_hits": 0, "stores": 0, "evictions": 0, "bytes_served": 0, "bytes_stored": 0}
+        self._on_change = None
+        self._pending = {}  # dinleyiciye henüz bildirilmemiş değişiklikler: {digest: entry ya da None}
+        self._notify_lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(cache_key):
+        """(kaynak, sunucu, tür, görüntü anahtarı, tag) için kararlı özet"""
+        raw = "\x1f".join("" if part is None else str(part) for part in cache_key)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), "r") as f:
+                entries = json.load(f)
+        except Exception:
+            entries = {}
+        for digest, entry in entries.items():
+            if os.path.exists(entry.get("path", "")):
+                self._entries[digest] = entry
+        # Yarım kalmış indirmeleri temizle (.partial dosyaları bir süre devam ettirilebilir kalır)
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            stale_partial = ".partial" in name and now - os.path.getmtime(path) > self.PARTIAL_MAX_AGE
+            if name.endswith(".part") or stale_partial:
+                try: os.remove(path)
+                except OSError: pass
+
+    def _save_index(self):
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self._index_path())
+
+    def _changed(self, digest):
+        # Çağıran self._lock'u tutar; silinen girdiler None olarak kaydedilir
+        entry = self._entries.get(digest)
+        self._pending[digest] = dict(entry) if entry else None
+
+    def _notify(self):
+        """Bekleyen değişiklikleri sırasıyla, önbellek kilidi dışında dinleyiciye verir"""
+        if not self._on_change: return
+        with self._notify_lock:
+            with self._lock:
+                changed, self._pending = self._pending, {}
+            if changed: self._on_change(changed)
+
+    def observe(self, on_change):
+        """on_change(changed, full) şimdi tüm indeksi (full=True), sonra her değişikliği alır"""
+        with self._notify_lock:
+            with self._lock:
+                self._on_change = on_change
+                self._pending = {}
+                entries = {digest: dict(entry) for digest, entry in self._entries.items()}
+            on_change(entries, full=True)
+
+    def lookup(self, cache_key):
+        """cache_key'in indeks kaydı (LRU konumu tazelenir) ya da None"""
+        digest = self.make_key(cache_key)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry and not os.path.exists(entry["path"]):
+                del self._entries[digest]
+                entry = None
+            if entry:
+                entry["last_access"] = time.time()
+            return dict(entry) if entry else None
+
+    @staticmethod
+    def validators(entry):
+        """Var olan kayıt için koşullu istek başlıkları"""
+        headers = {}
+        if entry:
+            if entry.get("etag"): headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"): headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record_hit(self, cache_key, stale=False):
+        with self._lock:
+            entry = self._entries.get(self.make_key(cache_key))
+            self._stats["hits"] += 1
+            if stale: self._stats["stale_hits"] += 1
+            if entry: self._stats["bytes_served"] += entry["size"]
+
+    def record_miss(self, cache_key):
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def writer(self, cache_key, etag=None, last_modified=None, suffix=".nii.gz"):
+        """Dosya nesnesi veren context manager; temiz çıkışta kayıt önbelleğe alınır"""
+        return _AIRadarCacheWriter(self, cache_key, etag, last_modified, suffix)
+
+    def key_lock(self, cache_key):
+        """Aynı kaydın eşzamanlı indirmelerini sıraya koyan kilit"""
+        digest = self.make_key(cache_key)
+        with self._lock:
+            return self._key_locks.setdefault(digest, threading.Lock())
+
+    def partial_path(self, cache_key):
+        """cache_key'in devam ettirilebilir indirmesi için sabit yol"""
+        return os.path.join(self.cache_dir, self.make_key(cache_key) + ".partial")
+
+    def commit_file(self, cache_key, path, etag=None, last_modified=None, suffix=".nii.gz"):
+        """Tamamlanan indirmeyi önbelleğe taşır ve son yolunu döndürür"""
+        return self._commit(cache_key, path, etag, last_modified, suffix)
+
+    def _commit(self, cache_key, part_path, etag, last_modified, suffix):
+        digest = self.make_key(cache_key)
+        final_path = os.path.join(self.cache_dir, digest + suffix)
+        os.replace(part_path, final_path)
+        size = os.path.getsize(final_path)
+        now = time.time()
+        with self._lock:
+            self._entries[digest] = {
+                "key": [None if p is None else str(p) for p in cache_key],
+                "path": final_path, "size": size, "etag": etag, "last_modified": last_modified,
+                "created": now, "last_access": now,
+            }
+            self._stats["stores"] += 1
+            self._stats["bytes_stored"] += size
+            self._changed(digest)
+            self._evict(keep=digest)
+            self._save_index()
+        self._notify()
+        return final_path
+
+    def _evict(self, keep=None):
+        total = sum(e["size"] for e in self._entries.values())
+        for digest, entry in sorted(self._entries.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes: break
+            if digest == keep: continue
+            try: os.remove(entry["path"])
+            except OSError: pass
+            del self._entries[digest]
+            self._changed(digest)
+            total -= entry["size"]
+            self._stats["evictions"] += 1
+
+    def invalidate(self, cache_key):
+        with self._lock:
+            digest = self.make_key(cache_key)
+            entry = self._entries.pop(digest, None)
+            if entry:
+                try: os.remove(entry["path"])
+                except OSError: pass
+                self._changed(digest)
+                self._save_index()
+        self._notify()
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                try: os.remove(entry["path"])
+                except OSError: pass
+            removed = list(self._entries)
+            self._entries = {}
+            for digest in removed: self._changed(digest)
+            self._save_index()
+        self._notify()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = sum(e["size"] for e in self._entries.values())
+            stats["max_bytes"] = self.max_bytes
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["hits"] / lookups) if lookups else 0.0
+            return stats
+
+
+class _AIRadarCacheWriter:
+    def __init__(self, cache, cache_key, etag, last_modified, suffix):
+        self.cache = cache
+        self.cache_key = cache_key
+        self.etag = etag
+        self.last_modified = last_modified
+        self.suffix = suffix
+        self.part_path = os.path.join(cache.cache_dir, f"{cache.make_key(cache_key)}.{uuid.uuid4().hex[:8]}.part")
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.part_path, "wb")
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is None:
+            self.path = self.cache._commit(self.cache_key, self.part_path, self.etag, self.last_modified, self.suffix)
+        elif os.path.exists(self.part_path):
+            os.remove(self.part_path)
+        return False
+
+# ==============================================================================
+# 5. BACKGROUND TASK ENGINE
+# ==============================================================================
+
+class AIRadarCancelled(Exception):
+    """Görevi iptal edilen işçide fırlatılır"""
+
+
+class AIRadarTask:
+    """AIRadarTaskEngine işçi havuzunda çalışan bir işlemin tutamacı"""
+
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, engine, name, on_progress=None):
+        self.engine = engine
+        self.name = name
+        self.future = None
+        self._cancel_event = threading.Event()
+        self._on_progress = on_progress
+        self._last_progress = 0.0
+        self._channels = {}
+        self._progress_lock = threading.Lock()
+
+    def cancel(self):
+        self._cancel_event.set()
+        if self.future: self.future.cancel()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise AIRadarCancelled(self.name)
+
+    def sleep(self, seconds):
+        """Görev iptal edilir edilmez AIRadarCancelled ile biten time.sleep"""
+        if self._cancel_event.wait(seconds):
+            raise AIRadarCancelled(self.name)
+
+    def report_progress(self, done, total=None, phase=None, channel=None):
+        """Bayt düzeyindeki ilerlemeyi seyrelterek GUI thread'ine iletir; kanallar toplanır"""
+        if not self._on_progress: return
+        if channel is not None:
+            with self._progress_lock:
+                self._channels[channel] = (done, total)
+                done = sum(d for d, _ in self._channels.values())
+                totals = [t for _, t in self._channels.values()]
+                total = None if None in totals else sum(totals)
+        now = time.monotonic()
+        finished = total is not None and done >= total
+        if not finished and now - self._last_progress < self.PROGRESS_INTERVAL: return
+        self._last_progress = now
+        self.engine.post_to_main_thread(self._on_progress, done, total, phase)
+
+
+class AIRadarTaskEngine:
+    """AIRadarLogic işlemlerinin ağ ve disk aşamaları için sınırlı işçi havuzu; sahne adımları GUI thread'inde"""
+
+    BUSY_INTERVAL_MS = 20
+    IDLE_INTERVAL_MS = 200
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="AIRadarWorker")
+        self._main_calls = queue.Queue()
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._main_thread = threading.current_thread()
+        self._timer = qt.QTimer()
+        self._timer.setInterval(self.IDLE_INTERVAL_MS)
+        self._timer.timeout.connect(self._drain)
+        self._timer.start()
+
+    def submit(self, fn, *args, name=None, on_done=None, on_progress=None, **kwargs):
+        """fn(*args, task=task, **kwargs) işçide çalışır; on_done(sonuç, hata) GUI thread'inde"""
+        task = AIRadarTask(self, name or getattr(fn, "__name__", "task"), on_progress)
+        with self._lock:
+            self._tasks.add(task)
+        if self.in_main_thread(): self._timer.setInterval(self.BUSY_INTERVAL_MS)
+
+        def run():
+            task.check_cancelled()
+            return fn(*args, task=task, **kwargs)
+
+        task.future = self._executor.submit(run)
+        task.future.add_done_callback(lambda future: self.post_to_main_thread(self._finish, task, on_done))
+        return task
+
+    def _finish(self, task, on_done):
+        with self._lock:
+            self._tasks.discard(task)
+        result, error = None, None
+        if task.future.cancelled():
+            error = AIRadarCancelled(task.name)
+        else:
+            error = task.future.exception()
+            if error is None: result = task.future.result()
+        if on_done: on_done(result, error)
+
+    def in_main_thread(self):
+        return threading.current_thread() is self._main_thread
+
+    def post_to_main_thread(self, fn, *args, **kwargs):
+        """fn'i beklemeden GUI thread'i için sıraya koyar"""
+        if self._closed: return
+        self._main_calls.put((fn, args, kwargs, None))
+
+    def call_in_main_thread(self, fn, *args, **kwargs):
+        """fn'i GUI thread'inde çalıştırıp sonucunu döndürür (hatasını yeniden fırlatır)"""
+        if self.in_main_thread():
+            return fn(*args, **kwargs)
+        future = concurrent.futures.Future()
+        self._main_calls.put((fn, args, kwargs, future))
+        while True:
+            if self._closed: raise AIRadarCancelled("engine shut down")
+            try:
+                return future.result(timeout=0.5)
+            except concurrent.futures.TimeoutError:
+                continue
+
+    def _drain(self):
+        while True:
+            try: fn, args, kwargs, future = self._main_calls.get_nowait()
+            except queue.Empty: break
+            try:
+                result = fn(*args, **kwargs)
+                if future: future.set_result(result)
+            except Exception as e:
+                if future: future.set_exception(e)
+                else: print(f"Main Thread Callback Error: {e}")
+        with self._lock:
+            busy = bool(self._tasks)
+        self._timer.setInterval(self.BUSY_INTERVAL_MS if busy else self.IDLE_INTERVAL_MS)
+
+    def active_tasks(self):
+        with self._lock:
+            return list(self._tasks)
+
+    def cancel_all(self):
+        for task in self.active_tasks():
+            task.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self._closed = True
+        self._timer.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# ==============================================================================
+# 6. HTTP CLIENT
+# ==============================================================================
+
+class AIRadarHttpClient:
+    """Sunucu başına bir tane, havuzlu keep-alive HTTP oturumları; GET'ler geçici hatalarda yeniden denenir"""
+
+    # (connect, read) seconds
+    TIMEOUTS = {
+        "poll": (3.05, 5),
+        "list": (3.05, 30),
+        "download": (5, 60),
+        "upload": (5, 300),
+        "delete": (5, 30),
+        "default": (5, 30),
+    }
+    RETRY_STATUS = (429, 502, 503, 504)
+    RETRY_AFTER_MAX = 60.0  # saniye; sunucu daha uzun beklenmesini isterse yanıt olduğu gibi döner
+
+    def __init__(self, pool_connections=2, pool_maxsize=16, max_retries=3, backoff_base=0.5, backoff_max=8.0, verify=False, timeouts=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.verify = verify
+        self.timeouts = dict(self.TIMEOUTS)
+        if timeouts: self.timeouts.update(timeouts)
+        self._sessions = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_key(url):
+        parts = urllib.parse.urlparse(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        return f"{parts.scheme}://{parts.hostname}:{port}"
+
+    def session(self, url):
+        """url'nin sunucusu için ortak oturum, ilk kullanımda oluşturulur"""
+        host = self.host_key(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, pool_block=False)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.verify = self.verify
+                self._sessions[host] = session
+                self._counters[host] = {"requests": 0, "retries": 0, "errors": 0}
+            return session
+
+    def timeout_for(self, call_type):
+        return self.timeouts.get(call_type, self.timeouts["default"])
+
+    def backoff_delay(self, attempt):
+        """Full-jitter üstel bekleme"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def retry_after(resp):
+        """Retry-After başlığının istediği saniye (saniye ya da HTTP tarihi), yoksa None"""
+        value = (resp.headers.get("Retry-After") or "").strip()
+        if not value: return None
+        try: return max(0.0, float(value))
+        except ValueError: pass
+        try: return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError, OverflowError): return None
+
+    @staticmethod
+    def sleep(seconds, task=None):
+        """seconds kadar bekler; iptal edilen görev beklemeyi hemen bitirir"""
+        if task: task.sleep(seconds)
+        else: time.sleep(seconds)
+
+    def request(self, method, url, call_type="default", retry=None, task=None, **kwargs):
+        session = self.session(url)
+        host = self.host_key(url)
+        kwargs.setdefault("timeout", self.timeout_for(call_type))
+        if retry is None: retry = method.upper() in ("GET", "HEAD")
+        attempts = (self.max_retries + 1) if retry else 1
+
+        for attempt in range(attempts):
+            if task: task.check_cancelled()
+            with self._lock: self._counters[host]["requests"] += 1
+            delay = None
+            try:
+                resp = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                with self._lock: self._counters[host]["errors"] += 1
+                if attempt + 1 >= attempts: raise
+                print(f"   -> {method} {url} failed ({e}), retrying...")
+            else:
+                if resp.status_code not in self.RETRY_STATUS or attempt + 1 >= attempts:
+                    return resp
+                # 429/503: sunucunun istediği süre beklenir, sınırı aşarsa tekrar denenmez
+                delay = self.retry_after(resp)
+                if delay is not None and delay > self.RETRY_AFTER_MAX:
+                    return resp
+                resp.close()
+            with self._lock: self._counters[host]["retries"] += 1
+            self.sleep(self.backoff_delay(attempt) if delay is None else delay, task)
+
+    def get(self, url, call_type="default", **kwargs):
+        return self.request("GET", url, call_type=call_type, **kwargs)
+
+    def head(self, url, call_type="default", **kwargs):
+        return self.request("HEAD", url, call_type=call_type, **kwargs)
+
+    def put(self, url, call_type="upload", **kwargs):
+        return self.request("PUT", url, call_type=call_type, **kwargs)
+
+    def delete(self, url, call_type="delete", **kwargs):
+        return self.request("DELETE", url, call_type=call_type, **kwargs)
+
+    def stats(self):
+        """Sunucu başına sayaçlar; 'reused' var olan bağlantıyla yapılan istek sayısı"""
+        result = {}
+        with self._lock:
+            for host, session in self._sessions.items():
+                counters = dict(self._counters[host])
+                connections = 0
+                pool_requests = 0
+                for adapter in set(session.adapters.values()):
+                    pools = adapter.poolmanager.pools
+                    for key in list(pools.keys()):
+                        pool = pools.get(key)
+                        if pool is None: continue
+                        connections += pool.num_connections
+                        pool_requests += pool.num_requests
+                counters["connections"] = connections
+                counters["reused"] = max(0, pool_requests - connections)
+                result[host] = counters
+        return result
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+# ==============================================================================
+# 7. IN-MEMORY NIFTI DECODING
+# ==============================================================================
+
+class AIRadarNiftiUnsupported(ValueError):
+    """Akış, bellek içi çözücünün işleyebileceği tek dosyalı bir NIfTI-1 volume değil"""
+
+
+class AIRadarVolumeData:
+    """İndirilen volume: IJK-to-RAS matrisiyle çözülmüş voksel dizisi ya da dosya yolu"""
+
+    def __init__(self, array=None, ijk_to_ras=None, path=None):
+        self.array = array
+        self.ijk_to_ras = ijk_to_ras
+        self.path = path
+
+    @property
+    def nbytes(self):
+        if self.array is not None: return self.array.nbytes
+        return os.path.getsize(self.path) if self.path else 0
+
+    @staticmethod
+    def preview_factor(shape, max_voxels):
+        """[k, j, i] boyutu en fazla max_voxels'e indiren en küçük adım"""
+        voxels = int(np.prod(shape))
+        factor = max(1, int(np.ceil((voxels / max_voxels) ** (1.0 / 3))))
+        while int(np.prod([-(-n // factor) for n in shape])) > max_voxels: factor += 1
+        return factor
+
+    @staticmethod
+    def strided_ijk_to_ras(ijk_to_ras, factor):
+        """Her factor'üncü vokselin IJK-to-RAS'ı: aynı orijin, factor kat aralık"""
+        matrix = np.array(ijk_to_ras, dtype=float)
+        matrix[:3, :3] *= factor
+        return matrix
+
+    def downsampled(self, factor):
+        """Her eksende her factor'üncü voksel, RAS'ta aynı konumda"""
+        return AIRadarVolumeData(array=np.ascontiguousarray(self.array[::factor, ::factor, ::factor]),
+                                 ijk_to_ras=self.strided_ijk_to_ras(self.ijk_to_ras, factor))
+
+
+class AIRadarNiftiDecoder:
+    """Ağdan gelen (gzip'li olabilen) NIfTI-1 akışını parça parça numpy dizisine çözer"""
+
+    HEADER_SIZE = 348
+    DATATYPES = {2: "u1", 4: "i2", 8: "i4", 16: "f4", 64: "f8", 256: "i1", 512: "u2", 768: "u4", 1024: "i8", 1280: "u8"}
+
+    def __init__(self):
+        self.header = None
+        self._gzip = None
+        self._magic = b""
+        self._inflater = None
+        self._head = bytearray()
+        self._skip = 0
+        self._array = None
+        self._bytes = None
+        self._filled = 0
+
+    def feed(self, chunk):
+        if self._gzip is None:
+            self._magic += chunk
+            if len(self._magic) < 2: return
+            self._gzip = self._magic[:2] == b"\x1f\x8b"
+            chunk, self._magic = self._magic, b""
+        self._consume(self._inflate(chunk) if self._gzip else chunk)
+
+    def _inflate(self, chunk):
+        out = []
+        while chunk:
+            if self._inflater is None:
+                if chunk[:1] != b"\x1f": break  # son gzip üyesinden sonraki dolgu
+                self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            out.append(self._inflater.decompress(chunk))
+            if self._inflater.eof:
+                chunk = self._inflater.unused_data
+                self._inflater = None
+            else:
+                chunk = b""
+        return b"".join(out)
+
+    def _consume(self, data):
+        view = memoryview(data)
+        if self.header is None:
+            need = self.HEADER_SIZE - len(self._head)
+            self._head += view[:need]
+            view = view[need:]
+            if len(self._head) < self.HEADER_SIZE: return
+            self._parse_header(bytes(self._head))
+        if self._skip and view:
+            n = min(self._skip, len(view))
+            self._skip -= n
+            view = view[n:]
+        if view:
+            n = min(len(view), len(self._bytes) - self._filled)
+            self._bytes[self._filled:self._filled + n] = np.frombuffer(view[:n], dtype=np.uint8)
+            self._filled += n
+
+    def _parse_header(self, raw):
+        if struct.unpack("<i", raw[:4])[0] == self.HEADER_SIZE: endian = "<"
+        elif struct.unpack(">i", raw[:4])[0] == self.HEADER_SIZE: endian = ">"
+        else: raise AIRadarNiftiUnsupported("not a NIfTI-1 header")
+        if raw[344:347] != b"n+1": raise AIRadarNiftiUnsupported("not a single-file NIfTI-1 image")
+
+        dim = struct.unpack(endian + "8h", raw[40:56])
+        datatype = struct.unpack(endian + "h", raw[70:72])[0]
+        pixdim = struct.unpack(endian + "8f", raw[76:108])
+        vox_offset, scl_slope, scl_inter = struct.unpack(endian + "3f", raw[108:120])
+        qform_code, sform_code = struct.unpack(endian + "2h", raw[252:256])
+        quatern = struct.unpack(endian + "6f", raw[256:280])
+        srow = struct.unpack(endian + "12f", raw[280:328])
+
+        ndim = dim[0]
+        if ndim < 1 or ndim > 7 or any(d > 1 for d in dim[4:ndim + 1]):
+            raise AIRadarNiftiUnsupported(f"unsupported dimensions {dim[:ndim + 1]}")
+        if datatype not in self.DATATYPES:
+            raise AIRadarNiftiUnsupported(f"unsupported datatype {datatype}")
+
+        shape = tuple(max(1, dim[i]) if i <= ndim else 1 for i in (1, 2, 3))
+        self.header = {
+            "endian": endian, "shape": shape, "datatype": datatype, "pixdim": pixdim,
+            "scl_slope": scl_slope, "scl_inter": scl_inter,
+            "qform_code": qform_code, "sform_code": sform_code, "quatern": quatern, "srow": srow,
+        }
+        self._skip = max(0, int(vox_offset) - self.HEADER_SIZE)
+        self._array = np.empty(shape[0] * shape[1] * shape[2], dtype=np.dtype(self.DATATYPES[datatype]))
+        self._bytes = self._array.view(np.uint8)
+
+    def ijk_to_ras(self):
+        """sform, yoksa qform, yoksa pixdim'den IJK-to-RAS matrisi"""
+        h = self.header
+        pixdim = h["pixdim"]
+        matrix = np.eye(4)
+        if h["sform_code"] > 0:
+            matrix[:3, :] = np.array(h["srow"]).reshape(3, 4)
+        elif h["qform_code"] > 0:
+            b, c, d, qx, qy, qz = h["quatern"]
+            a = np.sqrt(max(0.0, 1.0 - (b * b + c * c + d * d)))
+            rotation = np.array([
+                [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+                [2 * (b * c + a * d), a * a + c * c - b * b - d * d, 2 * (c * d - a * b)],
+                [2 * (b * d - a * c), 2 * (c * d + a * b), a * a + d * d - c * c - b * b]])
+            qfac = -1.0 if pixdim[0] < 0 else 1.0
+            matrix[:3, :3] = rotation * np.array([pixdim[1], pixdim[2], pixdim[3] * qfac])
+            matrix[:3, 3] = [qx, qy, qz]
+        else:
+            matrix[:3, :3] = np.diag([pixdim[1] or 1.0, pixdim[2] or 1.0, pixdim[3] or 1.0])
+        return matrix
+
+    def _rescaled(self, array):
+        slope, inter = self.header["scl_slope"], self.header["scl_inter"]
+        if slope and np.isfinite(slope) and (slope != 1.0 or inter != 0.0):
+            array = array.astype(np.float32) * np.float32(slope) + np.float32(inter)
+        return array
+
+    def preview(self, factor):
+        """Şimdiye kadar çözülen dilimlerin her factor'üncü vokseli; başlık bilinmeden None"""
+        if self.header is None: return None
+        nx, ny, nz = self.header["shape"]
+        rows = min(nz, self._filled // (nx * ny * self._array.itemsize))
+        part = self._array.reshape(nz, ny, nx)[:rows:factor, ::factor, ::factor]
+        # Kopya: finish() diziyi yerinde çevirebilir
+        part = part.byteswap() if self.header["endian"] != ("<" if np.little_endian else ">") else part.copy()
+        part = self._rescaled(part)
+        array = np.zeros((-(-nz // factor), -(-ny // factor), -(-nx // factor)), dtype=part.dtype)
+        array[:part.shape[0]] = part
+        return AIRadarVolumeData(array=array, ijk_to_ras=AIRadarVolumeData.strided_ijk_to_ras(self.ijk_to_ras(), factor))
+
+    def finish(self):
+        if self.header is None or self._filled < len(self._bytes):
+            raise ValueError("Truncated NIfTI stream")
+        array = self._array
+        if self.header["endian"] != ("<" if np.little_endian else ">"):
+            array.byteswap(inplace=True)
+        array = self._rescaled(array)
+        nx, ny, nz = self.header["shape"]
+        return AIRadarVolumeData(array=array.reshape(nz, ny, nx), ijk_to_ras=self.ijk_to_ras())
+
+
+class AIRadarProgressiveView:
+    """Volume'u indirilirken önizlemelerle gösterir; tam çözünürlük aynı düğüme yerleşir"""
+
+    def __init__(self, post, show, max_voxels, interval):
+        self._post = post
+        self._show = show
+        self.max_voxels = max_voxels
+        self.interval = interval
+        self.node = None
+        self.previews = 0
+        self._lock = threading.Lock()
+        self._final = False
+        self._complete = False  # tam bir önizleme gösterildi; kısmi olanlar onu bozmasın
+        self._pending = False
+        self._last = time.monotonic()
+
+    def update(self, decoder):
+        """İşçi tarafı: çözülen kısmın önizlemesini en çok interval saniyede bir yayınlar"""
+        if decoder.header is None: return
+        now = time.monotonic()
+        with self._lock:
+            if self._final or self._complete or self._pending or now - self._last < self.interval: return
+            self._pending = True
+            self._last = now
+        nx, ny, nz = decoder.header["shape"]
+        self._post(self._apply, decoder.preview(AIRadarVolumeData.preview_factor((nz, ny, nx), self.max_voxels)))
+
+    def show(self, data):
+        """İşçi tarafı: tam bir düşük çözünürlüklü volume yayınlar"""
+        with self._lock:
+            if self._final: return
+            self._complete = self._pending = True
+        self._post(self._apply, data)
+
+    def _apply(self, data):
+        with self._lock:
+            self._pending = False
+            if self._final: return
+        self.node = self._show(data, self.node, False)
+        self.previews += 1
+
+    def finish(self, data):
+        """GUI thread: tam çözünürlüklü veriyi gösterir ve node'u döndürür"""
+        with self._lock:
+            self._final = True
+        self.node = self._show(data, self.node, True)
+        return self.node
+
+    def discard(self):
+        """GUI thread: başarısız yüklemenin önizlemesini kaldırır"""
+        with self._lock:
+            self._final = True
+        if self.node is not None and slicer.mrmlScene.IsNodePresent(self.node):
+            slicer.mrmlScene.RemoveNode(self.node)
+        self.node = None
+
+# ==============================================================================
+# 8. SEGMENTED RANGE DOWNLOADS
+# ==============================================================================
+
+class AIRadarRangeUnsupported(Exception):
+    """Sunucu Range isteğini yok saydı ya da kaynak indirme sırasında değişti"""
+
+
+class AIRadarRangeDownloader:
+    """HTTP Range istekleriyle devam ettirilebilir, çok segmentli indirmeler"""
+
+    SEGMENT_RETRIES = 3
+    CHUNK_BYTES = 256 * 1024
+    STATE_FLUSH_BYTES = 4 * 1024 ** 2
+
+    def __init__(self, http, cache, min_bytes=32 * 1024 ** 2, segment_bytes=16 * 1024 ** 2, parallel=4):
+        self.http = http
+        self.cache = cache
+        self.min_bytes = min_bytes
+        self.segment_bytes = segment_bytes
+        self.parallel = parallel
+
+    def supports(self, resp):
+        """resp, bayt aralığı kabul eden sunucudan büyük ve sıkıştırılmamış bir 200 yanıtıysa True"""
+        size = int(resp.headers.get("Content-Length") or 0)
+        encoding = resp.headers.get("Content-Encoding", "identity").lower()
+        return (resp.status_code == 200 and size >= self.min_bytes and encoding == "identity"
+                and resp.headers.get("Accept-Ranges", "").lower() == "bytes")
+
+    def download(self, resp, cache_key, task=None, phase=None, channel=None):
+        """Açık yanıtın kaynağını indirir; önbellekteki yolunu döndürür"""
+        with self.cache.key_lock(cache_key):
+            return self._download(resp, cache_key, task, phase, channel)
+
+    def _download(self, resp, cache_key, task, phase, channel):
+        url = resp.url
+        size = int(resp.headers["Content-Length"])
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        partial = self.cache.partial_path(cache_key)
+        state = _AIRadarRangeState(partial + ".json", size, etag, last_modified, self.segment_bytes)
+
+        if not state.resumed or not os.path.exists(partial):
+            state.reset()
+            with open(partial, "wb") as f:
+                try: os.posix_fallocate(f.fileno(), 0, size)
+                except (AttributeError, OSError): f.truncate(size)
+        else:
+            print(f"   -> Resuming download at {state.completed_bytes() / 1048576:.1f} / {size / 1048576:.1f} MB")
+
+        progress_lock = threading.Lock()
+        done = [state.completed_bytes()]
+
+        def advance(start, n):
+            state.advance(start, n)
+            with progress_lock:
+                done[0] += n
+                current = done[0]
+            if task: task.report_progress(current, size, phase, channel=channel)
+
+        # If-Range: kaynak değiştiyse sunucu 206 yerine 200 döner ve indirme yeniden başlar
+        validator = etag or last_modified
+        segments = state.pending_segments()
+        stop = threading.Event()
+        first = segments[0] if segments and segments[0][0] == 0 and state.written(0) == 0 else None
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix="AIRadarRange") as pool:
+                futures = [pool.submit(self._fetch_segment, url, partial, start, end, state, validator, task, advance, stop)
+                           for start, end in segments if (start, end) != first]
+                try:
+                    if first:
+                        # İlk segment zaten açık olan yanıttan okunur (ek istek yok)
+                        try:
+                            self._read_segment(resp, partial, 0, first[1], state, task, advance, stop)
+                        except requests.exceptions.RequestException:
+                            self._fetch_segment(url, partial, first[0], first[1], state, validator, task, advance, stop)
+                    else:
+                        resp.close()
+                    for future in concurrent.futures.as_completed(futures):
+                        future.result()
+                except BaseException:
+                    stop.set()
+                    for future in futures: future.cancel()
+                    raise
+        except AIRadarRangeUnsupported:
+            state.discard()
+            if os.path.exists(partial): os.remove(partial)
+            raise
+        except BaseException:
+            state.flush()
+            raise
+        finally:
+            resp.close()
+
+        state.discard()
+        return self.cache.commit_file(cache_key, partial, etag=etag, last_modified=last_modified)
+
+    def _fetch_segment(self, url, path, start, end, state, validator, task, advance, stop):
+        attempt = 0
+        while not stop.is_set():
+            offset = start + state.written(start)
+            if offset > end: return
+            headers = {"Range": f"bytes={offset}-{end}"}
+            if validator: headers["If-Range"] = validator
+            try:
+                resp = self.http.get(url, call_type="download", headers=headers, stream=True, task=task)
+                if resp.status_code != 206:
+                    resp.close()
+                    raise AIRadarRangeUnsupported(f"expected 206, got {resp.status_code}")
+                self._read_segment(resp, path, offset, end, state, task, advance, stop, segment_start=start)
+                return
+            except (AIRadarCancelled, AIRadarRangeUnsupported): raise
+            except (requests.exceptions.RequestException, ConnectionError) as e:
+                # İlerleme kaydedildiyse deneme sayacı sıfırlanır
+                attempt = 1 if start + state.written(start) > offset else attempt + 1
+                if attempt > self.SEGMENT_RETRIES: raise
+                print(f"   -> Segment {start}-{end} interrupted ({e}), resuming...")
+                self.http.sleep(self.http.backoff_delay(attempt), task)
+
+    def _read_segment(self, resp, path, offset, end, state, task, advance, stop, segment_start=None):
+        segment_start = offset if segment_start is None else segment_start
+        unflushed = 0
+        try:
+            with open(path, "r+b") as f:
+                f.seek(offset)
+                try:
+                    for chunk in resp.iter_content(chunk_size=self.CHUNK_BYTES):
+                        if task: task.check_cancelled()
+                        if stop.is_set(): raise AIRadarCancelled("segment stopped")
+                        n = min(len(chunk), end + 1 - offset)
+                        f.write(chunk[:n])
+                        offset += n
+                        advance(segment_start, n)
+                        unflushed += n
+                        if unflushed >= self.STATE_FLUSH_BYTES:
+                            self._persist(f, state, segment_start)
+                            state.flush()
+                            unflushed = 0
+                        if offset > end: break
+                finally:
+                    # Segment bittiğinde/kesildiğinde yazılanlar da diske indirilir
+                    self._persist(f, state, segment_start)
+        finally:
+            resp.close()
+        if offset <= end:
+            raise requests.exceptions.ChunkedEncodingError(f"segment ended at {offset}, expected {end + 1}")
+
+    @staticmethod
+    def _persist(f, state, segment_start):
+        """'.partial' dosyasını diske indirir (fsync), sonra segmentin yazılanlarını kalıcı işaretler"""
+        f.flush()
+        os.fsync(f.fileno())
+        state.persist(segment_start)
+
+
+class _AIRadarRangeState:
+    def __init__(self, path, size, etag, last_modified, segment_bytes):
+        self.path = path
+        self.identity = {"size": size, "etag": etag, "last_modified": last_modified, "segment_bytes": segment_bytes}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # written_bytes: dosyaya yazılanlar; persisted_bytes: fsync edilip sidecar'a yazılabilecekler
+        self.written_bytes = {}
+        self.persisted_bytes = {}
+        self.resumed = False
+        try:
+            with open(path, "r") as f:
+                saved = json.load(f)
+            if saved.get("identity") == self.identity:
+                self.written_bytes = {int(k): v for k, v in saved.get("written", {}).items()}
+                self.persisted_bytes = dict(self.written_bytes)
+                self.resumed = True
+        except Exception:
+            pass
+
+    def segments(self):
+        size, step = self.identity["size"], self.identity["segment_bytes"]
+        return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+    def pending_segments(self):
+        return [(start, end) for start, end in self.segments() if start + self.written(start) <= end]
+
+    def written(self, start):
+        with self._lock:
+            return self.written_bytes.get(start, 0)
+
+    def completed_bytes(self):
+        with self._lock:
+            return sum(self.written_bytes.values())
+
+    def advance(self, start, n):
+        with self._lock:
+            self.written_bytes[start] = self.written_bytes.get(start, 0) + n
+
+    def persist(self, start):
+        """Segmente yazılanları diskte olarak işaretler; veri dosyası fsync edildikten sonra çağrılır"""
+        with self._lock:
+            self.persisted_bytes[start] = self.written_bytes.get(start, 0)
+
+    def reset(self):
+        with self._lock:
+            self.written_bytes = {}
+            self.persisted_bytes = {}
+        self.flush()
+
+    def flush(self):
+        # Segment thread'leri aynı anda flush eder: yazma + replace tek seferde yapılır,
+        # böylece yarım yazılmış ya da eski bir sidecar yenisinin üzerine yazılamaz
+        with self._flush_lock:
+            with self._lock:
+                data = {"identity": self.identity, "written": {str(k): v for k, v in self.persisted_bytes.items()}}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def discard(self):
+        for path in (self.path, self.path + ".tmp"):
+            if os.path.exists(path): os.remove(path)
+
+# ==============================================================================
+# 9. STREAMING UPLOADS
+# ==============================================================================
+
+class AIRadarNiftiEncoder:
+    """AIRadarVolumeData dizisini tek dosyalı NIfTI-1 bayt akışı olarak yazar (istenirse büyük bir ızgaranın parçası olarak)"""
+
+    DATATYPES = {"u1": 2, "i2": 4, "i4": 8, "f4": 16, "f8": 64, "i1": 256, "u2": 512, "u4": 768, "i8": 1024, "u8": 1280}
+
+    def __init__(self, volume, shape=None, offset=(0, 0, 0)):
+        array = volume.array
+        if array.dtype == np.bool_: array = array.astype(np.uint8)
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        code = array.dtype.kind + str(array.dtype.itemsize)
+        if code not in self.DATATYPES: raise ValueError(f"Unsupported voxel type for NIfTI: {array.dtype}")
+        if array.ndim == 2: array = array[np.newaxis]
+        self.array = array
+        self.shape = tuple(shape) if shape is not None else array.shape
+        self.offset = tuple(offset)
+        self.datatype = self.DATATYPES[code]
+        self.ijk_to_ras = np.asarray(volume.ijk_to_ras, dtype=float)
+        self.header = self._header()
+
+    @property
+    def nbytes(self):
+        return len(self.header) + int(np.prod(self.shape)) * self.array.dtype.itemsize
+
+    def blocks(self, block_bytes):
+        """Başlığı ve ardından voksel baytlarını block_bytes'lık parçalar halinde verir (kopyasız)"""
+        yield self.header
+        if self.shape != self.array.shape:
+            yield from self._padded_blocks(block_bytes)
+            return
+        data = memoryview(self.array.reshape(-1).view(np.uint8))
+        for start in range(0, len(data), block_bytes):
+            yield data[start:start + block_bytes]
+
+    def _padded_blocks(self, block_bytes):
+        """Izgaranın tam k-dilimleri, dizinin dışı sıfır"""
+        nz, ny, nx = self.shape
+        k0, j0, i0 = self.offset
+        cz, cy, cx = self.array.shape
+        step = max(1, block_bytes // (ny * nx * self.array.dtype.itemsize))
+        zeros = None
+        for start in range(0, nz, step):
+            stop = min(nz, start + step)
+            lo, hi = max(start, k0), min(stop, k0 + cz)
+            if lo >= hi:
+                # Boş dilimler her seferinde aynı sıfır bloğunu paylaşır
+                if zeros is None or len(zeros) != (stop - start) * ny * nx * self.array.dtype.itemsize:
+                    zeros = bytes((stop - start) * ny * nx * self.array.dtype.itemsize)
+                yield zeros
+                continue
+            slab = np.zeros((stop - start, ny, nx), dtype=self.array.dtype)
+            slab[lo - start:hi - start, j0:j0 + cy, i0:i0 + cx] = self.array[lo - k0:hi - k0]
+            yield memoryview(slab.reshape(-1).view(np.uint8))
+
+    def _header(self):
+        nz, ny, nx = self.shape
+        matrix = self.ijk_to_ras
+        spacing = np.linalg.norm(matrix[:3, :3], axis=0)
+        spacing[spacing == 0] = 1.0
+        rotation = matrix[:3, :3] / spacing
+        qfac = 1.0
+        if np.linalg.det(rotation) < 0:
+            qfac = -1.0
+            rotation[:, 2] *= -1
+        b, c, d = self._quaternion(rotation)
+
+        hdr = bytearray(348)
+        struct.pack_into("<i", hdr, 0, 348)
+        struct.pack_into("<8h", hdr, 40, 3, nx, ny, nz, 1, 1, 1, 1)
+        struct.pack_into("<2h", hdr, 70, self.datatype, self.array.dtype.itemsize * 8)
+        struct.pack_into("<8f", hdr, 76, qfac, spacing[0], spacing[1], spacing[2], 0, 0, 0, 0)
+        struct.pack_into("<3f", hdr, 108, 352.0, 1.0, 0.0)
+        hdr[123] = 2  # mm
+        hdr[148:148 + 7] = b"AIRadar"
+        struct.pack_into("<2h", hdr, 252, 1, 1)
+        struct.pack_into("<6f", hdr, 256, b, c, d, matrix[0, 3], matrix[1, 3], matrix[2, 3])
+        struct.pack_into("<12f", hdr, 280, *matrix[:3, :].reshape(-1))
+        hdr[344:348] = b"n+1\x00"
+        return bytes(hdr) + b"\x00\x00\x00\x00"
+
+    @staticmethod
+    def _quaternion(r):
+        """Dönme matrisinin (b, c, d)'si, nifti_mat44_to_quatern'deki gibi"""
+        a = r[0, 0] + r[1, 1] + r[2, 2] + 1.0
+        if a > 0.5:
+            a = 0.5 * np.sqrt(a)
+            b, c, d = 0.25 * (r[2, 1] - r[1, 2]) / a, 0.25 * (r[0, 2] - r[2, 0]) / a, 0.25 * (r[1, 0] - r[0, 1]) / a
+        else:
+            xd, yd, zd = 1.0 + r[0, 0] - (r[1, 1] + r[2, 2]), 1.0 + r[1, 1] - (r[0, 0] + r[2, 2]), 1.0 + r[2, 2] - (r[0, 0] + r[1, 1])
+            if xd > 1.0:
+                b = 0.5 * np.sqrt(xd)
+                c, d, a = 0.25 * (r[0, 1] + r[1, 0]) / b, 0.25 * (r[0, 2] + r[2, 0]) / b, 0.25 * (r[2, 1] - r[1, 2]) / b
+            elif yd > 1.0:
+                c = 0.5 * np.sqrt(yd)
+                b, d, a = 0.25 * (r[0, 1] + r[1, 0]) / c, 0.25 * (r[1, 2] + r[2, 1]) / c, 0.25 * (r[0, 2] - r[2, 0]) / c
+            else:
+                d = 0.5 * np.sqrt(zd)
+                b, c, a = 0.25 * (r[0, 2] + r[2, 0]) / d, 0.25 * (r[1, 2] + r[2, 1]) / d, 0.25 * (r[1, 0] - r[0, 1]) / d
+            if a < 0.0: b, c, d = -b, -c, -d
+        return b, c, d
+
+
+class AIRadarCroppedLabel:
+    """Etiketli voksellerin sınır kutusuna kırpılmış etiket volume'u ve referans ızgaradaki yeri"""
+
+    def __init__(self, array, ref_shape, ref_ijk_to_ras, offset=(0, 0, 0)):
+        ref_shape = tuple(int(n) for n in ref_shape)
+        # Referans ızgarasının dışına taşan vokseller atılır (EXTENT_REFERENCE_GEOMETRY gibi)
+        lo = [max(0, o) for o in offset]
+        hi = [min(n, o + c) for n, o, c in zip(ref_shape, offset, array.shape)]
+        if any(h <= l for l, h in zip(lo, hi)):
+            array, lo = np.zeros((1, 1, 1), dtype=array.dtype), [0, 0, 0]
+        else:
+            array = array[tuple(slice(l - o, h - o) for l, h, o in zip(lo, hi, offset))]
+        self.array = array
+        self.ref_shape = ref_shape
+        self.ref_ijk_to_ras = np.asarray(ref_ijk_to_ras, dtype=float)
+        self.offset = tuple(int(o) for o in lo)
+
+    @classmethod
+    def place(cls, volume, ref_shape, ref_ijk_to_ras):
+        """volume'u referans ızgaraya yerleştirir; voksel örgüleri uyuşmazsa None"""
+        ijk = np.linalg.inv(np.asarray(ref_ijk_to_ras, dtype=float)) @ np.asarray(volume.ijk_to_ras, dtype=float)
+        shift = ijk[:3, 3]
+        if not np.allclose(ijk[:3, :3], np.eye(3), atol=1e-3) or not np.allclose(shift, np.round(shift), atol=1e-2):
+            return None
+        i, j, k = (int(v) for v in np.round(shift))
+        array = volume.array if volume.array.ndim == 3 else volume.array.reshape((1,) * (3 - volume.array.ndim) + volume.array.shape)
+        return cls(array, ref_shape, ref_ijk_to_ras, (k, j, i))
+
+    def shrink(self):
+        """Kırpmayı etiketli voksellere daraltır"""
+        extent = [np.flatnonzero(self.array.any(axis=axes)) for axes in ((1, 2), (0, 2), (0, 1))]
+        if any(len(e) == 0 for e in extent):
+            return AIRadarCroppedLabel(self.array[:1, :1, :1] * 0, self.ref_shape, self.ref_ijk_to_ras, self.offset)
+        box = tuple(slice(e[0], e[-1] + 1) for e in extent)
+        offset = tuple(o + e[0] for o, e in zip(self.offset, extent))
+        return AIRadarCroppedLabel(np.ascontiguousarray(self.array[box]), self.ref_shape, self.ref_ijk_to_ras, offset)
+
+    @property
+    def voxels(self):
+        return self.array.size
+
+    @property
+    def ref_voxels(self):
+        return int(np.prod(self.ref_shape))
+
+    @property
+    def full_nbytes(self):
+        """Sıkıştırılmamış tam ızgara NIfTI'nin boyutu"""
+        return 352 + self.ref_voxels * self.array.dtype.itemsize
+
+    def cropped(self):
+        """Kırpılmış parça, RAS'taki gerçek konumunda ayrı bir volume olarak"""
+        k, j, i = self.offset
+        matrix = self.ref_ijk_to_ras.copy()
+        matrix[:3, 3] = self.ref_ijk_to_ras[:3, :3] @ [i, j, k] + self.ref_ijk_to_ras[:3, 3]
+        return AIRadarVolumeData(array=self.array, ijk_to_ras=matrix)
+
+    def encoder(self):
+        """Kırpılmış parçanın etrafı sıfırla doldurulmuş tam referans ızgaranın NIfTI kodlayıcısı"""
+        return AIRadarNiftiEncoder(AIRadarVolumeData(array=self.array, ijk_to_ras=self.ref_ijk_to_ras), shape=self.ref_shape, offset=self.offset)
+
+    def restored(self):
+        """Referans ızgarada tam boyutlu etiket"""
+        array = np.zeros(self.ref_shape, dtype=self.array.dtype)
+        k, j, i = self.offset
+        cz, cy, cx = self.array.shape
+        array[k:k + cz, j:j + cy, i:i + cx] = self.array
+        return AIRadarVolumeData(array=array, ijk_to_ras=self.ref_ijk_to_ras)
+
+    def metadata(self):
+        """Kırpılmış parçanın ızgaradaki yeri, NIfTI'deki gibi [i, j, k] sırasında"""
+        return {"type": "bbox", "offset": list(self.offset[::-1]), "ref_shape": list(self.ref_shape[::-1])}
+
+
+class AIRadarParallelGzip:
+    """pigz tarzı blok paralel gzip; her blok bağımsız bir gzip üyesi olur"""
+
+    def __init__(self, level=3, workers=None):
+        self.level = level
+        self.workers = workers or max(1, os.cpu_count() or 1)
+
+    def compress(self, blocks, on_block=None):
+        if not self.level:
+            for block in blocks:
+                if on_block: on_block(len(block))
+                yield bytes(block)
+            return
+
+        def work(block):
+            return len(block), gzip.compress(block, compresslevel=self.level, mtime=0)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="AIRadarGzip") as pool:
+            pending = collections.deque()
+            try:
+                for block in blocks:
+                    pending.append(pool.submit(work, block))
+                    while len(pending) > 2 * self.workers:
+                        raw_bytes, data = pending.popleft().result()
+                        if on_block: on_block(raw_bytes)
+                        yield data
+                while pending:
+                    raw_bytes, data = pending.popleft().result()
+                    if on_block: on_block(raw_bytes)
+                    yield data
+            finally:
+                for future in pending: future.cancel()
+
+
+class AIRadarMultipartBody:
+    """Yinelenebilir multipart/form-data gövdesi; requests bunu chunked gönderir"""
+
+    def __init__(self, fields, file_field, filename, chunks):
+        self.boundary = uuid.uuid4().hex
+        self.fields = fields or {}
+        self.file_field = file_field
+        self.filename = filename
+        self.chunks = chunks
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __iter__(self):
+        for name, value in self.fields.items():
+            yield (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n').encode("utf-8")
+        yield (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{self.file_field}"; filename="{self.filename}"\r\n'
+               f'Content-Type: application/octet-stream\r\n\r\n').encode("utf-8")
+        for chunk in self.chunks:
+            yield chunk
+        yield f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+# ==============================================================================
+# 10. DATASTORE SNAPSHOTS
+# ==============================================================================
+
+class AIRadarDatastoreSnapshot:
+    """Bir (sunucu, kullanıcı) çifti için bilinen son MONAI datastore listesi"""
+
+    def __init__(self, objects, etag=None, last_modified=None, synced_at=None):
+        self.objects = objects
+        self.etag = etag
+        self.last_modified = last_modified
+        self.synced_at = synced_at or time.time()
+        self._owner_index = None
+        self._index_lock = threading.Lock()
+
+    def owner_index(self):
+        """Bu snapshot'ın AIRadarOwnerIndex'i, ilk kullanımda kurulur"""
+        with self._index_lock:
+            if self._owner_index is None:
+                self._owner_index = AIRadarOwnerIndex(self.objects)
+            return self._owner_index
+
+    def objects_changed(self, image_id):
+        """Yerinde düzenlenen bir nesnenin sahiplik indeksi kayıtlarını tazeler"""
+        with self._index_lock:
+            if self._owner_index is not None:
+                self._owner_index.update(image_id, self.objects.get(image_id))
+
+    @property
+    def data(self):
+        return {"objects": self.objects}
+
+    def age(self):
+        return time.time() - self.synced_at
+
+    def validators(self):
+        headers = {}
+        if self.etag: headers["If-None-Match"] = self.etag
+        if self.last_modified: headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_json(self):
+        return {"objects": self.objects, "etag": self.etag, "last_modified": self.last_modified, "synced_at": self.synced_at}
+
+
+class AIRadarDatastoreIndex:
+    """MONAI datastore listesinin kalıcı yerel snapshot'ları; her kayıttan sonra on_change çağrılır"""
+
+    def __init__(self, snapshot_dir, on_change=None):
+        self.snapshot_dir = snapshot_dir
+        self.on_change = on_change
+        self._snapshots = {}
+        self._lock = threading.RLock()
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    @staticmethod
+    def objects_map(data):
+        """/datastore/ yanıtını (dict ya da liste) {nesne id: ayrıntılar} biçimine getirir"""
+        objects_map = {}
+        if isinstance(data, dict):
+            raw = data.get("objects", data)
+            if isinstance(raw, dict): return raw
+            data = raw
+        if isinstance(data, list):
+            for item in data:
+                if isinstance(item, dict):
+                    name = item.get('id') or item.get('image') or item.get('name')
+                    if name: objects_map[name] = item
+        return objects_map
+
+    def _path(self, server, user):
+        digest = hashlib.sha256(f"{server}\x1f{user}".encode("utf-8")).hexdigest()
+        return os.path.join(self.snapshot_dir, digest + ".json")
+
+    def get(self, server, user):
+        key = (server, str(user))
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None:
+                try:
+                    with open(self._path(server, user), "r") as f:
+                        saved = json.load(f)
+                    snapshot = AIRadarDatastoreSnapshot(saved["objects"], saved.get("etag"), saved.get("last_modified"), saved.get("synced_at"))
+                    self._snapshots[key] = snapshot
+                except Exception:
+                    return None
+            return snapshot
+
+    def _save(self, server, user, snapshot, image_ids):
+        self._snapshots[(server, str(user))] = snapshot
+        path = self._path(server, user)
+        with open(path + ".tmp", "w") as f:
+            json.dump(snapshot.to_json(), f)
+        os.replace(path + ".tmp", path)
+        if self.on_change: self.on_change(server, user, snapshot, image_ids)
+
+    def replace(self, server, user, data, etag=None, last_modified=None):
+        """Yeni listeyi kaydeder; (snapshot, {'added', 'removed', 'changed'} sayıları) döndürür"""
+        objects = self.objects_map(data)
+        with self._lock:
+            previous = self.get(server, user)
+            old = previous.objects if previous else {}
+            added = [k for k in objects if k not in old]
+            removed = [k for k in old if k not in objects]
+            changed = [k for k, v in objects.items() if k in old and old[k] != v]
+            changes = {"added": len(added), "removed": len(removed), "changed": len(changed)}
+            snapshot = AIRadarDatastoreSnapshot(objects, etag, last_modified)
+            # Dinleyici yalnızca değişen nesneleri yeniden yazar
+            self._save(server, user, snapshot, tuple(added + removed + changed) if previous else None)
+            return snapshot, changes
+
+    def touch(self, server, user):
+        with self._lock:
+            snapshot = self.get(server, user)
+            if snapshot:
+                snapshot.synced_at = time.time()
+                self._save(server, user, snapshot, ())
+            return snapshot
+
+    def record_upload(self, server, user, image_id, image_info=None, label_tag=None, label_info=None):
+        """Başarılı görüntü/etiket yüklemesini snapshot'a işler"""
+        with self._lock:
+            snapshot = self.get(server, user)
+            if snapshot is None: return
+            details = snapshot.objects.setdefault(image_id, {"image": {}, "labels": {}})
+            if image_info is not None:
+                details["info"] = dict(image_info)
+                details["client_id"] = user
+            if label_tag:
+                labels = details.get("labels")
+                if not isinstance(labels, dict): labels = details["labels"] = {}
+                labels[str(label_tag)] = {"info": dict(label_info or {})}
+            snapshot.objects_changed(image_id)
+            # Sunucu değişti; bir sonraki koşullu istek yeni listeyi almalı
+            snapshot.etag = snapshot.last_modified = None
+            self._save(server, user, snapshot, (image_id,))
+
+    def record_delete(self, server, user, image_id, delete_mode, tag=None):
+        """Başarılı görüntü ya da etiket silmesini snapshot'a işler"""
+        with self._lock:
+            snapshot = self.get(server, user)
+            if snapshot is None: return
+            if delete_mode == "image":
+                snapshot.objects.pop(image_id, None)
+            else:
+                labels = snapshot.objects.get(image_id, {}).get("labels")
+                if isinstance(labels, dict): labels.pop(str(tag), None)
+            snapshot.objects_changed(image_id)
+            snapshot.etag = snapshot.last_modified = None
+            self._save(server, user, snapshot, (image_id,))
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_object_params(raw):
+    """Datastore 'params' metinleri için önbellekli json.loads"""
+    try:
+        parsed = json.loads(raw)
+        return parsed if isinstance(parsed, dict) else None
+    except Exception:
+        return None
+
+
+class AIRadarOwnerIndex:
+    """Datastore nesne sahipliğinin tek geçişte kurulan indeksi: kullanıcı id -> veri seti id'leri"""
+
+    def __init__(self, objects):
+        self._owners = collections.defaultdict(set)
+        self._objects = {}
+        self._public = set()
+        for name, details in objects.items():
+            self.update(name, details)
+
+    @staticmethod
+    def object_owners(details):
+        owners = set()
+        if not isinstance(details, dict): return owners
+        if details.get('client_id') is not None: owners.add(str(details['client_id']))
+        if details.get('tag') is not None: owners.add(str(details['tag']))
+        raw_params = details.get('params') or details.get('info')
+        if raw_params:
+            p_dict = raw_params if isinstance(raw_params, dict) else _parse_object_params(raw_params) if isinstance(raw_params, str) else None
+            if p_dict:
+                uploaded_by = p_dict.get('uploaded_by') or p_dict.get('session_id')
+                if uploaded_by is not None: owners.add(str(uploaded_by))
+        labels = details.get('labels')
+        if isinstance(labels, dict):
+            owners.update(str(tag) for tag in labels)
+        return owners
+
+    @staticmethod
+    def object_is_public(name, details):
+        """Nesne, görüntü ya da etiket metadata'sında herkese açık işaretliyse True"""
+        if name.startswith("public_"): return True
+        if not isinstance(details, dict): return False
+        if str(details.get('client_id')) == AIRadarLogic.MASTER_PUBLIC_SESSION_ID: return True
+        infos = [details.get('params'), details.get('info'), (details.get('image') or {}).get('info')]
+        labels = details.get('labels')
+        if isinstance(labels, dict):
+            infos.extend((label or {}).get('info') for label in labels.values() if isinstance(label, dict))
+        for raw in infos:
+            info = raw if isinstance(raw, dict) else _parse_object_params(raw) if isinstance(raw, str) else None
+            if info and (info.get('ispublic') is True or info.get('is_public') is True): return True
+        return False
+
+    def update(self, name, details):
+        """Tek bir nesneyi (yeniden) indeksler; details=None onu kaldırır"""
+        if not isinstance(name, str) or "{" in name: return
+        for owner in self._objects.pop(name, ()):
+            self._owners[owner].discard(name)
+        self._public.discard(name)
+        if details is None: return
+        owners = self.object_owners(details)
+        self._objects[name] = owners
+        for owner in owners:
+            self._owners[owner].add(name)
+        if self.object_is_public(name, details): self._public.add(name)
+
+    def owned_by(self, user_id):
+        return set(self._owners.get(str(user_id), ()))
+
+    def public(self):
+        return set(self._public)
+
+    def names(self):
+        return set(self._objects)
+
+# ==============================================================================
+# 11. DEVICE PAIRING
+# ==============================================================================
+
+class AIRadarPairing:
+    """Cihaz kodunun portalda onaylanmasını GUI thread'ine dokunmadan bekler"""
+
+    LONG_POLL_WAIT = 25
+    POLL_INTERVAL = 1.0
+    POLL_INTERVAL_MAX = 10.0
+    ERROR_BACKOFF_MAX = 30.0
+
+    def __init__(self, http, base_url, device_code, on_event, post):
+        self.http = http
+        self.base_url = base_url.rstrip('/')
+        self.device_code = device_code
+        self.on_event = on_event
+        self.post = post
+        self.mode = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"AIRadarPairing-{device_code}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Beklemeyi bitirir ve sonraki olayları susturur"""
+        self._stop.set()
+
+    def is_running(self):
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    @staticmethod
+    def is_logged_in(data):
+        return isinstance(data, dict) and bool(data.get("success")) and data.get("status") == "LOGGED_IN"
+
+    def _emit(self, event, data=None):
+        if not self._stop.is_set(): self.post(self.on_event, event, data)
+
+    def _run(self):
+        registered = False
+        errors = 0
+        poll_delay = self.POLL_INTERVAL
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                if not registered:
+                    self._request(f"{self.base_url}/api/start-session/{self.device_code}").close()
+                    registered = True
+                    self._emit("registered", self.device_code)
+                data = self._check()
+            except Exception as e:
+                if self._stop.is_set(): return
+                if isinstance(e, LookupError): registered = False
+                errors += 1
+                print(f"Pairing Error: {e}")
+                self._emit("error", str(e))
+                self._stop.wait(min(self.ERROR_BACKOFF_MAX, self.POLL_INTERVAL * 2 ** errors) * random.uniform(0.5, 1.0))
+                continue
+            errors = 0
+            if self.is_logged_in(data):
+                self._emit("logged_in", data)
+                return
+            if self.mode == "poll":
+                self._stop.wait(poll_delay)
+                poll_delay = min(self.POLL_INTERVAL_MAX, poll_delay * 2)
+            else:
+                # A stream or long poll that ends immediately must not spin
+                self._stop.wait(max(0.0, self.POLL_INTERVAL - (time.monotonic() - started)))
+
+    def _request(self, url, timeout=None, **kwargs):
+        if timeout is None: timeout = self.http.timeout_for("poll")
+        resp = self.http.get(url, call_type="poll", retry=False, timeout=timeout, **kwargs)
+        if self._stop.is_set():
+            resp.close()
+            raise AIRadarCancelled("pairing stopped")
+        return resp
+
+    def _check(self):
+        url = f"{self.base_url}/api/check-session/{self.device_code}"
+        connect_timeout = self.http.timeout_for("poll")[0]
+        if self.mode in (None, "sse"):
+            resp = self._request(url, timeout=(connect_timeout, self.LONG_POLL_WAIT + 10), stream=True, headers={"Accept": "text/event-stream"})
+            if resp.headers.get("Content-Type", "").startswith("text/event-stream"):
+                self.mode = "sse"
+                return self._read_events(resp)
+            if self.mode is None: self.mode = "probe"
+            return self._status(resp)
+        if self.mode in ("probe", "long-poll"):
+            started = time.monotonic()
+            data = self._status(self._request(url, timeout=(connect_timeout, self.LONG_POLL_WAIT + 10), params={"wait": self.LONG_POLL_WAIT}))
+            if self.mode == "probe" and not self.is_logged_in(data):
+                self.mode = "long-poll" if time.monotonic() - started >= self.LONG_POLL_WAIT / 2 else "poll"
+            return data
+        return self._status(self._request(url))
+
+    def _status(self, resp):
+        with resp:
+            if resp.status_code == 404: raise LookupError(f"device code {self.device_code} unknown to portal")
+            if resp.status_code != 200: raise RuntimeError(f"check-session returned HTTP {resp.status_code}")
+            return resp.json()
+
+    def _read_events(self, resp):
+        """LOGGED_IN olayına ya da sunucu kapatana kadar olay akışını okur"""
+        data_lines = []
+        try:
+            if resp.status_code == 404: raise LookupError(f"device code {self.device_code} unknown to portal")
+            if resp.status_code != 200: raise RuntimeError(f"check-session stream returned HTTP {resp.status_code}")
+            # Small reads so events (and keep-alive comments) surface as soon as they arrive
+            for line in resp.iter_lines(chunk_size=1, decode_unicode=True):
+                if self._stop.is_set(): return None
+                if line is None: continue
+                if line.startswith("data:"):
+                    data_lines.append(line[5:].strip())
+                elif not line and data_lines:
+                    try: data = json.loads("\n".join(data_lines))
+                    except ValueError: data = None
+                    data_lines = []
+                    if self.is_logged_in(data): return data
+        except requests.exceptions.ConnectionError:
+            if self._stop.is_set(): return None
+            # idle streams are dropped by proxies; reconnect
+        finally:
+            resp.close()
+        return None
+
+# ==============================================================================
+# 12. BACKGROUND PREFETCH
+# ==============================================================================
+
+class AIRadarBandwidthLimiter:
+    """Ön indirme işçilerinin paylaştığı token bucket; reserve() beklenecek süreyi döndürür"""
+
+    def __init__(self, max_bps, burst_seconds=1.0):
+        self.max_bps = max_bps
+        self.burst_seconds = burst_seconds
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        if not self.max_bps: return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now - self.burst_seconds) + nbytes / self.max_bps
+            return max(0.0, self._next - now)
+
+
+class _AIRadarPrefetchJob:
+    def __init__(self, cache_key, task):
+        self.cache_key = cache_key
+        self.task = task
+        self.future = None
+        self.claimed = False  # a foreground load is waiting: no throttling, no cancellation
+
+
+class AIRadarPrefetcher:
+    """Sıradaki olası backend vakalarını (görüntü + kullanıcı etiketi) volume önbelleğine indirir"""
+
+    FRESH_SECONDS = 300   # a prefetched file is not revalidated again within this window
+    IDLE_POLL = 0.2
+
+    def __init__(self, logic, workers=2, max_bps=None):
+        self.logic = logic
+        self.limiter = AIRadarBandwidthLimiter(max_bps)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="AIRadarPrefetch")
+        self._jobs = {}
+        self._fetched = {}  # cache_key -> (monotonic time, found)
+        self._counters = {"scheduled": 0, "completed": 0, "cancelled": 0, "failed": 0, "bytes": 0, "hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def schedule(self, base_url, image_keys, user_tag=None):
+        wanted = []
+        for key in image_keys:
+            wanted.append((AIRadarLogic.backend_image_url(base_url, key), ("backend", base_url, "image", key, None)))
+            if user_tag:
+                wanted.append((AIRadarLogic.backend_label_url(base_url, key, user_tag), ("backend", base_url, "label", key, user_tag)))
+        wanted_keys = {cache_key for _, cache_key in wanted}
+
+        with self._lock:
+            if self._closed: return
+            for cache_key, job in list(self._jobs.items()):
+                if cache_key not in wanted_keys and not job.claimed:
+                    job.task.cancel()
+                    del self._jobs[cache_key]
+            now = time.monotonic()
+            for url, cache_key in wanted:
+                if cache_key in self._jobs: continue
+                fetched = self._fetched.get(cache_key)
+                if fetched and now - fetched[0] < self.FRESH_SECONDS and (not fetched[1] or self.logic.cache.lookup(cache_key)):
+                    continue
+                job = _AIRadarPrefetchJob(cache_key, AIRadarTask(self.logic.tasks, f"prefetch {cache_key[3]}"))
+                self._jobs[cache_key] = job
+                self._counters["scheduled"] += 1
+                job.future = self._executor.submit(self._run, job, url)
+                job.task.future = job.future
+
+    def _run(self, job, url):
+        try:
+            job.task.check_cancelled()
+            path, status = self.logic._fetch_to_cache(url, job.cache_key, task=job.task, throttle=lambda n: self._throttle(job, n))
+            with self._lock:
+                self._fetched[job.cache_key] = (time.monotonic(), path is not None)
+                if path: self._counters["completed"] += 1
+            return path
+        except AIRadarCancelled:
+            with self._lock: self._counters["cancelled"] += 1
+            return None
+        except Exception as e:
+            print(f"Prefetch Error ({job.cache_key[3]}): {e}")
+            with self._lock: self._counters["failed"] += 1
+            return None
+        finally:
+            with self._lock:
+                if self._jobs.get(job.cache_key) is job: del self._jobs[job.cache_key]
+
+    def _throttle(self, job, nbytes):
+        with self._lock: self._counters["bytes"] += nbytes
+        # Önplandaki indirmeler sürerken hattı onlara bırak
+        while not job.claimed and self.logic.tasks.active_tasks():
+            job.task.check_cancelled()
+            time.sleep(self.IDLE_POLL)
+        delay = self.limiter.reserve(nbytes)
+        deadline = time.monotonic() + delay
+        while not job.claimed and time.monotonic() < deadline:
+            job.task.check_cancelled()
+            time.sleep(min(self.IDLE_POLL, deadline - time.monotonic()))
+        job.task.check_cancelled()
+
+    def claim(self, cache_key, task=None):
+        """Ön plan yüklemesi cache_key'i indirmeden önce çağırır; dosya ön indirme sayesinde önbellekteyse True"""
+        with self._lock:
+            job = self._jobs.get(cache_key)
+            if job is not None:
+                if job.future.cancel():
+                    # Henüz başlamamış: önplan kendisi indirsin
+                    del self._jobs[cache_key]
+                    job = None
+                else:
+                    job.claimed = True
+            fetched = self._fetched.get(cache_key)
+
+        if job is not None:
+            while True:
+                if task: task.check_cancelled()
+                try:
+                    hit = job.future.result(timeout=self.IDLE_POLL) is not None
+                    break
+                except concurrent.futures.TimeoutError:
+                    continue
+                except concurrent.futures.CancelledError:
+                    hit = False
+                    break
+        elif fetched and not fetched[1]:
+            return False  # sunucuda yok (ör. etiketlenmemiş vaka): isabet/ıskalama sayılmaz
+        else:
+            hit = bool(fetched) and self.logic.cache.lookup(cache_key) is not None
+
+        with self._lock:
+            self._counters["hits" if hit else "misses"] += 1
+        return hit
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._jobs)
+        claims = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / claims if claims else None
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            jobs = list(self._jobs.values())
+            self._jobs = {}
+        for job in jobs:
+            job.task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# ==============================================================================
+# 13. PATIENT LIST INDEX
+# ==============================================================================
+
+class AIRadarPatientIndex:
+    """Backend hasta kayıtlarında (ad ve anahtar, büyük/küçük harf duyarsız) yazarken arama"""
+
+    MEMO_SIZE = 64
+
+    def __init__(self, patients, complete=True):
+        self.patients = patients
+        self.complete = complete
+        self._texts = [f"{p.get('name', '')}\t{p.get('key', '')}".lower() for p in patients]
+        pairs = []
+        for row, p in enumerate(patients):
+            pairs.append((str(p.get('name', '')).lower(), row))
+            pairs.append((str(p.get('key', '')).lower(), row))
+        pairs.sort()
+        self._prefix_keys = [text for text, _ in pairs]
+        self._prefix_rows = np.asarray([row for _, row in pairs], dtype=np.int64)
+        chars = collections.defaultdict(list)
+        for row, text in enumerate(self._texts):
+            for char in set(text):
+                chars[char].append(row)
+        self._chars = {char: np.asarray(rows, dtype=np.int64) for char, rows in chars.items()}
+        self._memo = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.patients)
+
+    def prefix_mask(self, query):
+        """Adı ya da anahtarı query ile başlayan kayıtların maskesi"""
+        lo = bisect.bisect_left(self._prefix_keys, query)
+        hi = bisect.bisect_left(self._prefix_keys, query + "\uffff", lo)
+        mask = np.zeros(len(self.patients), dtype=bool)
+        mask[self._prefix_rows[lo:hi]] = True
+        return mask
+
+    def substring(self, query, known=None):
+        """query'yi içeren satırlar; known, eşleştiği bilinen satırların isteğe bağlı maskesi"""
+        empty = np.zeros(0, np.int64)
+        if len(query) == 1: return self._chars.get(query, empty)
+        with self._lock:
+            rows = self._memo.get(query)
+            if rows is not None:
+                self._memo.move_to_end(query)
+                return rows
+            candidates = [r for q, r in self._memo.items() if q in query]
+        candidates.extend(self._chars.get(char, empty) for char in set(query))
+        base = min(candidates, key=len)
+        if known is not None: base = base[~known[base]]
+        texts = self._texts
+        rows = np.array([row for row in base.tolist() if query in texts[row]], dtype=np.int64)
+        if known is not None and known.any():
+            mask = known.copy()
+            mask[rows] = True
+            rows = np.flatnonzero(mask)
+        with self._lock:
+            self._memo[query] = rows
+            while len(self._memo) > self.MEMO_SIZE: self._memo.popitem(last=False)
+        return rows
+
+    def search(self, query):
+        query = " ".join(str(query).lower().split())
+        if not query: return np.arange(len(self.patients), dtype=np.int64)
+        if "\t" in query: return np.zeros(0, np.int64)
+        # Ön ek eşleşmeleri sorguyu zaten içerir: tekrar doğrulanmaz, listenin başına alınır
+        is_prefix = self.prefix_mask(query)
+        rows = self.substring(query, is_prefix)
+        return np.concatenate([np.flatnonzero(is_prefix), rows[~is_prefix[rows]]])
+
+# ==============================================================================
+# 14. VOLUME RENDERING PROFILES
+# ==============================================================================
+
+class AIRadarRenderProfile:
+    """Bir iş istasyonu türü ya da kullanım için volume rendering ayarları"""
+
+    METHODS = {"gpu": "vtkMRMLGPURayCastVolumeRenderingDisplayNode", "cpu": "vtkMRMLCPURayCastVolumeRenderingDisplayNode"}
+    PRESETS = {"CT": "CT-Chest-Contrast-Enhanced", "MR": "MR-Default"}
+    DEFAULT_PRESET = "MR-Default"
+    PROFILES = {
+        "balanced": {"method": "gpu", "target_fps": 15, "max_voxels": 320 ** 3, "adaptive": True},
+        "quality": {"method": "gpu", "target_fps": 8, "max_voxels": 1024 ** 3, "adaptive": False},
+        "cpu": {"method": "cpu", "target_fps": 10, "max_voxels": 160 ** 3, "adaptive": True},
+        "hololens": {"method": "gpu", "target_fps": 30, "max_voxels": 192 ** 3, "adaptive": True},
+    }
+
+    def __init__(self, name, method="gpu", target_fps=15, max_voxels=320 ** 3, adaptive=True):
+        self.name = name
+        self.method = method
+        self.target_fps = target_fps
+        self.max_voxels = max_voxels
+        self.adaptive = adaptive
+
+    @classmethod
+    def get(cls, profile):
+        if isinstance(profile, AIRadarRenderProfile): return profile
+        if profile not in cls.PROFILES: raise ValueError(f"Unknown render profile: {profile}")
+        return cls(profile, **cls.PROFILES[profile])
+
+    @property
+    def method_class(self):
+        return self.METHODS[self.method]
+
+    def preset_for(self, modality):
+        return self.PRESETS.get(modality, self.DEFAULT_PRESET)
+
+
+class AIRadarFrameStats:
+    """3D görünümlerin kare render süreleri, o anki render profiline göre gruplanmış"""
+
+    def __init__(self, path, window=2000):
+        self.path = path
+        self.window = window
+        self.profile = None
+        self._times = {}
+        self._lock = threading.Lock()
+
+    def start(self, profile):
+        with self._lock:
+            self.profile = profile
+            self._times.setdefault(profile, collections.deque(maxlen=self.window))
+
+    def record(self, seconds):
+        with self._lock:
+            if self.profile is None or not seconds: return
+            self._times[self.profile].append(seconds)
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for profile, times in self._times.items():
+                if not times: continue
+                ordered = sorted(times)
+                mean = sum(ordered) / len(ordered)
+                result[profile] = {
+                    "frames": len(ordered),
+                    "mean_ms": round(mean * 1000, 2),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 2),
+                    "fps": round(1.0 / mean, 1) if mean else None,
+                }
+            return result
+
+    def save(self):
+        summary = self.summary()
+        if not summary: return
+        summary = {"profiles": summary, "settings": AIRadarRenderProfile.PROFILES, "saved_at": time.time()}
+        try:
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(summary, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"Render stats not saved: {e}")
+
+# ==============================================================================
+# 15. HOLOLENS MESH CACHE
+# ==============================================================================
+
+class AIRadarMeshCache:
+    """HoloLens için sadeleştirilmiş segmentasyon yüzeylerinin disk önbelleği"""
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, cache_dir, max_entries=200):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, AIRadarVolumeCache.make_key(key))
+
+    def load(self, key):
+        """Önbellekteki kaydın {segment id: vtkPolyData}'sı ya da None"""
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, self.MANIFEST), "r") as f:
+                manifest = json.load(f)
+            meshes = {}
+            for segmentId, name in manifest["segments"].items():
+                reader = vtk.vtkXMLPolyDataReader()
+                reader.SetFileName(os.path.join(path, name))
+                reader.Update()
+                meshes[segmentId] = reader.GetOutput()
+            os.utime(path)
+            return meshes
+        except Exception:
+            return None
+
+    def store(self, key, meshes):
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            os.makedirs(tmp_path)
+            segments = {}
+            for i, (segmentId, mesh) in enumerate(meshes.items()):
+                name = f"segment_{i}.vtp"
+                writer = vtk.vtkXMLPolyDataWriter()
+                writer.SetFileName(os.path.join(tmp_path, name))
+                writer.SetInputData(mesh)
+                writer.SetDataModeToBinary()
+                writer.SetCompressorTypeToZLib()
+                writer.Write()
+                segments[segmentId] = name
+            with open(os.path.join(tmp_path, self.MANIFEST), "w") as f:
+                json.dump({"key": [str(part) for part in key], "segments": segments}, f)
+            with self._lock:
+                shutil.rmtree(path, ignore_errors=True)
+                os.replace(tmp_path, path)
+                self._evict()
+        except Exception as e:
+            print(f"   -> Mesh cache write failed: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _evict(self):
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if not name.endswith(".tmp")]
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:max(0, len(entries) - self.max_entries)]:
+            shutil.rmtree(path, ignore_errors=True)
+
+# ==============================================================================
+# 16. CASE POOL
+# ==============================================================================
+
+class AIRadarCasePool:
+    """Son açılan vakaların node'larını sahneyi temizlemek yerine gizli tutar (yalnızca GUI thread)"""
+
+    def __init__(self, max_bytes=2 * 1024 ** 3, max_cases=6):
+        self.max_bytes = max_bytes
+        self.max_cases = max_cases
+        self.current = None
+        self._parked = collections.OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._close_tag = slicer.mrmlScene.AddObserver(slicer.mrmlScene.EndCloseEvent, lambda caller, event: self.reset())
+
+    def reset(self):
+        self.current = None
+        self._parked.clear()
+
+    def shutdown(self):
+        if self._close_tag is not None:
+            slicer.mrmlScene.RemoveObserver(self._close_tag)
+            self._close_tag = None
+
+    def begin(self, key):
+        """Yeni vaka için yer açar: gösterileni park eder (vaka yoksa siler)"""
+        if not self.max_cases:
+            slicer.mrmlScene.Clear(0)
+            self.reset()
+        elif self.current is None:
+            self._remove(self._loose_nodes())
+        else:
+            self._park(self.current)
+        stale = self._parked.pop(key, None)
+        if stale: self._remove([slicer.mrmlScene.GetNodeByID(node_id) for node_id in stale["nodes"]])
+        self.current = key
+        self._evict()
+        slicer.util.setSliceViewerLayers(background=None, foreground=None, label=None)
+
+    def activate(self, key):
+        """Park edilmiş vakayı şimdikinin yerine gösterir; key havuzda yoksa False"""
+        if key == self.current and self._loose_nodes():
+            self._stats["hits"] += 1
+            return True
+        entry = self._parked.get(key)
+        if entry is None or not any(slicer.mrmlScene.GetNodeByID(node_id) for node_id in entry["nodes"]):
+            self._parked.pop(key, None)
+            self._stats["misses"] += 1
+            return False
+        del self._parked[key]
+        if self.current is not None: self._park(self.current)
+        else: self._remove(self._loose_nodes())
+        self.current = key
+        background = label = None
+        for node_id in entry["nodes"]:
+            node = slicer.mrmlScene.GetNodeByID(node_id)
+            if node is None: continue
+            node.SetHideFromEditors(entry["hidden"].get(node_id, False))
+            if node.IsA("vtkMRMLDisplayNode"): node.SetVisibility(entry["visibility"].get(node_id, True))
+            if node.IsA("vtkMRMLLabelMapVolumeNode"): label = label or node
+            elif node.IsA("vtkMRMLScalarVolumeNode") and not node.GetAttribute("AIRadar.RenderVolumeFor"): background = background or node
+        slicer.util.setSliceViewerLayers(background=background, foreground=None, label=label, fit=True)
+        self._stats["hits"] += 1
+        self._evict()
+        return True
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats.update(cases=len(self._parked), bytes=sum(e["bytes"] for e in self._parked.values()), max_bytes=self.max_bytes)
+        return stats
+
+    def _park(self, key):
+        nodes = self._loose_nodes()
+        entry = {"nodes": [n.GetID() for n in nodes], "visibility": {}, "hidden": {}, "bytes": 0}
+        for node in nodes:
+            entry["hidden"][node.GetID()] = bool(node.GetHideFromEditors())
+            if node.IsA("vtkMRMLDisplayNode"):
+                entry["visibility"][node.GetID()] = bool(node.GetVisibility())
+                node.SetVisibility(False)
+            node.SetHideFromEditors(True)
+            entry["bytes"] += self.node_bytes(node)
+        if entry["nodes"]: self._parked[key] = entry
+
+    def _evict(self):
+        while self._parked and (len(self._parked) > self.max_cases
+                                or sum(e["bytes"] for e in self._parked.values()) > self.max_bytes):
+            _, entry = self._parked.popitem(last=False)
+            self._remove([slicer.mrmlScene.GetNodeByID(node_id) for node_id in entry["nodes"]])
+            self._stats["evictions"] += 1
+
+    @staticmethod
+    def _remove(nodes):
+        for node in nodes:
+            if node is not None and slicer.mrmlScene.IsNodePresent(node): slicer.mrmlScene.RemoveNode(node)
+
+    def _loose_nodes(self):
+        """Sahnedeki park edilmemiş veri node'ları (ekrandaki vakanınkiler)"""
+        parked = set()
+        for entry in self._parked.values(): parked.update(entry["nodes"])
+        nodes = {}
+
+        def add(node):
+            if node is not None and node.GetID() not in parked: nodes.setdefault(node.GetID(), node)
+
+        for node in slicer.util.getNodesByClass("vtkMRMLDisplayableNode"):
+            if node.GetSingletonTag() or node.IsA("vtkMRMLVirtualRealityViewNode"): continue
+            add(node)
+            add(node.GetStorageNode() if node.IsA("vtkMRMLStorableNode") else None)
+            for i in range(node.GetNumberOfDisplayNodes()):
+                displayNode = node.GetNthDisplayNode(i)
+                add(displayNode)
+                if displayNode is not None and displayNode.IsA("vtkMRMLVolumeRenderingDisplayNode"):
+                    add(displayNode.GetVolumePropertyNode())
+        return list(nodes.values())
+
+    @staticmethod
+    def node_bytes(node):
+        """Bir veri node'unun voksellerinin ve yüzeylerinin yaklaşık bellek kullanımı"""
+        data = []
+        if node.IsA("vtkMRMLVolumeNode"): data.append(node.GetImageData())
+        elif node.IsA("vtkMRMLModelNode"): data.append(node.GetPolyData())
+        elif node.IsA("vtkMRMLSegmentationNode"):
+            segmentation = node.GetSegmentation()
+            names = (slicer.vtkSegmentationConverter.GetSegmentationBinaryLabelmapRepresentationName(),
+                     slicer.vtkSegmentationConverter.GetSegmentationClosedSurfaceRepresentationName())
+            for i in range(segmentation.GetNumberOfSegments()):
+                segment = segmentation.GetNthSegment(i)
+                data.extend(segment.GetRepresentation(name) for name in names)
+        # Paylaşılan labelmap katmanları bir kez sayılır
+        unique = {}
+        for item in data:
+            if item is not None: unique[id(item)] = item
+        return sum(item.GetActualMemorySize() * 1024 for item in unique.values())
+
+# ==============================================================================
+# 17. METRICS / TRACING
+# ==============================================================================
+
+class AIRadarPhaseTimer:
+    """Başka işlerle iç içe geçen bir aşamanın süresini ve baytlarını tek span için toplar"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.bytes = 0
+
+    @contextlib.contextmanager
+    def measure(self, nbytes=0):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.seconds += time.monotonic() - started
+            self.bytes += nbytes
+
+
+class AIRadarSpan:
+    """Zamanlanan tek bir aşama; açıkken add_bytes() ve set() çağrılabilir"""
+
+    def __init__(self, name, parent=None, trace_id=None, attrs=None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.attrs = dict(attrs or {})
+        self.bytes = 0
+        self.status = "ok"
+        self.started_at = time.time()
+        self._started = time.monotonic()
+
+    def add_bytes(self, nbytes):
+        self.bytes += nbytes
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def elapsed(self):
+        return time.monotonic() - self._started
+
+
+class AIRadarMetrics:
+    """AIRadarLogic işlemlerinin ve aşamalarının yapılandırılmış zaman ölçümü"""
+
+    def __init__(self, window=1024, jsonl_path=None, prometheus_path=None, prometheus_interval=10.0, recent=5000):
+        self.window = window
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.prometheus_interval = prometheus_interval
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._recent = collections.deque(maxlen=recent)
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._local = threading.local()
+        self._prometheus_written = 0.0
+
+    def current(self):
+        return getattr(self._local, "span", None)
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        parent = self.current()
+        span = AIRadarSpan(name, parent.name if parent else None, parent.trace_id if parent else None, attrs)
+        self._local.span = span
+        try:
+            yield span
+        except AIRadarCancelled:
+            span.status = "cancelled"
+            raise
+        except Exception as e:
+            span.status = "error"
+            span.set(error=str(e))
+            raise
+        finally:
+            self._local.span = parent
+            self._add(span.name, span.elapsed(), span.bytes, span.status, span.parent, span.trace_id, span.started_at, span.attrs)
+
+    def record(self, name, seconds, nbytes=0, status="ok", **attrs):
+        parent = self.current()
+        self._add(name, seconds, nbytes, status, parent.name if parent else None,
+                  parent.trace_id if parent else uuid.uuid4().hex[:16], time.time() - seconds, attrs)
+
+    def bind(self, fn):
+        """fn'i buradaki güncel span altında çalışacak şekilde sarar (thread havuzu işçileri için)"""
+        parent = self.current()
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            previous = self.current()
+            self._local.span = parent
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.span = previous
+        return run
+
+    def _add(self, name, seconds, nbytes, status, parent, trace_id, started_at, attrs):
+        record = {"name": name, "trace_id": trace_id, "parent": parent, "start": round(started_at, 3),
+                  "seconds": round(seconds, 6), "bytes": nbytes, "status": status}
+        if nbytes and seconds > 0: record["mb_per_s"] = round(nbytes / seconds / 1048576, 2)
+        if attrs: record["attrs"] = attrs
+        with self._lock:
+            self._samples[name].append((seconds, nbytes, status))
+            self._recent.append(record)
+        if self.jsonl_path:
+            self._append_jsonl(self.jsonl_path, [record])
+        if self.prometheus_path and time.monotonic() - self._prometheus_written >= self.prometheus_interval:
+            self._prometheus_written = time.monotonic()
+            self.write_prometheus(self.prometheus_path)
+
+    @staticmethod
+    def _percentile(ordered, q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    def summary(self):
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        result = {}
+        for name, values in samples.items():
+            if not values: continue
+            durations = sorted(v[0] for v in values)
+            moved = [(seconds, nbytes) for seconds, nbytes, _ in values if nbytes]
+            moved_seconds = sum(seconds for seconds, _ in moved)
+            result[name] = {
+                "count": len(values),
+                "p50_ms": self._percentile(durations, 0.5) * 1000,
+                "p95_ms": self._percentile(durations, 0.95) * 1000,
+                "mean_ms": sum(durations) / len(durations) * 1000,
+                "sum_seconds": sum(durations),
+                "bytes": sum(nbytes for _, nbytes in moved),
+                "mb_per_s": (sum(nbytes for _, nbytes in moved) / moved_seconds / 1048576) if moved_seconds > 0 else None,
+                "failed": sum(1 for v in values if v[2] not in ("ok", "cancelled")),
+            }
+        return result
+
+    def _append_jsonl(self, path, records):
+        try:
+            with self._file_lock, open(path, "a") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            print(f"Metrics JSONL write failed: {e}")
+
+    def write_jsonl(self, path):
+        """Son span'leri JSON satırları olarak yazar (en yenisi sonda)"""
+        with self._lock:
+            records = list(self._recent)
+        if os.path.exists(path): os.remove(path)
+        self._append_jsonl(path, records)
+
+    def write_prometheus(self, path):
+        """Özeti Prometheus metin biçiminde yazar (node_exporter textfile)"""
+        lines = [
+            "# HELP airadar_operation_seconds Duration of AIRadar operations and phases.",
+            "# TYPE airadar_operation_seconds summary",
+        ]
+        summary = self.summary()
+        for name, stats in sorted(summary.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'airadar_operation_seconds{{operation="{label}",quantile="0.5"}} {stats["p50_ms"] / 1000:.6f}')
+            lines.append(f'airadar_operation_seconds{{operation="{label}",quantile="0.95"}} {stats["p95_ms"] / 1000:.6f}')
+            lines.append(f'airadar_operation_seconds_sum{{operation="{label}"}} {stats["sum_seconds"]:.6f}')
+            lines.append(f'airadar_operation_seconds_count{{operation="{label}"}} {stats["count"]}')
+        lines += ["# HELP airadar_operation_bytes Bytes moved by AIRadar operations in the window.", "# TYPE airadar_operation_bytes gauge"]
+        lines += [f'airadar_operation_bytes{{operation="{name}"}} {stats["bytes"]}' for name, stats in sorted(summary.items())]
+        lines += ["# HELP airadar_operation_failures Failed AIRadar operations in the window.", "# TYPE airadar_operation_failures gauge"]
+        lines += [f'airadar_operation_failures{{operation="{name}"}} {stats["failed"]}' for name, stats in sorted(summary.items())]
+        try:
+            with self._file_lock:
+                with open(path + ".tmp", "w") as f:
+                    f.write("\n".join(lines) + "\n")
+                os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Metrics Prometheus write failed: {e}")
+
+# ==============================================================================
+# 18. HEADLESS BATCH JOBS
+# ==============================================================================
+
+class AIRadarBatch:
+    """Modül arayüzü olmadan sync/export/upload işlerini çalıştırır; ilerleme stdout'a JSON satırları"""
+
+    ENV = {"backend_url": "AIRADAR_BACKEND_URL", "monai_url": "AIRADAR_MONAI_URL", "session": "AIRADAR_SESSION",
+           "user_tag": "AIRADAR_USER_TAG", "workers": "AIRADAR_WORKERS"}
+    POLL_INTERVAL = 0.01
+    CANCEL_TIMEOUT = 10.0     # saniye; Ctrl+C sonrası görevin durması en fazla bu kadar beklenir
+    INTERRUPTED_STATUS = 130  # Ctrl+C ile kesilen işin çıkış kodu
+
+    def __init__(self, settings, events=None, logic=None):
+        self.settings = settings
+        self.events = events or sys.stdout
+        self.logic = logic or AIRadarLogic()
+        if settings.get("workers"):
+            self.logic.EXPORT_WORKERS = self.logic.BATCH_UPLOAD_WORKERS = int(settings["workers"])
+
+    @classmethod
+    def load_settings(cls, config_path=None, overrides=None):
+        """Config dosyası, üzerine ortam değişkenleri, üzerine boş olmayan override'lar"""
+        settings = {}
+        if config_path:
+            with open(config_path) as f: settings.update(json.load(f))
+        settings.update({key: os.environ[env] for key, env in cls.ENV.items() if os.environ.get(env)})
+        settings.update({key: value for key, value in (overrides or {}).items() if value not in (None, "")})
+        return settings
+
+    def require(self, key):
+        value = self.settings.get(key)
+        if not value: raise ValueError(f"{key} missing: set {self.ENV[key]}, add it to the config file or pass --{key.replace('_', '-')}")
+        return str(value)
+
+    def emit(self, event, **fields):
+        self.write_event(self.events, event, **fields)
+
+    @staticmethod
+    def write_event(stream, event, **fields):
+        stream.write(json.dumps(dict({"event": event, "ts": round(time.time(), 3)}, **fields), default=str) + "\n")
+        stream.flush()
+
+    def run_task(self, job, fn, *args, **kwargs):
+        """fn'i görev olarak çalıştırıp bitene kadar Qt olay döngüsünü döndürür; Ctrl+C görevi iptal eder"""
+        done = []
+        interrupted = None
+        deadline = None
+
+        def on_progress(current, total, phase):
+            self.emit("progress", job=job, done=current, total=total, phase=phase)
+
+        task = self.logic.tasks.submit(fn, *args, name=job, on_done=lambda result, error: done.append((result, error)),
+                                       on_progress=on_progress, **kwargs)
+        while not done:
+            try:
+                slicer.app.processEvents()
+                time.sleep(self.POLL_INTERVAL)
+            except KeyboardInterrupt as e:
+                if interrupted: raise
+                interrupted = e
+                task.cancel()
+                deadline = time.monotonic() + self.CANCEL_TIMEOUT
+                self.emit("cancelling", job=job, timeout=self.CANCEL_TIMEOUT)
+            if deadline is not None and time.monotonic() > deadline: raise interrupted
+        if interrupted: raise interrupted
+        result, error = done[0]
+        if error is not None: raise error
+        return result
+
+    def sync(self, output=None):
+        """MONAI datastore listesini (backend_url verilmişse hasta listesini de) yeniler"""
+        monai_url, session = self.require("monai_url").rstrip('/'), self.require("session")
+        started = time.time()
+        datasets = self.run_task("sync", self.logic.fetch_all_images, monai_url, session, max_age=0)
+        snapshot = self.logic.datastore.get(monai_url, session)
+        # fetch_all_images bağlantı hatasında eski görüntüyü döndürür; gece işi bunu hata saymalı
+        if snapshot is None or snapshot.synced_at < started:
+            raise IOError(f"datastore sync with {monai_url} failed")
+        result = {"datasets": len(datasets), "objects": len(snapshot.objects)}
+        listing = {"datasets": datasets}
+        if self.settings.get("backend_url"):
+            patients, complete = self.run_task("patients", self.logic.fetch_backend_patients, self.settings["backend_url"],
+                                               self.settings.get("user_tag") or session)
+            if not complete:
+                raise IOError(f"patient list from {self.settings['backend_url']} is incomplete ({len(patients)} records)")
+            result["patients"] = len(patients)
+            listing["patients"] = patients
+        if output:
+            with open(output, "w") as f: json.dump(listing, f, indent=2)
+        return result, 0
+
+    def export(self, target_folder, scope="mine"):
+        os.makedirs(target_folder, exist_ok=True)
+        downloaded, skipped, failed, manifest_path = self.run_task(
+            "export", self.logic.export_datasets, self.require("monai_url"), scope, self.require("session"), target_folder,
+            max_age=0, on_result=lambda entry: self.emit("file", job="export", **entry))
+        return {"downloaded": downloaded, "skipped": skipped, "failed": failed, "manifest": manifest_path}, 1 if failed else 0
+
+    def upload(self, directory=None, manifest_path=None, is_public=False, is_new_patient=False, retry=False):
+        """Klasördeki vakaları, retry ile manifest_path'teki başarısız vakaları yükler"""
+        on_result = lambda entry: self.emit("case", job="upload", **entry)
+        if retry:
+            if not manifest_path: raise ValueError("--retry needs --manifest")
+            uploaded, failed, manifest_path = self.run_task("upload", self.logic.retry_failed_uploads, manifest_path, on_result=on_result)
+        else:
+            if not directory: raise ValueError("upload needs a case directory")
+            session = self.require("session")
+            cases = self.logic.collect_directory_upload_cases(directory, include_unpaired_labels=not is_new_patient)
+            if not cases: raise ValueError(f"no cases found in {directory}")
+            uploaded, failed, manifest_path = self.run_task(
+                "upload", self.logic.batch_upload, self.require("monai_url"), cases, is_public, is_new_patient, session,
+                self.settings.get("user_tag") or session, manifest_path or self.logic.new_upload_manifest_path(directory),
+                on_result=on_result)
+        return {"uploaded": uploaded, "failed": failed, "manifest": manifest_path}, 1 if failed else 0
+
+    def close(self):
+        self.logic.shutdown()
+
+
+def batch_main(argv=None):
+    """AIRadarBatch komut satırı; çıkış kodunu döndürür (0 tamam, 1 hata, 2 kullanım/ayar hatası)"""
+    parser = argparse.ArgumentParser(prog="AIRadar", description="Headless AIRadar batch jobs (JSON-lines progress on stdout, log on stderr)")
+    parser.add_argument("--config", help="JSON file with backend_url, monai_url, session, user_tag, workers")
+    parser.add_argument("--backend-url")
+    parser.add_argument("--monai-url")
+    parser.add_argument("--session", help="paired session token (sis_id); shows up in the process list and shell history, "
+                                          "prefer AIRADAR_SESSION or --config")
+    parser.add_argument("--user-tag", help="label tag / owner (default: the session)")
+    parser.add_argument("--workers", type=int, help="files or cases transferred in parallel")
+    parser.add_argument("--events", help="append the JSON-lines events to this file instead of stdout")
+    jobs = parser.add_subparsers(dest="job", required=True)
+    sync = jobs.add_parser("sync", help="revalidate the datastore listing and the backend patient list")
+    sync.add_argument("--output", help="write the dataset and patient lists to this JSON file")
+    export = jobs.add_parser("export", help="download datasets into a folder (skips files already up to date)")
+    export.add_argument("target")
+    export.add_argument("--scope", choices=["mine", "public", "all"], default="mine")
+    upload = jobs.add_parser("upload", help="upload images and/or labels found in a folder")
+    upload.add_argument("directory", nargs="?")
+    upload.add_argument("--manifest", help="upload manifest (resumes cases already in it)")
+    upload.add_argument("--retry", action="store_true", help="re-send the failed cases of --manifest")
+    upload.add_argument("--new", action="store_true", help="cases are new patients: upload images too")
+    upload.add_argument("--public", action="store_true")
+    args = parser.parse_args(argv)
+
+    events = open(args.events, "a") if args.events else sys.stdout
+    if args.session:
+        # Komut satırı diğer kullanıcılara ps ile görünür
+        print("Warning: --session exposes the session token in the process list and shell history; "
+              "use AIRADAR_SESSION or a --config file readable only by you.", file=sys.stderr)
+    batch = None
+    try:
+        settings = AIRadarBatch.load_settings(args.config, {"backend_url": args.backend_url, "monai_url": args.monai_url,
+                                                           "session": args.session, "user_tag": args.user_tag, "workers": args.workers})
+        # Modülün kendi çıktısı stderr'e: stdout yalnızca makine tarafından okunacak olaylar
+        with contextlib.redirect_stdout(sys.stderr):
+            batch = AIRadarBatch(settings, events)
+            batch.emit("start", job=args.job)
+            started = time.monotonic()
+            if args.job == "sync":
+                result, status = batch.sync(args.output)
+            elif args.job == "export":
+                result, status = batch.export(args.target, args.scope)
+            else:
+                result, status = batch.upload(args.directory, args.manifest, args.public, args.new, args.retry)
+            batch.emit("done", job=args.job, status="ok" if status == 0 else "failed", seconds=round(time.monotonic() - started, 2),
+                       metrics=batch.logic.metrics_summary(), **result)
+        return status
+    except KeyboardInterrupt:
+        AIRadarBatch.write_event(events, "error", job=args.job, error="interrupted")
+        return AIRadarBatch.INTERRUPTED_STATUS
+    except Exception as e:
+        AIRadarBatch.write_event(events, "error", job=args.job, error=f"{type(e).__name__}: {e}")
+        return 2 if isinstance(e, ValueError) else 1
+    finally:
+        if batch: batch.close()
+        if events is not sys.stdout: events.close()
+
+
+# ==============================================================================
+# 19. PERSISTED SESSION
+# ==============================================================================
+
+class AIRadarSessionStore:
+    """Yeniden başlatmada eşleştirmesiz devam için isteğe bağlı, Fernet ile mühürlü oturum dosyası"""
+
+    VERSION = 2
+    KDF_INFO = b"AIRadar session v2"
+
+    def __init__(self, path, secret):
+        self.path = path
+        self.secret = secret if isinstance(secret, bytes) else str(secret).encode("utf-8")
+        self._cipher = None
+
+    @staticmethod
+    def available():
+        return Fernet is not None
+
+    def _fernet(self):
+        if self._cipher is None:
+            key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=self.KDF_INFO).derive(self.secret)
+            self._cipher = Fernet(base64.urlsafe_b64encode(key))
+        return self._cipher
+
+    def save(self, session, task=None):
+        """Oturum sözlüğünü (sis_id, user, device_code, api_url, ...) saklar"""
+        if not self.available(): raise RuntimeError("the 'cryptography' package is required to remember sessions")
+        token = self._fernet().encrypt(json.dumps(session).encode("utf-8"))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            json.dump({"v": self.VERSION, "token": token.decode("ascii")}, f)
+        os.replace(tmp, self.path)
+
+    def load(self, max_age=None, api_url=None, task=None):
+        """Saklanan oturum; yoksa, açılamazsa, max_age'den eskiyse ya da başka api_url içinse None"""
+        if not self.available(): return None
+        try:
+            with open(self.path) as f: record = json.load(f)
+            if record.get("v") != self.VERSION: raise ValueError("unknown version")
+            token = record["token"].encode("ascii")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Saved session unreadable, ignoring it: {e}")
+            self.clear()
+            return None
+        try:
+            # Fernet belirtecindeki zaman damgası max_age ile kontrol edilir
+            plain = self._fernet().decrypt(token, ttl=None if max_age is None else int(max_age))
+            session = json.loads(plain.decode("utf-8"))
+        except (InvalidToken, ValueError) as e:
+            print(f"Saved session expired, modified or from another installation, ignoring it ({type(e).__name__}).")
+            self.clear()
+            return None
+        if api_url is not None and session.get("api_url", "").rstrip('/') != api_url.rstrip('/'):
+            return None
+        return session
+
+    def clear(self):
+        try: os.remove(self.path)
+        except FileNotFoundError: pass
+
+
+# ==============================================================================
+# 20. LOCAL METADATA INDEX
+# ==============================================================================
+
+class AIRadarMetadataStore:
+    """Modülün en son gördüklerinin SQLite indeksi: hasta listeleri, datastore nesneleri ve önbellekteki dosyalar"""
+
+    SCHEMA_VERSION = 2
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS patient_lists (server TEXT, user_tag TEXT, synced_at REAL, count INTEGER, PRIMARY KEY (server, user_tag));
+        CREATE TABLE IF NOT EXISTS patients (server TEXT, user_tag TEXT, key TEXT, name TEXT, name_lower TEXT, position INTEGER,
+                                             PRIMARY KEY (server, user_tag, key));
+        CREATE INDEX IF NOT EXISTS patients_name ON patients (server, user_tag, name_lower);
+        CREATE TABLE IF NOT EXISTS datastores (server TEXT, user TEXT, synced_at REAL, PRIMARY KEY (server, user));
+        CREATE TABLE IF NOT EXISTS datasets (server TEXT, user TEXT, image_id TEXT, name TEXT, owner TEXT, is_public INTEGER,
+                                             modified REAL, label_tags TEXT, label_info TEXT,
+                                             PRIMARY KEY (server, user, image_id));
+        CREATE INDEX IF NOT EXISTS datasets_name ON datasets (server, user, name);
+        CREATE INDEX IF NOT EXISTS datasets_modified ON datasets (server, user, modified);
+        CREATE INDEX IF NOT EXISTS datasets_public ON datasets (server, user, is_public);
+        CREATE TABLE IF NOT EXISTS dataset_owners (server TEXT, user TEXT, owner TEXT, image_id TEXT, PRIMARY KEY (server, user, owner, image_id));
+        CREATE INDEX IF NOT EXISTS dataset_owners_image ON dataset_owners (server, user, image_id);
+        CREATE TABLE IF NOT EXISTS cached_files (digest TEXT PRIMARY KEY, source TEXT, server TEXT, kind TEXT, image_id TEXT, tag TEXT,
+                                                 path TEXT, size INTEGER, modified REAL, last_access REAL);
+        CREATE INDEX IF NOT EXISTS cached_files_case ON cached_files (source, server, image_id);
+        CREATE INDEX IF NOT EXISTS cached_files_modified ON cached_files (modified);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._db = self._open(path)
+        except sqlite3.DatabaseError as e:
+            print(f"Metadata store {path} unusable ({e}), recreating it.")
+            for suffix in ("", "-wal", "-shm"):
+                try: os.remove(path + suffix)
+                except OSError: pass
+            self._db = self._open(path)
+
+    def _open(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        if db.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            for (table,) in db.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall():
+                db.execute(f'DROP TABLE IF EXISTS "{table}"')
+            db.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+        db.executescript(self.SCHEMA)
+        db.commit()
+        return db
+
+    def _write(self, fn, *args):
+        """fn(db, *args)'ı tek işlemde çalıştırır; yazma hataları loglanır, fırlatılmaz"""
+        try:
+            with self._lock, self._db:
+                fn(self._db, *args)
+        except sqlite3.Error as e:
+            print(f"Metadata store write failed: {e}")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params).fetchall()]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- hastalar ---
+
+    def store_patients(self, server, user_tag, patients):
+        """(server, user_tag) için saklanan hasta listesini tam bir listeyle değiştirir"""
+        def write(db):
+            db.execute("DELETE FROM patients WHERE server=? AND user_tag=?", (server, user_tag))
+            db.executemany("INSERT OR REPLACE INTO patients VALUES (?, ?, ?, ?, ?, ?)",
+                           ((server, user_tag, str(p.get('key')), str(p.get('name', '')), str(p.get('name', '')).lower(), i)
+                            for i, p in enumerate(patients) if p.get('key') is not None))
+            db.execute("INSERT OR REPLACE INTO patient_lists VALUES (?, ?, ?, ?)", (server, user_tag, time.time(), len(patients)))
+        self._write(write)
+
+    def patients(self, server, user_tag, search=None):
+        """Saklanan hastalar liste sırasıyla; search verilirse adı onunla başlayanlar"""
+        sql, params = "SELECT name, key FROM patients WHERE server=? AND user_tag=?", [server, user_tag]
+        if search:
+            sql += " AND name_lower >= ? AND name_lower < ?"
+            prefix = search.lower()
+            params += [prefix, prefix + "\uffff"]
+        return self._query(sql + " ORDER BY position", params)
+
+    def patient_list_info(self, server, user_tag):
+        rows = self._query("SELECT synced_at, count FROM patient_lists WHERE server=? AND user_tag=?", (server, user_tag))
+        return rows[0] if rows else None
+
+    # --- MONAI datastore ---
+
+    @staticmethod
+    def _dataset_row(server, user, image_id, details):
+        details = details if isinstance(details, dict) else {}
+        infos = [details.get('params'), details.get('info'), (details.get('image') or {}).get('info')]
+        infos = [raw if isinstance(raw, dict) else _parse_object_params(raw) if isinstance(raw, str) else None for raw in infos]
+        owner = details.get('client_id')
+        for info in infos:
+            if owner is None and info: owner = info.get('uploaded_by') or info.get('session_id')
+        labels = details.get('labels') if isinstance(details.get('labels'), dict) else {}
+        label_info, stamps = {}, []
+        for info in infos[1:]:
+            if info and isinstance(info.get('ts'), (int, float)): stamps.append(info['ts'])
+        for tag, label in labels.items():
+            raw = (label or {}).get('info') if isinstance(label, dict) else None
+            info = raw if isinstance(raw, dict) else _parse_object_params(raw) if isinstance(raw, str) else None
+            if not info: continue
+            if info.get('label_info') is not None: label_info[str(tag)] = info['label_info']
+            if isinstance(info.get('ts'), (int, float)): stamps.append(info['ts'])
+        image_info = (details.get('image') or {}).get('info')
+        name = image_info.get('name') if isinstance(image_info, dict) else None
+        return (server, user, image_id, str(name or image_id), None if owner is None else str(owner),
+                int(AIRadarOwnerIndex.object_is_public(image_id, details)), max(stamps) if stamps else None,
+                json.dumps(sorted(str(tag) for tag in labels)), json.dumps(label_info))
+
+    def datastore_changed(self, server, user, snapshot, image_ids=None):
+        """AIRadarDatastoreIndex dinleyicisi: image_ids None ise tümünü, değilse yalnızca onları yeniden indeksler"""
+        user = str(user)
+
+        def index(db, ids):
+            rows, owners = [], []
+            for image_id in ids:
+                details = snapshot.objects.get(image_id)
+                if not isinstance(image_id, str) or "{" in image_id or details is None: continue
+                rows.append(self._dataset_row(server, user, image_id, details))
+                owners.extend((server, user, owner, image_id) for owner in AIRadarOwnerIndex.object_owners(details))
+            db.executemany("INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            db.executemany("INSERT OR REPLACE INTO dataset_owners VALUES (?, ?, ?, ?)", owners)
+
+        def write(db):
+            indexed = db.execute("SELECT 1 FROM datastores WHERE server=? AND user=?", (server, user)).fetchone()
+            if image_ids is None or not indexed:
+                db.execute("DELETE FROM datasets WHERE server=? AND user=?", (server, user))
+                db.execute("DELETE FROM dataset_owners WHERE server=? AND user=?", (server, user))
+                index(db, list(snapshot.objects))
+            elif image_ids:
+                for image_id in image_ids:
+                    db.execute("DELETE FROM datasets WHERE server=? AND user=? AND image_id=?", (server, user, image_id))
+                    db.execute("DELETE FROM dataset_owners WHERE server=? AND user=? AND image_id=?", (server, user, image_id))
+                index(db, image_ids)
+            db.execute("INSERT OR REPLACE INTO datastores VALUES (?, ?, ?)", (server, user, snapshot.synced_at))
+        self._write(write)
+
+    def ensure_datastore(self, server, user, snapshot):
+        """Saklanan liste yoksa ya da başka bir senkrondansa snapshot'ı baştan indeksler; olmazsa False"""
+        def current():
+            rows = self._query("SELECT synced_at FROM datastores WHERE server=? AND user=?", (server, str(user)))
+            return bool(rows) and rows[0]["synced_at"] == snapshot.synced_at
+        if current(): return True
+        self.datastore_changed(server, user, snapshot, None)
+        return current()
+
+    @staticmethod
+    def _dataset_filter(server, user, owner=None, public=None, name=None):
+        """datasets sorgusunun FROM/WHERE kısmı ve parametreleri"""
+        sql = " FROM datasets d"
+        where, params = ["d.server=?", "d.user=?"], [server, str(user)]
+        if owner is not None:
+            sql += " JOIN dataset_owners o ON o.server=d.server AND o.user=d.user AND o.image_id=d.image_id"
+            where.append("o.owner=?")
+            params.append(str(owner))
+        if public is not None:
+            where.append("d.is_public=?")
+            params.append(int(bool(public)))
+        if name:
+            where.append("d.name >= ? AND d.name < ?")
+            params += [name, name + "\uffff"]
+        return sql + " WHERE " + " AND ".join(where), params
+
+    def dataset_ids(self, server, user, owner=None, public=None):
+        """(server, user) listesindeki saklı veri setlerinin sıralı id'leri, datasets() gibi süzülmüş"""
+        sql, params = self._dataset_filter(server, user, owner, public)
+        return [row["image_id"] for row in self._query("SELECT d.image_id" + sql + " ORDER BY d.image_id", params)]
+
+    def datasets(self, server, user, owner=None, public=None, name=None, order="name"):
+        """(server, user) listesindeki saklı veri setleri; sahip, public ve ad önekine göre süzülür"""
+        sql, params = self._dataset_filter(server, user, owner, public, name)
+        sql = "SELECT d.image_id, d.name, d.owner, d.is_public, d.modified, d.label_tags, d.label_info" + sql
+        sql += " ORDER BY d.modified IS NULL, d.modified DESC, d.name" if order == "modified" else " ORDER BY d.name"
+        rows = self._query(sql, params)
+        for row in rows:
+            row["is_public"] = bool(row["is_public"])
+            row["label_tags"] = json.loads(row["label_tags"] or "[]")
+            row["label_info"] = json.loads(row["label_info"] or "{}")
+        return rows
+
+    # --- yerel dosyalar ---
+
+    def cache_changed(self, changed, full=False):
+        """AIRadarVolumeCache dinleyicisi: değişen kayıtları yazar, None olanları siler (full: tabloyu değiştirir)"""
+        rows, removed = [], []
+        for digest, entry in changed.items():
+            if entry is None:
+                removed.append((digest,))
+                continue
+            key = list(entry.get("key") or []) + [None] * 5
+            rows.append((digest, key[0], key[1], key[2], key[3], key[4], entry.get("path"), entry.get("size"),
+                         entry.get("created"), entry.get("last_access")))
+
+        def write(db):
+            if full: db.execute("DELETE FROM cached_files")
+            db.executemany("DELETE FROM cached_files WHERE digest=?", removed)
+            db.executemany("INSERT OR REPLACE INTO cached_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._write(write)
+
+    def cached_files(self, source=None, server=None, image_id=None):
+        """Önbellekteki dosyalar, en yenisi önce"""
+        where, params = [], []
+        for column, value in (("source", source), ("server", server), ("image_id", image_id)):
+            if value is not None:
+                where.append(f"{column}=?")
+                params.append(str(value))
+        sql = "SELECT source, server, kind, image_id, tag, path, size, modified, last_access FROM cached_files"
+        if where: sql += " WHERE " + " AND ".join(where)
+        return self._query(sql + " ORDER BY modified DESC", params)
+
+    def local_image_ids(self, source, server):
+        """Resmi yerel volume önbelleğinde olan vakaların id'leri"""
+        rows = self._query("SELECT DISTINCT image_id FROM cached_files WHERE source=? AND server=? AND kind='image'", (source, server))
+        return {row["image_id"] for row in rows}
+
+
+if __name__ == "__main__":
+    # Slicer --no-main-window --python-script AIRadar.py -- [--monai-url URL --session TOKEN] <job> ...
+    argv = sys.argv[1:]
+    if argv[:1] == ["--"]: argv = argv[1:]
+    status = batch_main(argv)
+    if status == AIRadarBatch.INTERRUPTED_STATUS:
+        # İptale uymayan bir worker thread'i yorumlayıcının kapanışını bekletmesin
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+    slicer.util.exit(status)
@@ -0,0 +1,160 @@
+"""Scale benchmark for the MONAI datastore ownership filter and the patient list search.
+
+Feeds synthetic datastores of 1k/10k/100k objects through the datastore parser and
+AIRadarOwnerIndex and reports parse, index build and per-user lookup times next to the
+previous per-object filter. Patient lists of the same sizes go through
+AIRadarPatientIndex, timing every keystroke of a few typed queries (the budget is one
+16 ms frame).
+
+Run inside Slicer:
+    Slicer --no-main-window --python-script Testing/Python/AIRadarFilterBenchmark.py [-- --sizes 1000 10000 --json out.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import traceback
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from AIRadar import AIRadarDatastoreIndex, AIRadarOwnerIndex, AIRadarPatientIndex, _parse_object_params
+
+TYPED_QUERIES = ["ayşe kaya", "case_0012", "9f"]
+
+
+def make_datastore(num_objects, num_users=500, max_labels=40, seed=0):
+    """Synthetic /datastore/?output=all payload shaped like MONAI Label's"""
+    rng = random.Random(seed)
+    users = [f"user{u:04d}" for u in range(num_users)]
+    objects = {}
+    for i in range(num_objects):
+        owner = rng.choice(users)
+        labels = {tag: {"ext": ".nii.gz", "info": {"ts": i}} for tag in rng.sample(users, rng.randint(0, max_labels))}
+        details = {"image": {"ext": ".nii.gz", "info": {"ts": i}}, "labels": labels}
+        kind = i % 3
+        if kind == 0: details["client_id"] = owner
+        elif kind == 1: details["params"] = json.dumps({"uploaded_by": owner, "ispublic": i % 7 == 0})
+        else: details["info"] = {"session_id": owner, "ts": i}
+        objects[f"case_{i:06d}"] = details
+    return {"name": "synthetic", "objects": objects}, users
+
+
+def legacy_filter(objects_map, user_id):
+    """The per-object filter used before the owner index (kept for comparison)"""
+    file_set = set()
+    for filename, details in objects_map.items():
+        if not isinstance(filename, str) or "{" in filename: continue
+        meta_client_id = details.get('client_id')
+        meta_uploaded_by = None
+        raw_params = details.get('params') or details.get('info')
+        if raw_params:
+            try:
+                p_dict = raw_params if isinstance(raw_params, dict) else json.loads(raw_params)
+                meta_uploaded_by = p_dict.get('uploaded_by') or p_dict.get('session_id')
+            except Exception: pass
+        is_owner = str(meta_client_id) == str(user_id) or str(meta_uploaded_by) == str(user_id)
+        if not is_owner:
+            image_labels = details.get('labels')
+            if image_labels and isinstance(image_labels, dict) and str(user_id) in image_labels: is_owner = True
+            elif str(details.get('tag')) == str(user_id): is_owner = True
+        if is_owner: file_set.add(filename)
+    return file_set
+
+
+def make_patients(num_patients, seed=0):
+    rng = random.Random(seed)
+    first = ["Ahmet", "Mehmet", "Ayşe", "Fatma", "Ali", "Zeynep", "Elif", "Can", "Deniz", "Emre", "Selin", "Ece"]
+    last = ["Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Öztürk", "Aydın", "Arslan", "Doğan"]
+    return [{"name": f"{rng.choice(first)} {rng.choice(last)}", "key": f"case_{i:06d}_{rng.randrange(16 ** 6):06x}"}
+            for i in range(num_patients)]
+
+
+def run_search(size):
+    patients = make_patients(size)
+    t0 = time.perf_counter()
+    index = AIRadarPatientIndex(patients)
+    build_s = time.perf_counter() - t0
+
+    keystrokes = []
+    for query in TYPED_QUERIES:
+        for n in range(1, len(query) + 1):
+            t0 = time.perf_counter()
+            rows = index.search(query[:n])
+            keystrokes.append(time.perf_counter() - t0)
+        expected = [row for row, p in enumerate(patients) if query in f"{p['name']}\t{p['key']}".lower()]
+        if sorted(rows.tolist()) != expected:
+            raise AssertionError(f"patient search for {query!r} is wrong at size {size}")
+    return {"search_build_s": build_s, "keystroke_max_s": max(keystrokes), "keystroke_avg_s": sum(keystrokes) / len(keystrokes)}
+
+
+def run(size, lookups=20):
+    datastore, users = make_datastore(size)
+    body = json.dumps(datastore)
+    _parse_object_params.cache_clear()
+
+    t0 = time.perf_counter()
+    objects = AIRadarDatastoreIndex.objects_map(json.loads(body))
+    parse_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index = AIRadarOwnerIndex(objects)
+    build_s = time.perf_counter() - t0
+
+    sample = random.Random(1).sample(users, min(lookups, len(users)))
+    t0 = time.perf_counter()
+    results = [index.owned_by(user) for user in sample]
+    lookup_s = (time.perf_counter() - t0) / len(sample)
+
+    t0 = time.perf_counter()
+    legacy = [legacy_filter(objects, user) for user in sample[:3]]
+    legacy_s = (time.perf_counter() - t0) / len(legacy)
+
+    if any(a != b for a, b in zip(results, legacy)):
+        raise AssertionError(f"owner index disagrees with legacy filter at size {size}")
+
+    return dict({
+        "objects": size, "payload_mb": len(body) / 1048576,
+        "parse_s": parse_s, "index_build_s": build_s, "lookup_s": lookup_s, "legacy_filter_s": legacy_s,
+        "avg_result": sum(len(r) for r in results) / len(results),
+    }, **run_search(size))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    rows = [run(size) for size in args.sizes]
+    print(f"{'objects':>8} {'MB':>7} {'parse':>9} {'index':>9} {'lookup':>10} {'legacy':>10} {'result':>7}")
+    for r in rows:
+        print(f"{r['objects']:>8} {r['payload_mb']:>7.1f} {r['parse_s'] * 1e3:>7.1f}ms {r['index_build_s'] * 1e3:>7.1f}ms "
+              f"{r['lookup_s'] * 1e6:>8.1f}us {r['legacy_filter_s'] * 1e3:>8.1f}ms {r['avg_result']:>7.0f}")
+    print(f"\n{'patients':>8} {'index':>9} {'key avg':>9} {'key max':>9}")
+    for r in rows:
+        print(f"{r['objects']:>8} {r['search_build_s'] * 1e3:>7.1f}ms {r['keystroke_avg_s'] * 1e3:>7.2f}ms {r['keystroke_max_s'] * 1e3:>7.2f}ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    if argv[:1] == ["--"]: argv = argv[1:]
+    status = 1
+    try:
+        main(argv)
+        status = 0
+    except Exception:
+        traceback.print_exc()
+    finally:
+        # Slicer --python-script altında çıkılmazsa uygulama açık kalır
+        try:
+            import slicer
+            slicer.util.exit(status)
+        except (ImportError, AttributeError):
+            sys.exit(status)
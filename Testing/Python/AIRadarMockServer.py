@@ -0,0 +1,502 @@
+"""Local stand-in for the AIRadar clinical backend and a MONAI Label server.
+
+Serves, from memory, everything AIRadarLogic talks to:
+  backend  /api/start-session/<code>, /api/check-session/<code> (logs in after --login-after s,
+           honours ?wait= long polls), /slicer/patients (limit/offset or cursor paging,
+           optionally failing from a given record on),
+           /monailabel-datastore-image-download, /monailabel-datastore-label-download
+  MONAI    GET /datastore/?output=all (ETag / If-None-Match -> 304), GET/PUT/DELETE
+           /datastore/image and /datastore/label, GET /datastore/image/info
+Case files are synthetic NIfTI-1 volumes (a smooth int16 phantom with noise) and uint8 labels
+of --shape, generated once and shared by every case. Downloads support Range and ETag
+requests; uploads are read in full (chunked or Content-Length) and kept in the datastore.
+--latency delays every response, --bandwidth caps each response/upload and
+--link-bandwidth caps all of them together.
+
+Standalone (needs only numpy):
+    python Testing/Python/AIRadarMockServer.py --port 8765 --shape 256 256 200 --objects 10000 --latency 0.02 --bandwidth 50e6
+In-process (what AIRadarTransferBenchmark does):
+    server = AIRadarMockServer(MockConfig(objects=1000)).start(); ...; server.stop()
+"""
+
+import argparse
+import email.utils
+import gzip
+import hashlib
+import http.server
+import json
+import random
+import re
+import struct
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+BENCH_USER = "bench_user"
+
+
+class MockConfig:
+    """Size, latency and behaviour of the mock servers (attributes are plain settings)"""
+
+    def __init__(self, shape=(128, 128, 96), objects=1000, users=200, patients=1000, owned=50,
+                 latency=0.0, bandwidth=0, link_bandwidth=0, gzip_level=1, ranges=True, etags=True,
+                 image_info=True, paging="offset", patients_fail_at=None, login_after=0.5, seed=0):
+        self.shape = tuple(shape)            # x, y, z voxels of every case image and label
+        self.objects = objects               # MONAI datastore objects
+        self.users = users                   # distinct owners in the datastore
+        self.patients = patients             # backend /slicer/patients entries
+        self.owned = owned                   # datastore objects owned by BENCH_USER
+        self.latency = latency               # seconds before every response
+        self.bandwidth = bandwidth           # bytes/s per response or upload (0 = unlimited)
+        self.link_bandwidth = link_bandwidth  # bytes/s shared by all transfers (0 = unlimited)
+        self.gzip_level = gzip_level
+        self.ranges = ranges                 # answer Range requests with 206
+        self.etags = etags                   # send ETag/Last-Modified and answer 304
+        self.image_info = image_info         # False: /datastore/image/info is an unknown route
+        self.paging = paging                 # "offset", "cursor" or "none" (everything at once)
+        self.patients_fail_at = patients_fail_at  # pages starting at this record answer 503
+        self.login_after = login_after       # seconds from start-session until LOGGED_IN
+        self.seed = seed
+
+    def as_dict(self):
+        return dict(vars(self), shape=list(self.shape))
+
+
+# ------------------------------------------------------------------------------
+# Synthetic case files
+# ------------------------------------------------------------------------------
+
+def nifti_bytes(array, spacing=(1.0, 1.0, 1.0), gzip_level=1):
+    """array (z, y, x) as a gzip-compressed single-file NIfTI-1 with an sform"""
+    codes = {np.dtype(np.uint8): (2, 8), np.dtype(np.int16): (4, 16), np.dtype(np.float32): (16, 32)}
+    datatype, bitpix = codes[array.dtype]
+    nz, ny, nx = array.shape
+    header = bytearray(348)
+    struct.pack_into("<i", header, 0, 348)
+    struct.pack_into("<8h", header, 40, 3, nx, ny, nz, 1, 1, 1, 1)
+    struct.pack_into("<hh", header, 70, datatype, bitpix)
+    struct.pack_into("<8f", header, 76, 1.0, spacing[0], spacing[1], spacing[2], 1.0, 1.0, 1.0, 1.0)
+    struct.pack_into("<fff", header, 108, 352.0, 1.0, 0.0)
+    struct.pack_into("<B", header, 123, 2)  # mm
+    struct.pack_into("<hh", header, 252, 0, 1)
+    # LPS'den RAS'a: x ve y eksenleri ters
+    struct.pack_into("<4f", header, 280, -spacing[0], 0.0, 0.0, nx * spacing[0] / 2)
+    struct.pack_into("<4f", header, 296, 0.0, -spacing[1], 0.0, ny * spacing[1] / 2)
+    struct.pack_into("<4f", header, 312, 0.0, 0.0, spacing[2], -nz * spacing[2] / 2)
+    header[344:348] = b"n+1\0"
+    raw = bytes(header) + b"\0\0\0\0" + np.ascontiguousarray(array).astype(array.dtype.newbyteorder("<")).tobytes()
+    return gzip.compress(raw, compresslevel=gzip_level, mtime=0)
+
+
+def phantom(shape, seed=0):
+    """int16 image (CT-like HU range) and uint8 label of shape (x, y, z), returned z, y, x"""
+    nx, ny, nz = shape
+    z, y, x = np.ogrid[-1:1:nz * 1j, -1:1:ny * 1j, -1:1:nx * 1j]
+    body = x ** 2 + y ** 2 < 0.8
+    organ = (x - 0.25) ** 2 + (y + 0.1) ** 2 + (z * 0.8) ** 2 < 0.09
+    lesion = (x + 0.3) ** 2 + (y - 0.2) ** 2 + (z - 0.2) ** 2 < 0.02
+    image = np.full((nz, ny, nx), -1000, dtype=np.int16)
+    image[np.broadcast_to(body, image.shape)] = 40
+    image[np.broadcast_to(organ, image.shape)] = 120
+    image[np.broadcast_to(lesion, image.shape)] = 300
+    rng = np.random.default_rng(seed)
+    image += rng.integers(-30, 30, size=image.shape, dtype=np.int16)
+    label = np.zeros((nz, ny, nx), dtype=np.uint8)
+    label[np.broadcast_to(organ, label.shape)] = 1
+    label[np.broadcast_to(lesion, label.shape)] = 2
+    return image, label
+
+
+class _Blob:
+    def __init__(self, data, mtime=None):
+        self.data = data
+        self.etag = '"%s"' % hashlib.blake2b(data, digest_size=12).hexdigest()
+        self.last_modified = email.utils.formatdate(mtime or time.time(), usegmt=True)
+
+
+class _Throttle:
+    """Token bucket in bytes/s shared by whoever holds it (0 = unlimited)"""
+
+    def __init__(self, rate):
+        self.rate = float(rate or 0)
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def take(self, nbytes):
+        if self.rate <= 0: return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + nbytes / self.rate
+            wait = self._next - now
+        if wait > 0: time.sleep(wait)
+
+
+# ------------------------------------------------------------------------------
+# Server state
+# ------------------------------------------------------------------------------
+
+class MockState:
+    """Datastore, patient list and pairing sessions behind both mock APIs"""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        image, label = phantom(config.shape, config.seed)
+        self.image = _Blob(nifti_bytes(image, gzip_level=config.gzip_level))
+        self.label = _Blob(nifti_bytes(label, gzip_level=config.gzip_level))
+        self.link = _Throttle(config.link_bandwidth)
+        self.objects, self.blobs = self._make_datastore()
+        self.patients = [{"name": f"Hasta {i:06d}", "key": f"case_{i:06d}"} for i in range(config.patients)]
+        self.version = 0
+        self.sessions = {}
+        self.counters = {"requests": 0, "bytes_out": 0, "bytes_in": 0, "ranges": 0, "not_modified": 0}
+
+    def _make_datastore(self):
+        rng = random.Random(self.config.seed)
+        users = [f"user{u:04d}" for u in range(self.config.users)]
+        owned = set(rng.sample(range(self.config.objects), min(self.config.owned, self.config.objects)))
+        objects = {}
+        for i in range(self.config.objects):
+            owner = BENCH_USER if i in owned else rng.choice(users)
+            tags = rng.sample(users, rng.randint(0, 5)) + ([BENCH_USER] if i in owned else [])
+            labels = {tag: {"ext": ".nii.gz", "info": {"ts": i, "uploaded_by": tag}} for tag in tags}
+            objects[f"case_{i:06d}"] = {"image": {"ext": ".nii.gz", "info": {"ts": i, "name": f"case_{i:06d}.nii.gz"}},
+                                        "labels": labels, "client_id": owner,
+                                        "params": json.dumps({"uploaded_by": owner, "ispublic": i % 7 == 0})}
+        # Sentetik nesneler ortak dosyaları paylaşır; yalnızca yüklenenler kendi blob'unu tutar
+        return objects, {}
+
+    def datastore_payload(self):
+        with self.lock:
+            return json.dumps({"name": "mock", "labels": [], "objects": self.objects}).encode(), f'"ds-{self.version}"'
+
+    def blob(self, kind, image_id, tag=None):
+        with self.lock:
+            blob = self.blobs.get((kind, image_id, tag if kind == "label" else None))
+            if blob is not None: return blob
+            obj = self.objects.get(image_id)
+        if kind == "image":
+            return self.image if obj is not None or image_id.startswith("case_") else None
+        if obj is not None and tag not in obj.get("labels", {}): return None
+        return self.label
+
+    def store(self, kind, image_id, tag, data, params):
+        now = time.time()
+        with self.lock:
+            self.blobs[(kind, image_id, tag if kind == "label" else None)] = _Blob(data, now)
+            obj = self.objects.setdefault(image_id, {"labels": {}})
+            if kind == "image":
+                obj["image"] = {"ext": ".nii.gz", "info": dict(params, ts=int(now), name=f"{image_id}.nii.gz")}
+                if params.get("uploaded_by"): obj["client_id"] = params["uploaded_by"]
+                obj["params"] = json.dumps(params)
+            else:
+                obj.setdefault("labels", {})[tag] = {"ext": ".nii.gz", "info": dict(params, ts=int(now))}
+            self.version += 1
+
+    def delete(self, kind, image_id, tag):
+        with self.lock:
+            obj = self.objects.get(image_id)
+            if obj is None: return False
+            if kind == "image":
+                del self.objects[image_id]
+                for key in [k for k in self.blobs if k[1] == image_id]: del self.blobs[key]
+            else:
+                if tag not in obj.get("labels", {}): return False
+                del obj["labels"][tag]
+                self.blobs.pop(("label", image_id, tag), None)
+            self.version += 1
+            return True
+
+    def count(self, **deltas):
+        with self.lock:
+            for name, value in deltas.items(): self.counters[name] += value
+
+
+# ------------------------------------------------------------------------------
+# HTTP handler
+# ------------------------------------------------------------------------------
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    CHUNK = 64 * 1024
+    RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose: super().log_message(fmt, *args)
+
+    def _begin(self):
+        self.state.count(requests=1)
+        if self.state.config.latency: time.sleep(self.state.config.latency)
+        url = urllib.parse.urlsplit(self.path)
+        return url.path, {k: v[-1] for k, v in urllib.parse.parse_qs(url.query, keep_blank_values=True).items()}
+
+    # --- yanıt yardımcıları ---
+
+    def _json(self, payload, status=200, headers=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self._send(status, body, "application/json", headers)
+
+    def _send(self, status, body, content_type="application/octet-stream", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items(): self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD": self._write(body)
+
+    def _write(self, body):
+        throttle = _Throttle(self.state.config.bandwidth)
+        view = memoryview(body)
+        for offset in range(0, len(view), self.CHUNK):
+            chunk = view[offset:offset + self.CHUNK]
+            throttle.take(len(chunk))
+            self.state.link.take(len(chunk))
+            self.wfile.write(chunk)
+        self.state.count(bytes_out=len(body))
+
+    def _send_blob(self, blob, filename):
+        config = self.state.config
+        headers = {"Content-Disposition": f'inline; filename="{filename}"'}
+        if config.etags:
+            headers.update({"ETag": blob.etag, "Last-Modified": blob.last_modified})
+            if self.headers.get("If-None-Match") == blob.etag:
+                self.state.count(not_modified=1)
+                self.send_response(304)
+                for name, value in headers.items(): self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        if config.ranges: headers["Accept-Ranges"] = "bytes"
+        match = self.RANGE.match(self.headers.get("Range", "")) if config.ranges else None
+        if_range = self.headers.get("If-Range")
+        if match and (not if_range or if_range in (blob.etag, blob.last_modified)):
+            size = len(blob.data)
+            first, last = match.groups()
+            if first: start, end = int(first), min(int(last) if last else size - 1, size - 1)
+            else: start, end = max(0, size - int(last)), size - 1
+            if start >= size or start > end:
+                self._send(416, b"", headers={"Content-Range": f"bytes */{size}"})
+                return
+            self.state.count(ranges=1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            self._send(206, blob.data[start:end + 1], "application/gzip", headers)
+            return
+        self._send(200, blob.data, "application/gzip", headers)
+
+    def _read_body(self):
+        """Request body, de-chunked when sent with Transfer-Encoding: chunked"""
+        throttle = _Throttle(self.state.config.bandwidth)
+        parts = []
+
+        def read(n):
+            data = self.rfile.read(n)
+            throttle.take(len(data))
+            self.state.link.take(len(data))
+            return data
+
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while self.rfile.readline().strip(): pass
+                    break
+                parts.append(read(size))
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length") or 0)
+            while remaining > 0:
+                data = read(min(self.CHUNK * 16, remaining))
+                if not data: break
+                parts.append(data)
+                remaining -= len(data)
+        body = b"".join(parts)
+        self.state.count(bytes_in=len(body))
+        return body
+
+    def _multipart(self, body):
+        """{field: bytes} of a multipart/form-data body"""
+        match = re.search(r'boundary="?([^";]+)"?', self.headers.get("Content-Type", ""))
+        if not match: return {}
+        fields = {}
+        for part in body.split(b"--" + match.group(1).encode())[1:]:
+            if part.startswith(b"--"): break
+            head, _, content = part.partition(b"\r\n\r\n")
+            name = re.search(rb'name="([^"]*)"', head)
+            if name: fields[name.group(1).decode()] = content[:-2] if content.endswith(b"\r\n") else content
+        return fields
+
+    # --- yönlendirme ---
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path, query = self._begin()
+        state = self.state
+        if path.startswith("/api/start-session/"):
+            with state.lock: state.sessions.setdefault(path.rsplit("/", 1)[1], time.monotonic())
+            return self._json({"success": True, "status": "WAITING"})
+        if path.startswith("/api/check-session/"):
+            return self._check_session(path.rsplit("/", 1)[1], query)
+        if path == "/slicer/patients":
+            return self._patients(query)
+        if path == "/monailabel-datastore-image-download":
+            blob = state.blob("image", query.get("image", ""))
+            return self._send_blob(blob, f"{query.get('image')}.nii.gz") if blob else self._json({"detail": "Image NOT Found"}, 404)
+        if path == "/monailabel-datastore-label-download":
+            blob = state.blob("label", query.get("label", ""), query.get("tag"))
+            return self._send_blob(blob, f"label_{query.get('label')}.nii.gz") if blob else self._json({"detail": "Label NOT Found"}, 404)
+        if path in ("/datastore/", "/datastore"):
+            body, etag = state.datastore_payload()
+            if state.config.etags and self.headers.get("If-None-Match") == etag:
+                state.count(not_modified=1)
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            return self._json(body, headers={"ETag": etag} if state.config.etags else None)
+        if path == "/datastore/image/info":
+            if not state.config.image_info: return self._json({"detail": "Not Found"}, 404)
+            with state.lock: obj = state.objects.get(query.get("image"))
+            return self._json(obj["image"]["info"]) if obj and "image" in obj else self._json({"detail": "Image NOT Found"}, 404)
+        if path == "/datastore/image":
+            blob = state.blob("image", query.get("image", ""))
+            return self._send_blob(blob, f"{query.get('image')}.nii.gz") if blob else self._json({"detail": "Image NOT Found"}, 404)
+        if path == "/datastore/label":
+            blob = state.blob("label", query.get("label", ""), query.get("tag"))
+            return self._send_blob(blob, f"label_{query.get('label')}.nii.gz") if blob else self._json({"detail": "Label NOT Found"}, 404)
+        self._json({"detail": "Not Found"}, 404)
+
+    def do_PUT(self):
+        path, query = self._begin()
+        body = self._read_body()
+        if path not in ("/datastore/image", "/datastore/label"):
+            return self._json({"detail": "Method Not Allowed"}, 405)
+        kind = path.rsplit("/", 1)[1]
+        fields = self._multipart(body)
+        data = fields.get("file" if kind == "image" else "label")
+        if data is None: return self._json({"detail": f"missing {kind} file"}, 422)
+        raw_params = query.get("params") or (fields.get("params") or b"{}").decode()
+        try: params = json.loads(raw_params)
+        except ValueError: params = {}
+        image_id = query.get("image") if kind == "image" else query.get("label") or query.get("image")
+        if not image_id: return self._json({"detail": f"missing {kind} id"}, 422)
+        self.state.store(kind, image_id, query.get("tag"), data, params)
+        self._json({"image": image_id, "label": image_id if kind == "label" else None, "tag": query.get("tag")})
+
+    def do_DELETE(self):
+        path, query = self._begin()
+        if path not in ("/datastore/image", "/datastore/label"):
+            return self._json({"detail": "Method Not Allowed"}, 405)
+        kind = path.rsplit("/", 1)[1]
+        if not self.state.delete(kind, query.get("id", ""), query.get("tag")):
+            return self._json({"detail": f"{kind.capitalize()} NOT Found"}, 404)
+        self._json({})
+
+    def _patients(self, query):
+        patients = self.state.patients
+        paging = self.state.config.paging
+        if paging == "none": return self._json({"patients": patients})
+        limit = max(1, int(query.get("limit") or 500))
+        offset = int(query.get("cursor") or query.get("offset") or 0)
+        fail_at = self.state.config.patients_fail_at
+        if fail_at is not None and offset >= fail_at: return self._json({"detail": "Service Unavailable"}, 503)
+        page = patients[offset:offset + limit]
+        payload = {"patients": page, "total": len(patients)}
+        more = offset + len(page) < len(patients)
+        if paging == "cursor": payload["next_cursor"] = str(offset + len(page)) if more else None
+        else: payload["has_more"] = more
+        self._json(payload)
+
+    def _check_session(self, code, query):
+        state = self.state
+        with state.lock: started = state.sessions.get(code)
+        if started is None: return self._json({"detail": "unknown device code"}, 404)
+        ready_at = started + state.config.login_after
+        wait = float(query.get("wait") or 0)
+        if wait and time.monotonic() < ready_at:
+            time.sleep(min(wait, ready_at - time.monotonic()))
+        if time.monotonic() < ready_at: return self._json({"success": True, "status": "WAITING"})
+        self._json({"success": True, "status": "LOGGED_IN", "user": {"name": "Bench User"}, "sis_id": BENCH_USER})
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class AIRadarMockServer:
+    """Both mock APIs on one local port; backend_url and monai_url are the same server"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0, verbose=False):
+        self.config = config or MockConfig()
+        self.state = MockState(self.config)
+        self.httpd = _Server((host, port), MockHandler)
+        self.httpd.state = self.state
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="AIRadarMockServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread: self._thread.join()
+
+    def counters(self):
+        with self.state.lock:
+            return dict(self.state.counters)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--shape", type=int, nargs=3, default=[128, 128, 96], metavar=("X", "Y", "Z"))
+    parser.add_argument("--objects", type=int, default=1000, help="MONAI datastore objects")
+    parser.add_argument("--patients", type=int, default=1000, help="backend patient list entries")
+    parser.add_argument("--owned", type=int, default=50, help=f"datastore objects owned by {BENCH_USER}")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--bandwidth", type=float, default=0, help="bytes/s per transfer (0 = unlimited)")
+    parser.add_argument("--link-bandwidth", type=float, default=0, help="bytes/s shared by all transfers")
+    parser.add_argument("--paging", choices=["offset", "cursor", "none"], default="offset")
+    parser.add_argument("--no-ranges", action="store_true")
+    parser.add_argument("--no-etags", action="store_true")
+    parser.add_argument("--no-image-info", action="store_true")
+    parser.add_argument("--login-after", type=float, default=0.5)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(shape=args.shape, objects=args.objects, patients=args.patients, owned=args.owned,
+                        latency=args.latency, bandwidth=args.bandwidth, link_bandwidth=args.link_bandwidth,
+                        ranges=not args.no_ranges, etags=not args.no_etags, image_info=not args.no_image_info,
+                        paging=args.paging, login_after=args.login_after)
+    server = AIRadarMockServer(config, args.host, args.port, verbose=args.verbose)
+    print(f"AIRadar mock server on {server.url} (image {len(server.state.image.data) / 1048576:.1f} MB, "
+          f"label {len(server.state.label.data) / 1048576:.2f} MB, {config.objects} objects, user {BENCH_USER})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
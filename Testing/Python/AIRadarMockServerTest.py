@@ -0,0 +1,125 @@
+"""Tests of AIRadarMockServer itself, the fixture behind AIRadarTransferTest and the benchmark.
+
+Needs only numpy and requests, so it also runs outside Slicer:
+    python -m unittest discover -s Testing/Python -p AIRadarMockServerTest.py
+"""
+
+import gzip
+import json
+import os
+import struct
+import sys
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from AIRadarMockServer import BENCH_USER, AIRadarMockServer, MockConfig
+
+
+class AIRadarMockServerTest(unittest.TestCase):
+
+    def setUp(self):
+        config = MockConfig(shape=(96, 96, 64), objects=200, patients=250, login_after=0.2)
+        self.server = AIRadarMockServer(config).start()
+        self.url = self.server.url
+        self.http = requests.Session()
+
+    def tearDown(self):
+        self.http.close()
+        self.server.stop()
+
+    def get(self, path, **kwargs):
+        return self.http.get(f"{self.url}{path}", **kwargs)
+
+    def test_pairing(self):
+        self.assertEqual(self.get("/api/start-session/1234").json()["status"], "WAITING")
+        self.assertEqual(self.get("/api/check-session/1234").json()["status"], "WAITING")
+        # Uzun yoklama giriş anına kadar bekler
+        session = self.get("/api/check-session/1234", params={"wait": 1}).json()
+        self.assertEqual((session["status"], session["sis_id"]), ("LOGGED_IN", BENCH_USER))
+        self.assertEqual(self.get("/api/check-session/9999").status_code, 404)
+
+    def list_patients(self, paging):
+        self.server.config.paging = paging
+        keys, params = [], {"limit": 100}
+        while True:
+            page = self.get("/slicer/patients", params=params).json()
+            keys += [p["key"] for p in page["patients"]]
+            if paging == "none": return keys
+            if paging == "cursor":
+                if not page["next_cursor"]: return keys
+                params["cursor"] = page["next_cursor"]
+            else:
+                if not page["has_more"]: return keys
+                params["offset"] = len(keys)
+
+    def test_patient_paging(self):
+        expected = [f"case_{i:06d}" for i in range(250)]
+        for paging in ("offset", "cursor", "none"):
+            self.assertEqual(self.list_patients(paging), expected, paging)
+
+        self.server.config.paging, self.server.config.patients_fail_at = "offset", 200
+        self.assertEqual(self.get("/slicer/patients", params={"offset": 100, "limit": 100}).status_code, 200)
+        self.assertEqual(self.get("/slicer/patients", params={"offset": 200, "limit": 100}).status_code, 503)
+
+    def test_datastore_listing(self):
+        resp = self.get("/datastore/", params={"output": "all"})
+        objects = resp.json()["objects"]
+        self.assertEqual(len(objects), self.server.config.objects)
+        owned = [key for key, obj in objects.items() if obj["client_id"] == BENCH_USER]
+        self.assertEqual(len(owned), self.server.config.owned)
+
+        etag = resp.headers["ETag"]
+        self.assertEqual(self.get("/datastore/", headers={"If-None-Match": etag}).status_code, 304)
+        self.server.state.store("image", "test_new", None, b"image", {"uploaded_by": BENCH_USER})
+        changed = self.get("/datastore/", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn("test_new", changed.json()["objects"])
+        self.assertEqual(self.server.counters()["not_modified"], 1)
+
+    def test_image_download(self):
+        resp = self.get("/monailabel-datastore-image-download", params={"image": "case_000001"})
+        data = resp.content
+        self.assertEqual(data, self.server.state.image.data)
+        self.assertEqual(struct.unpack("<i", gzip.decompress(data)[:4])[0], 348)
+        etag = resp.headers["ETag"]
+        self.assertEqual(self.get("/monailabel-datastore-image-download", params={"image": "case_000001"},
+                                  headers={"If-None-Match": etag}).status_code, 304)
+
+        segment, parts = 64 * 1024, []
+        for start in range(0, len(data), segment):
+            part = self.get("/datastore/image", params={"image": "case_000001"},
+                            headers={"Range": f"bytes={start}-{start + segment - 1}", "If-Range": etag})
+            self.assertEqual(part.status_code, 206)
+            parts.append(part.content)
+        self.assertEqual(b"".join(parts), data)
+        self.assertEqual(self.server.counters()["ranges"], len(parts))
+        # Değişmiş kaynak: If-Range tutmazsa tüm dosya döner
+        stale = self.get("/datastore/image", params={"image": "case_000001"}, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        self.assertEqual((stale.status_code, len(stale.content)), (200, len(data)))
+
+    def test_upload_and_delete(self):
+        params = {"image": "test_new", "params": json.dumps({"uploaded_by": BENCH_USER})}
+        resp = self.http.put(f"{self.url}/datastore/image", params=params, files={"file": ("image.nii.gz", b"IMAGE")})
+        self.assertEqual(resp.status_code, 200)
+
+        # Etiketler parça parça (chunked) gönderilebilir
+        def body():
+            yield b'--b\r\nContent-Disposition: form-data; name="label"; filename="label.nii.gz"\r\n\r\n'
+            yield b"LABEL"
+            yield b"\r\n--b--\r\n"
+        resp = self.http.put(f"{self.url}/datastore/label", params={"image": "test_new", "tag": BENCH_USER}, data=body(),
+                             headers={"Content-Type": "multipart/form-data; boundary=b"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.get("/datastore/label", params={"label": "test_new", "tag": BENCH_USER}).content, b"LABEL")
+        self.assertEqual(self.get("/datastore/image/info", params={"image": "test_new"}).json()["uploaded_by"], BENCH_USER)
+
+        self.assertEqual(self.http.delete(f"{self.url}/datastore/label", params={"id": "test_new", "tag": BENCH_USER}).status_code, 200)
+        self.assertEqual(self.http.delete(f"{self.url}/datastore/image", params={"id": "test_new"}).status_code, 200)
+        self.assertEqual(self.get("/datastore/image/info", params={"image": "test_new"}).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,301 @@
+"""End-to-end transfer benchmark of AIRadarLogic against the local mock backend/MONAI server.
+
+Starts AIRadarMockServer in-process, points a fresh AIRadarLogic with its own cache and
+datastore directories at it and times, as the widget runs them (worker tasks with the
+scene steps handed to the GUI thread):
+  patients  fetch_backend_patients over the paged patient list
+  download  download_and_load_patient cold (network + decode + scene) and warm (volume cache),
+            download_patient_with_seg cold
+  sync      fetch_all_images: full listing, 304 revalidation and the listing after uploads
+  filter    _filter_and_add over the raw /datastore/ payload
+  upload    process_upload of a new case (image + label) and again with an unchanged label
+Each step runs --repeat times; the median is compared with the baseline JSON and the run
+exits with status 1 when a duration grows (or a throughput drops) by more than --tolerance.
+--update-baseline records the current numbers instead. Baselines only compare with runs of
+the same settings and are machine-specific, so record one per machine; --require-baseline
+makes a missing or mismatched baseline fail the run. --smoke runs every step once on a
+small dataset and only checks the results (the ctest registered in CMakeLists.txt). The per-phase
+summary of logic.metrics (http.body, nifti.decode, scene.load_volume, ...) is printed and
+written with --json for finding where a regression comes from.
+
+Run inside Slicer:
+    Slicer --no-main-window --python-script Testing/Python/AIRadarTransferBenchmark.py [-- --shape 256 256 200 --bandwidth 50e6 --latency 0.02]
+    Slicer --no-main-window --python-script Testing/Python/AIRadarTransferBenchmark.py -- --update-baseline
+    Slicer --no-main-window --python-script Testing/Python/AIRadarTransferBenchmark.py -- --smoke
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import slicer
+
+from AIRadar import AIRadarDatastoreIndex, AIRadarLogic, AIRadarMetadataStore, AIRadarRangeDownloader, AIRadarVolumeCache
+from AIRadarMockServer import BENCH_USER, AIRadarMockServer, MockConfig
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "AIRadarTransferBaseline.json")
+
+# ad: (birim, hangi yön daha iyi)
+METRICS = {
+    "patients_fetch_s": ("s", "lower"),
+    "download_cold_s": ("s", "lower"),
+    "download_cold_mb_s": ("MB/s", "higher"),
+    "download_warm_s": ("s", "lower"),
+    "download_seg_s": ("s", "lower"),
+    "sync_full_s": ("s", "lower"),
+    "sync_revalidate_s": ("s", "lower"),
+    "sync_after_upload_s": ("s", "lower"),
+    "filter_s": ("s", "lower"),
+    "upload_case_s": ("s", "lower"),
+    "upload_case_mb_s": ("MB/s", "higher"),
+    "upload_unchanged_s": ("s", "lower"),
+}
+
+
+class BenchmarkError(AssertionError):
+    pass
+
+
+def make_logic(workdir, range_min_bytes=None, segment_bytes=None):
+    """AIRadarLogic whose cache, metadata store, datastore snapshots and case pool start empty in workdir"""
+    logic = AIRadarLogic()
+    logic.metadata.close()
+    logic.metadata = AIRadarMetadataStore(os.path.join(workdir, "metadata.sqlite"))
+    logic.cache = AIRadarVolumeCache(os.path.join(workdir, "volumes"), max_bytes=logic.CACHE_MAX_BYTES)
+    logic.cache.observe(logic.metadata.cache_changed)
+    logic.downloader = AIRadarRangeDownloader(logic.http, logic.cache,
+                                              min_bytes=logic.RANGE_MIN_BYTES if range_min_bytes is None else range_min_bytes,
+                                              segment_bytes=segment_bytes or logic.RANGE_SEGMENT_BYTES, parallel=logic.RANGE_PARALLEL)
+    logic.datastore = AIRadarDatastoreIndex(os.path.join(workdir, "datastore"), on_change=logic.metadata.datastore_changed)
+    # Havuz kapalı: her yükleme gerçekten indirir/çözer ve sahneyi temizler
+    logic.case_pool.max_cases = 0
+    return logic
+
+
+def close_logic(logic, workdir):
+    """Stops the logic's workers, clears the scene and removes workdir"""
+    logic.shutdown()
+    slicer.mrmlScene.Clear(0)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_task(logic, fn, *args, **kwargs):
+    """Runs fn as an AIRadarTaskEngine task and pumps the Qt event loop until its on_done ran.
+    Returns (result, seconds)."""
+    done = []
+    started = time.perf_counter()
+    logic.tasks.submit(fn, *args, name=getattr(fn, "__name__", "bench"),
+                       on_done=lambda result, error: done.append((result, error, time.perf_counter())), **kwargs)
+    while not done:
+        slicer.app.processEvents()
+        time.sleep(0.001)
+    result, error, finished = done[0]
+    if error is not None: raise error
+    return result, finished - started
+
+
+def expect(condition, message):
+    if not condition: raise BenchmarkError(message)
+
+
+def run(server, repeat=3, range_min_bytes=None):
+    """Medians of every METRICS entry plus the logic's per-phase summary"""
+    url = server.url
+    config = server.config
+    image_mb = len(server.state.image.data) / 1048576
+    label_mb = len(server.state.label.data) / 1048576
+    workdir = tempfile.mkdtemp(prefix="airadar_bench_")
+    logic = make_logic(workdir, range_min_bytes)
+    samples = {name: [] for name in METRICS}
+    try:
+        for _ in range(repeat):
+            (patients, complete), seconds = run_task(logic, logic.fetch_backend_patients, url, BENCH_USER)
+            expect(complete and len(patients) == config.patients, f"patient list has {len(patients)} entries, expected {config.patients}")
+            samples["patients_fetch_s"].append(seconds)
+
+        cold_keys = [f"case_{i:06d}" for i in range(repeat)]
+        for key in cold_keys:
+            ok, seconds = run_task(logic, logic.download_and_load_patient, url, key)
+            expect(ok, f"download_and_load_patient({key}) failed")
+            samples["download_cold_s"].append(seconds)
+            samples["download_cold_mb_s"].append(image_mb / seconds)
+        for key in cold_keys:
+            # Havuz "şu anki vaka"yı tekrar yüklemeden gösterir; unutturulur
+            logic.case_pool.reset()
+            ok, seconds = run_task(logic, logic.download_and_load_patient, url, key)
+            expect(ok, f"cached download_and_load_patient({key}) failed")
+            samples["download_warm_s"].append(seconds)
+        for i in range(repeat):
+            key = f"case_{repeat + i:06d}"
+            (ok, message), seconds = run_task(logic, logic.download_patient_with_seg, url, key, BENCH_USER)
+            expect(ok, f"download_patient_with_seg({key}) failed: {message}")
+            samples["download_seg_s"].append(seconds)
+        image_node = slicer.util.getNode(f"{key}_Image")
+        label_node = slicer.util.getNode(f"{key}_Seg")
+
+        for i in range(repeat):
+            # Boş bir snapshot dizini: tam liste indirilir
+            logic.datastore = AIRadarDatastoreIndex(os.path.join(workdir, f"datastore_{i}"), on_change=logic.metadata.datastore_changed)
+            files, seconds = run_task(logic, logic.fetch_all_images, url, BENCH_USER, max_age=0)
+            expect(len(files) >= config.owned, f"sync listed {len(files)} datasets, expected at least {config.owned}")
+            samples["sync_full_s"].append(seconds)
+        not_modified = server.counters()["not_modified"]
+        for _ in range(repeat):
+            # max_age=0: her seferinde sunucuya sorulur, liste değişmediği için 304 döner
+            revalidated, seconds = run_task(logic, logic.fetch_all_images, url, BENCH_USER, max_age=0)
+            expect(revalidated == files, "revalidated datastore listing differs from the full one")
+            samples["sync_revalidate_s"].append(seconds)
+        expect(not config.etags or server.counters()["not_modified"] - not_modified == repeat, "datastore revalidation did not answer 304")
+
+        payload = logic.http.get(f"{url}{logic.ENDPOINT_DATASTORE}", call_type="list",
+                                 params={"output": "all", "token": BENCH_USER, "client_id": BENCH_USER}).json()
+        for _ in range(repeat):
+            owned = set()
+            started = time.perf_counter()
+            logic._filter_and_add(payload, owned, mode="private", user_id=BENCH_USER)
+            samples["filter_s"].append(time.perf_counter() - started)
+            expect(len(owned) >= config.owned, f"filter found {len(owned)} datasets, expected at least {config.owned}")
+
+        for i in range(repeat):
+            image_id = f"bench_upload_{i:03d}"
+            received = server.counters()["bytes_in"]
+            (ok, message), seconds = run_task(logic, logic.process_upload, url, image_id, False, image_node, label_node,
+                                              True, BENCH_USER, BENCH_USER)
+            expect(ok, f"process_upload({image_id}) failed: {message}")
+            samples["upload_case_s"].append(seconds)
+            samples["upload_case_mb_s"].append((server.counters()["bytes_in"] - received) / 1048576 / seconds)
+            (ok, message), seconds = run_task(logic, logic.process_upload, url, image_id, False, image_node, label_node,
+                                              False, BENCH_USER, BENCH_USER)
+            expect(ok and "unchanged" in message, f"second upload of an unchanged label was not skipped: {message}")
+            samples["upload_unchanged_s"].append(seconds)
+            files, seconds = run_task(logic, logic.fetch_all_images, url, BENCH_USER, max_age=0)
+            expect(image_id in files, f"{image_id} missing from the datastore after upload")
+            samples["sync_after_upload_s"].append(seconds)
+
+        phases = logic.metrics_summary()
+    finally:
+        close_logic(logic, workdir)
+
+    metrics = {name: statistics.median(values) for name, values in samples.items() if values}
+    return {"metrics": metrics, "phases": phases, "image_mb": image_mb, "label_mb": label_mb, "server": server.counters()}
+
+
+def compare(metrics, baseline, tolerance, min_delta):
+    """[(name, value, baseline value, change ratio, regressed)] for metrics in both"""
+    rows = []
+    for name, value in metrics.items():
+        reference = baseline.get(name)
+        if reference is None: continue
+        unit, better = METRICS[name]
+        change = (value - reference) / reference if reference else 0.0
+        if better == "lower":
+            # Çok kısa süreler gürültülü: mutlak fark da min_delta'yı aşmalı
+            regressed = change > tolerance and value - reference > min_delta
+        else:
+            regressed = change < -tolerance
+        rows.append((name, value, reference, change, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shape", type=int, nargs=3, default=[128, 128, 96], metavar=("X", "Y", "Z"))
+    parser.add_argument("--objects", type=int, default=10000, help="MONAI datastore objects")
+    parser.add_argument("--patients", type=int, default=2000, help="backend patient list entries")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--bandwidth", type=float, default=0, help="bytes/s per transfer (0 = unlimited)")
+    parser.add_argument("--link-bandwidth", type=float, default=0, help="bytes/s shared by all transfers")
+    parser.add_argument("--range-min-bytes", type=int, help="override RANGE_MIN_BYTES to exercise parallel range downloads")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--require-baseline", action="store_true", help="fail when there is no baseline of these settings")
+    parser.add_argument("--smoke", action="store_true", help="one small run that only checks the results (no timings compared)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before failing")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="seconds a duration must grow by to count as a regression")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+    if args.smoke:
+        args.shape, args.objects, args.patients, args.repeat = [48, 48, 32], 500, 1203, 1
+
+    config = MockConfig(shape=args.shape, objects=args.objects, patients=args.patients, latency=args.latency,
+                        bandwidth=args.bandwidth, link_bandwidth=args.link_bandwidth)
+    settings = dict(config.as_dict(), range_min_bytes=args.range_min_bytes, repeat=args.repeat)
+    server = AIRadarMockServer(config).start()
+    try:
+        result = run(server, args.repeat, args.range_min_bytes)
+    finally:
+        server.stop()
+
+    metrics = result["metrics"]
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"\nimage {result['image_mb']:.1f} MB, label {result['label_mb']:.2f} MB, {config.objects} objects, {config.patients} patients")
+    rows = compare(metrics, baseline["metrics"], args.tolerance, args.min_delta) if baseline and baseline.get("settings") == settings else []
+    by_name = {row[0]: row for row in rows}
+    print(f"{'metric':<22} {'value':>11} {'baseline':>11} {'change':>8}")
+    for name, value in metrics.items():
+        unit = METRICS[name][0]
+        row = by_name.get(name)
+        scale, unit = (1000, "ms") if unit == "s" else (1, unit)
+        line = f"{name:<22} {value * scale:>8.1f} {unit:<2}"
+        if row: line += f" {row[2] * scale:>8.1f} {unit:<2} {row[3] * 100:>+7.1f}%" + ("  REGRESSION" if row[4] else "")
+        print(line)
+    print(f"\n{'phase':<22} {'count':>6} {'p50':>9} {'p95':>9} {'MB/s':>8}")
+    for name, stats in sorted(result["phases"].items()):
+        throughput = f"{stats['mb_per_s']:>8.1f}" if stats.get("mb_per_s") else f"{'':>8}"
+        print(f"{name:<22} {stats['count']:>6} {stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms {throughput}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(result, settings=settings, comparison=[dict(zip(("metric", "value", "baseline", "change", "regressed"), row)) for row in rows]), f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "machine": platform.node(), "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+                       "metrics": metrics}, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if args.smoke:
+        print("\nSmoke run passed (timings not compared).")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one.")
+        return 2 if args.require_baseline else 0
+    if baseline.get("settings") != settings:
+        print(f"\nBaseline {args.baseline} was recorded with different settings; rerun with --update-baseline.")
+        return 2
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"\nRegressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    if argv[:1] == ["--"]: argv = argv[1:]
+    status = 1
+    try:
+        status = main(argv)
+    except BenchmarkError as e:
+        print(f"Benchmark failed: {e}")
+    except Exception:
+        # Görev hataları da (HTTP, çözme, ...) testi düşürmeli; çıkılmazsa Slicer açık kalır
+        traceback.print_exc()
+    finally:
+        slicer.util.exit(status)
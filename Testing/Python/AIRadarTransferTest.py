@@ -0,0 +1,222 @@
+"""Tests of AIRadarLogic's transfer paths against the local mock backend/MONAI server.
+
+Each test case starts AIRadarMockServer in-process with a small dataset and a fresh
+AIRadarLogic working in a temporary directory (see AIRadarTransferBenchmark.make_logic):
+  RangeDownloadTest        parallel segments, resuming from the sidecar, concurrent sidecar flushes
+  RevalidationTest         304 answers for the datastore listing and for cached volumes,
+                           dataset scopes served from the metadata store
+  PatientPagingTest        offset/cursor paging, repeated keys and a page failing mid-listing
+  LabelUploadSkipTest      an unchanged label is not sent again unless the server changed it
+
+Registered with ctest in CMakeLists.txt; by hand:
+    Slicer --no-main-window --python-code "import slicer.testing; slicer.testing.runUnitTest(['Testing/Python'], 'AIRadarTransferTest')"
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import slicer
+
+from AIRadar import AIRadarRangeDownloader, _AIRadarRangeState
+from AIRadarMockServer import BENCH_USER, AIRadarMockServer, MockConfig
+from AIRadarTransferBenchmark import close_logic, make_logic, run_task
+
+
+class AIRadarTransferTestCase(unittest.TestCase):
+    CONFIG = {}
+
+    def setUp(self):
+        settings = dict({"shape": (48, 48, 32), "objects": 200, "patients": 250}, **self.CONFIG)
+        self.server = AIRadarMockServer(MockConfig(**settings)).start()
+        self.url = self.server.url
+        self.workdir = tempfile.mkdtemp(prefix="airadar_test_")
+        self.logic = make_logic(self.workdir)
+
+    def tearDown(self):
+        close_logic(self.logic, self.workdir)
+        self.server.stop()
+
+    def counter(self, name):
+        return self.server.counters()[name]
+
+
+class RangeDownloadTest(AIRadarTransferTestCase):
+    CONFIG = {"shape": (96, 96, 64)}
+    SEGMENT = 64 * 1024
+
+    def setUp(self):
+        super().setUp()
+        self.downloader = AIRadarRangeDownloader(self.logic.http, self.logic.cache, min_bytes=1,
+                                                 segment_bytes=self.SEGMENT, parallel=4)
+        self.blob = self.server.state.image
+        self.segments = -(-len(self.blob.data) // self.SEGMENT)
+        self.assertGreater(self.segments, 4)
+
+    def download(self, cache_key):
+        resp = self.logic.http.get(self.logic.backend_image_url(self.url, "case_000001"), call_type="download", stream=True)
+        self.assertTrue(self.downloader.supports(resp))
+        with open(self.downloader.download(resp, cache_key), "rb") as f:
+            return f.read()
+
+    def test_parallel_segments(self):
+        self.assertEqual(self.download(("test", self.url, "image", "parallel", None)), self.blob.data)
+        # İlk segment zaten açık olan yanıttan okunur
+        self.assertEqual(self.counter("ranges"), self.segments - 1)
+
+    def test_resume_from_sidecar(self):
+        size = len(self.blob.data)
+        cache_key = ("test", self.url, "image", "resume", None)
+        partial = self.logic.cache.partial_path(cache_key)
+        # Yarıda kalmış bir deneme: ilk iki segment diskte ve sidecar'da, gerisi sıfır
+        with open(partial, "wb") as f:
+            f.write(self.blob.data[:2 * self.SEGMENT])
+            f.truncate(size)
+        state = _AIRadarRangeState(partial + ".json", size, self.blob.etag, self.blob.last_modified, self.SEGMENT)
+        for start in (0, self.SEGMENT):
+            state.advance(start, self.SEGMENT)
+            state.persist(start)
+        state.flush()
+
+        self.assertEqual(self.download(cache_key), self.blob.data)
+        self.assertEqual(self.counter("ranges"), self.segments - 2)
+        self.assertFalse(os.path.exists(partial + ".json"))
+
+    def test_sidecar_flushes(self):
+        path = os.path.join(self.workdir, "state.json")
+        identity = (path, 4 * self.SEGMENT, "etag", None, self.SEGMENT)
+        state = _AIRadarRangeState(*identity)
+        errors = []
+
+        def flush(start):
+            try:
+                for _ in range(500):
+                    state.advance(start, 1)
+                    state.persist(start)
+                    state.flush()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=flush, args=(i * self.SEGMENT,)) for i in range(4)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(_AIRadarRangeState(*identity).written_bytes, {i * self.SEGMENT: 500 for i in range(4)})
+
+        # Henüz fsync edilmemiş baytlar sidecar'a yazılmaz
+        state.advance(0, 100)
+        state.flush()
+        self.assertEqual(_AIRadarRangeState(*identity).written(0), 500)
+
+
+class RevalidationTest(AIRadarTransferTestCase):
+
+    def test_datastore_listing(self):
+        files = self.logic.fetch_all_images(self.url, BENCH_USER, max_age=0)
+        self.assertGreaterEqual(len(files), self.server.config.owned)
+        not_modified = self.counter("not_modified")
+        self.assertEqual(self.logic.fetch_all_images(self.url, BENCH_USER, max_age=0), files)
+        self.assertEqual(self.counter("not_modified"), not_modified + 1)
+
+        # Sunucudaki bir değişiklik 304 yerine yeni listeyi getirir
+        self.server.state.store("image", "test_new", None, b"image", {"uploaded_by": BENCH_USER})
+        self.assertIn("test_new", self.logic.fetch_all_images(self.url, BENCH_USER, max_age=0))
+        self.assertEqual(self.counter("not_modified"), not_modified + 1)
+
+    def test_dataset_scopes(self):
+        self.logic.fetch_all_images(self.url, BENCH_USER, max_age=0)
+        index = self.logic.datastore.get(self.url, BENCH_USER).owner_index()
+        sent = self.counter("requests")
+        # Kapsamlar yerel metadata deposundan gelir, sunucuya istek gitmez
+        for scope, expected in (("mine", index.owned_by(BENCH_USER)), ("public", index.public()), ("all", index.names())):
+            self.assertEqual(self.logic.fetch_all_images(self.url, BENCH_USER, max_age=float("inf"), scope=scope),
+                             sorted(expected), scope)
+        self.assertEqual(self.counter("requests"), sent)
+
+        # Yeni bir nesne yalnızca değişen satır olarak depoya eklenir
+        self.server.state.store("image", "test_new", None, b"image", {"uploaded_by": BENCH_USER})
+        self.assertIn("test_new", self.logic.fetch_all_images(self.url, BENCH_USER, max_age=0))
+        self.assertIn("test_new", self.logic.metadata.dataset_ids(self.url, BENCH_USER, owner=BENCH_USER))
+
+    def test_cached_volume(self):
+        url = self.logic.backend_image_url(self.url, "case_000002")
+        cache_key = ("backend", self.url, "image", "case_000002", None)
+        path, status = self.logic._fetch_to_cache(url, cache_key)
+        self.assertEqual(status, 200)
+        self.assertEqual(self.counter("not_modified"), 0)
+        self.assertEqual(self.logic._fetch_to_cache(url, cache_key), (path, 200))
+        self.assertEqual(self.counter("not_modified"), 1)
+        self.assertEqual(self.logic.cache_stats()["hits"], 1)
+
+
+class PatientPagingTest(AIRadarTransferTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.logic.PATIENTS_PAGE_SIZE = 100
+
+    def fetch(self):
+        return self.logic.fetch_backend_patients(self.url, BENCH_USER)
+
+    def test_paging_modes(self):
+        expected = [p["key"] for p in self.server.state.patients]
+        for paging in ("offset", "cursor", "none"):
+            self.server.config.paging = paging
+            patients, complete = self.fetch()
+            self.assertTrue(complete, paging)
+            self.assertEqual([p["key"] for p in patients], expected, paging)
+        self.assertEqual(len(self.logic.stored_patient_index(self.url, BENCH_USER)), len(expected))
+
+    def test_repeated_keys(self):
+        patients = self.server.state.patients
+        # İkinci sayfa ilk sayfanın son kaydıyla başlıyor
+        patients[100] = dict(patients[99])
+        fetched, complete = self.fetch()
+        self.assertTrue(complete)
+        self.assertEqual([p["key"] for p in fetched], [p["key"] for p in patients[:100] + patients[101:]])
+
+    def test_failed_page(self):
+        self.server.config.patients_fail_at = 200
+        patients, complete = self.fetch()
+        self.assertFalse(complete)
+        self.assertEqual(len(patients), 200)
+        self.assertEqual(self.logic.metrics_summary()["patients.fetch"]["failed"], 1)
+        # Eksik liste yerel depoya yazılmaz
+        self.assertEqual(len(self.logic.stored_patient_index(self.url, BENCH_USER)), 0)
+        self.assertFalse(self.logic.fetch_backend_patient_index(self.url, BENCH_USER).complete)
+
+
+class LabelUploadSkipTest(AIRadarTransferTestCase):
+
+    def upload(self, image_node, label_node, is_new_patient):
+        """(process_upload message, bytes the server received)"""
+        received = self.counter("bytes_in")
+        (ok, message), _ = run_task(self.logic, self.logic.process_upload, self.url, "test_upload", False,
+                                    image_node, label_node, is_new_patient, BENCH_USER, BENCH_USER)
+        self.assertTrue(ok, message)
+        return message, self.counter("bytes_in") - received
+
+    def test_unchanged_label(self):
+        key = next(key for key, obj in sorted(self.server.state.objects.items()) if BENCH_USER in obj["labels"])
+        (ok, message), _ = run_task(self.logic, self.logic.download_patient_with_seg, self.url, key, BENCH_USER)
+        self.assertTrue(ok, message)
+        image_node, label_node = slicer.util.getNode(f"{key}_Image"), slicer.util.getNode(f"{key}_Seg")
+        self.logic.fetch_all_images(self.url, BENCH_USER, max_age=0)
+
+        message, sent = self.upload(image_node, label_node, True)
+        self.assertGreater(sent, 0)
+        message, sent = self.upload(image_node, label_node, False)
+        self.assertIn("unchanged", message)
+        self.assertEqual(sent, 0)
+
+        # Başka bir istemci etiketi değiştirdi: eski snapshot'a güvenilmez, etiket yeniden gönderilir
+        self.server.state.store("label", "test_upload", BENCH_USER, b"label", {"uploaded_by": "other_client"})
+        self.logic.datastore.get(self.url, BENCH_USER).synced_at -= 2 * self.logic.LABEL_SKIP_MAX_AGE
+        message, sent = self.upload(image_node, label_node, False)
+        self.assertNotIn("unchanged", message)
+        self.assertGreater(sent, 0)